@@ -1,4 +1,5 @@
 import os
+import argparse
 import pandas as pd
 
 def filter_openasip_instructions(filepath, folder):
@@ -73,6 +74,17 @@ def process_all_folders(base_dir):
         print("No report data to merge.")
 
 if __name__ == "__main__":
-    base_directory = os.path.expanduser('~/project/ba/results')
+    parser = argparse.ArgumentParser(description="Merge the benchmark results of all model folders")
+    # 默认使用脚本所在的 results 目录
+    parser.add_argument('base_dir', nargs='?', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Results directory containing one folder per model")
+    parser.add_argument('--full', action='store_true',
+                        help="Rebuild everything serially instead of only the changed folders")
+    args = parser.parse_args()
+
+    if args.full:
+        process_all_folders(args.base_dir)
+    else:
+        from results_aggregator import aggregate_results
 
-    process_all_folders(base_directory)
+        aggregate_results(args.base_dir)
@@ -0,0 +1,217 @@
+import argparse
+import ast
+import glob
+import os
+import re
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+
+REPORT_FILENAME = "report.csv"
+
+# mlonmcu writes pathlib objects into the Config repr
+PATH_PATTERN = re.compile(r"\b(?:Posix|Windows)?Path\((['\"].*?['\"])\)")
+
+
+class Missing:
+    """Marks a key that a config does not have."""
+
+    def __repr__(self):
+        return "<missing>"
+
+
+MISSING = Missing()
+
+
+def parse_config(text):
+    if not isinstance(text, str):
+        return {}
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        pass
+    try:
+        return ast.literal_eval(PATH_PATTERN.sub(r"\1", text))
+    except (ValueError, SyntaxError) as e:
+        print(f"Could not parse Config: {e}")
+        return {}
+
+
+def value_key(value):
+    # Config values may be lists or dicts, their repr is used to compare them
+    return repr(value)
+
+
+class ConfigTable:
+    """Interned Config dicts of a set of runs.
+
+    Every distinct Config string is parsed once and gets an id; runs without
+    a Config share the id of the empty config. The value most runs share
+    becomes the base config; each id only keeps the keys where it deviates
+    from the base.
+    """
+
+    def __init__(self, config_strings):
+        codes, uniques = pd.factorize(
+            pd.Series(config_strings, dtype=object), use_na_sentinel=False
+        )
+        self.config_ids = codes.astype(np.int32)
+        configs = [parse_config(text) for text in uniques]
+
+        run_counts = np.bincount(self.config_ids, minlength=len(configs))
+        keys = sorted(set().union(*configs)) if configs else []
+
+        self.base = {}
+        for key in keys:
+            votes = Counter()
+            values = {}
+            for config, runs in zip(configs, run_counts):
+                value = config.get(key, MISSING)
+                votes[value_key(value)] += int(runs)
+                values.setdefault(value_key(value), value)
+            value = values[votes.most_common(1)[0][0]]
+            if value is not MISSING:
+                self.base[key] = value
+
+        self.diffs = []
+        for config in configs:
+            diff = {}
+            for key in keys:
+                value = config.get(key, MISSING)
+                if value_key(value) != value_key(self.base.get(key, MISSING)):
+                    diff[key] = value
+            self.diffs.append(diff)
+
+        self.varying_keys = sorted(set().union(*self.diffs)) if self.diffs else []
+
+    def __len__(self):
+        return len(self.diffs)
+
+    def config(self, config_id):
+        # Full Config dict of one id
+        config = dict(self.base)
+        for key, value in self.diffs[config_id].items():
+            if value is MISSING:
+                config.pop(key, None)
+            else:
+                config[key] = value
+        return config
+
+    def value(self, config_id, key):
+        diff = self.diffs[config_id]
+        if key in diff:
+            return diff[key]
+        return self.base.get(key, MISSING)
+
+
+class ReportTable:
+    """Runs of one or more report.csv files with the Config column interned.
+
+    runs holds the report columns without Config plus a config_id and one
+    column per Config key that differs between runs. Lookups by Config key
+    go through an index key -> value -> run positions.
+    """
+
+    def __init__(self, df, keys=None):
+        self.configs = ConfigTable(df["Config"].to_numpy(dtype=object))
+        runs = df.drop(columns=["Config"]).reset_index(drop=True)
+        runs["config_id"] = self.configs.config_ids
+
+        if keys is None:
+            keys = self.configs.varying_keys
+        self.keys = list(keys)
+
+        # Columns are filled per config id and broadcast to the runs
+        config_ids = runs["config_id"].to_numpy()
+        columns = {}
+        for key in self.keys:
+            values = np.empty(len(self.configs), dtype=object)
+            for config_id in range(len(self.configs)):
+                value = self.configs.value(config_id, key)
+                values[config_id] = None if value is MISSING else value
+            columns[key] = pd.Series(values[config_ids], index=runs.index, dtype=object)
+        if columns:
+            runs = pd.concat([runs, pd.DataFrame(columns, index=runs.index)], axis=1)
+        self.runs = runs
+
+        self.index = defaultdict(dict)
+        config_runs = defaultdict(list)
+        for position, config_id in enumerate(self.configs.config_ids):
+            config_runs[int(config_id)].append(position)
+        for config_id, positions in config_runs.items():
+            for key, value in self.configs.diffs[config_id].items():
+                entry = self.index[key].setdefault(value_key(value), [])
+                entry.extend(positions)
+        for key in self.index:
+            for value, positions in self.index[key].items():
+                self.index[key][value] = np.array(sorted(positions), dtype=np.int64)
+
+    def config(self, position):
+        return self.configs.config(int(self.runs["config_id"].iat[position]))
+
+    def positions(self, key, value):
+        """Run positions whose Config has key set to value."""
+        positions = self.index.get(key, {}).get(value_key(value))
+        if positions is not None:
+            return positions
+        # Runs without a diff for key share the base value
+        if value_key(self.configs.base.get(key, MISSING)) != value_key(value):
+            return np.array([], dtype=np.int64)
+        deviating = np.concatenate(
+            [np.array([], dtype=np.int64)] + list(self.index.get(key, {}).values())
+        )
+        return np.setdiff1d(np.arange(len(self.runs)), deviating)
+
+    def select(self, key, value):
+        return self.runs.iloc[self.positions(key, value)]
+
+
+def read_reports(base_dir):
+    frames = []
+    pattern = os.path.join(base_dir, "*", REPORT_FILENAME)
+    for filepath in sorted(glob.glob(pattern)):
+        frames.append(pd.read_csv(filepath))
+    if not frames:
+        raise FileNotFoundError(f"No {REPORT_FILENAME} found in {base_dir}")
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_reports(base_dir, keys=None):
+    return ReportTable(read_reports(base_dir), keys=keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load all report.csv files with deduplicated Config"
+    )
+    parser.add_argument(
+        "base_dir",
+        nargs="?",
+        default=os.path.dirname(os.path.abspath(__file__)),
+        help="Results directory containing one folder per model",
+    )
+    parser.add_argument(
+        "--key", type=str, default=None, help="Config key to select runs by"
+    )
+    parser.add_argument(
+        "--value",
+        type=str,
+        default=None,
+        help="Value of --key, as a Python literal",
+    )
+    args = parser.parse_args()
+
+    reports = load_reports(args.base_dir)
+    print(
+        f"{len(reports.runs)} runs, {len(reports.configs)} distinct configs, "
+        f"{len(reports.configs.base)} shared keys, "
+        f"{len(reports.configs.varying_keys)} varying keys"
+    )
+    if args.key is not None:
+        value = ast.literal_eval(args.value) if args.value is not None else None
+        selected = reports.select(args.key, value)
+        print(selected[["Model", "Run", "Total Cycles (rel.)"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
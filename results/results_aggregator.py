@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from csv_filter import extract_report_data, filter_openasip_instructions
+
+INSTRUCTIONS_FILENAME = "analyse_instructions_seq1.csv"
+REPORT_FILENAME = "report.csv"
+FILTERED_OUTPUT_FILENAME = "filtered_data.csv"
+REPORT_OUTPUT_FILENAME = "merged_report_data.csv"
+
+# Per-folder partitions and the input signatures they were built from
+STORE_DIRECTORY = ".aggregator"
+STATE_FILENAME = "state.json"
+STATE_VERSION = 1
+
+
+def file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(filepath, previous=None):
+    # The content is only hashed when mtime or size moved, so that touching a
+    # file does not force a re-ingest
+    if not os.path.exists(filepath):
+        return None
+    stat = os.stat(filepath)
+    signature = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+    if (
+        previous is not None
+        and previous["mtime"] == signature["mtime"]
+        and previous["size"] == signature["size"]
+    ):
+        signature["sha256"] = previous["sha256"]
+    else:
+        signature["sha256"] = file_hash(filepath)
+    return signature
+
+
+def same_content(signature, previous):
+    if signature is None or previous is None:
+        return signature is previous
+    return signature["sha256"] == previous["sha256"]
+
+
+class ResultsStore:
+    """Columnar store of the aggregated results, one partition per folder."""
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.directory = os.path.join(base_dir, STORE_DIRECTORY)
+        self.state_filepath = os.path.join(self.directory, STATE_FILENAME)
+        self.folders = {}  # folder -> {filename: signature}
+        if os.path.exists(self.state_filepath):
+            try:
+                with open(self.state_filepath, "r") as file:
+                    state = json.load(file)
+                if state.get("version") == STATE_VERSION:
+                    self.folders = state["folders"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring broken aggregator state {self.state_filepath}: {e}")
+
+    def partition_path(self, table, folder):
+        return os.path.join(self.directory, table, f"{folder}.parquet")
+
+    def write_partition(self, table, folder, df):
+        filepath = self.partition_path(table, folder)
+        if df is None:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        df.to_parquet(filepath, index=False)
+
+    def read_table(self, table):
+        frames = []
+        for folder in sorted(self.folders):
+            filepath = self.partition_path(table, folder)
+            if os.path.exists(filepath):
+                frames.append(pd.read_parquet(filepath))
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True)
+
+    def remove_folder(self, folder):
+        for table in ("filtered", "report"):
+            self.write_partition(table, folder, None)
+        del self.folders[folder]
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.state_filepath, "w") as file:
+            json.dump(
+                {"version": STATE_VERSION, "folders": self.folders},
+                file,
+                indent=1,
+                sort_keys=True,
+            )
+
+
+def folder_signatures(folder_path, previous):
+    return {
+        filename: file_signature(
+            os.path.join(folder_path, filename), previous.get(filename)
+        )
+        for filename in (INSTRUCTIONS_FILENAME, REPORT_FILENAME)
+    }
+
+
+def ingest_folder(base_dir, folder):
+    # Runs on a worker thread; pandas releases the GIL while parsing
+    folder_path = os.path.join(base_dir, folder)
+    filtered_df = None
+    report_df = None
+
+    csv_file_path = os.path.join(folder_path, INSTRUCTIONS_FILENAME)
+    if os.path.exists(csv_file_path):
+        filtered_df = filter_openasip_instructions(csv_file_path, folder)
+
+    report_file_path = os.path.join(folder_path, REPORT_FILENAME)
+    if os.path.exists(report_file_path):
+        report_df = extract_report_data(report_file_path)
+
+    return folder, filtered_df, report_df
+
+
+def model_folders(base_dir):
+    # Model folders hold at least one of the two CSVs, which also keeps out
+    # the store and the __pycache__ of the scripts living next to them
+    return sorted(
+        folder
+        for folder in os.listdir(base_dir)
+        if not folder.startswith((".", "__"))
+        and any(
+            os.path.isfile(os.path.join(base_dir, folder, filename))
+            for filename in (INSTRUCTIONS_FILENAME, REPORT_FILENAME)
+        )
+    )
+
+
+def aggregate_results(base_dir, max_workers=None, force=False):
+    """Refresh filtered_data.csv and merged_report_data.csv.
+
+    Only model folders whose input CSVs changed since the last run are
+    parsed again, the others are served from their stored partition.
+    """
+    store = ResultsStore(base_dir)
+
+    folders = model_folders(base_dir)
+
+    changed = []
+    signatures = {}
+    for folder in folders:
+        previous = store.folders.get(folder, {})
+        signature = folder_signatures(os.path.join(base_dir, folder), previous)
+        signatures[folder] = signature
+        if force or folder not in store.folders:
+            changed.append(folder)
+        elif any(
+            not same_content(signature[filename], previous.get(filename))
+            for filename in signature
+        ):
+            changed.append(folder)
+        else:
+            # Keeps the new mtimes so that the next run does not hash again
+            store.folders[folder] = signature
+
+    removed = [folder for folder in store.folders if folder not in signatures]
+    for folder in removed:
+        print(f"Removing results of deleted folder {folder}")
+        store.remove_folder(folder)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for folder, filtered_df, report_df in executor.map(
+            lambda folder: ingest_folder(base_dir, folder), changed
+        ):
+            print(f"Ingested {folder}")
+            if filtered_df is None:
+                print(f"{INSTRUCTIONS_FILENAME} not found in {folder}")
+            if report_df is None:
+                print(f"{REPORT_FILENAME} not found in {folder}")
+            store.write_partition("filtered", folder, filtered_df)
+            store.write_partition("report", folder, report_df)
+            store.folders[folder] = signatures[folder]
+
+    store.save()
+    print(
+        f"{len(changed)} changed, {len(folders) - len(changed)} unchanged, "
+        f"{len(removed)} removed folders"
+    )
+
+    outputs = (
+        ("filtered", FILTERED_OUTPUT_FILENAME),
+        ("report", REPORT_OUTPUT_FILENAME),
+    )
+    for table, output_filename in outputs:
+        output_filepath = os.path.join(base_dir, output_filename)
+        if not (changed or removed) and os.path.exists(output_filepath):
+            print(f"{output_filepath} is up to date")
+            continue
+        df = store.read_table(table)
+        if df is None:
+            print(f"No {table} data to save.")
+            continue
+        df.to_csv(output_filepath, index=False)
+        print(f"All {table} data saved to {output_filepath}")
+
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge the benchmark results of all model folders"
+    )
+    parser.add_argument(
+        "base_dir",
+        nargs="?",
+        default=os.path.dirname(os.path.abspath(__file__)),
+        help="Results directory containing one folder per model",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="Number of reader threads"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-ingest every folder instead of only the changed ones",
+    )
+    args = parser.parse_args()
+
+    aggregate_results(args.base_dir, max_workers=args.jobs, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+
+FILTERED_FILENAME = "filtered_data.csv"
+REPORT_FILENAME = "merged_report_data.csv"
+SUMMARY_FILENAME = "speedup_summary.csv"
+OPERATIONS_FILENAME = "speedup_operations.csv"
+JSON_FILENAME = "speedup_summary.json"
+
+
+def geometric_mean(values):
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values) & (values > 0)]
+    if not values.size:
+        return float("nan")
+    return float(np.exp(np.log(values).mean()))
+
+
+def model_speedups(report, baseline_run=0):
+    """One row per model and non-baseline run, relative to the baseline run.
+
+    Total Cycles (rel.) is already relative to the first run of a session,
+    the absolute columns are compared against the baseline row explicitly.
+    """
+    absolute = ["Total Instructions", "Total ROM", "Total RAM"]
+    baseline = report[report["Run"] == baseline_run].drop_duplicates("Model")
+    baseline = baseline.set_index("Model")[absolute + ["Total Cycles (rel.)"]]
+    variants = report[report["Run"] != baseline_run]
+
+    df = variants.join(baseline, on="Model", rsuffix=" (baseline)")
+    df = df.dropna(subset=["Total Instructions (baseline)"])
+
+    summary = pd.DataFrame(
+        {
+            "Model": df["Model"],
+            "Run": df["Run"],
+            "speedup": df["Total Cycles (rel.) (baseline)"] / df["Total Cycles (rel.)"],
+            "instructions_saved": df["Total Instructions (baseline)"]
+            - df["Total Instructions"],
+            "rom_delta": df["Total ROM"] - df["Total ROM (baseline)"],
+            "rom_delta_rel": df["Total ROM"] / df["Total ROM (baseline)"] - 1,
+            "ram_delta": df["Total RAM"] - df["Total RAM (baseline)"],
+            "ram_delta_rel": df["Total RAM"] / df["Total RAM (baseline)"] - 1,
+        }
+    )
+    return summary.sort_values(["Model", "Run"]).reset_index(drop=True)
+
+
+def operation_savings(filtered, summary):
+    """Attribute the instructions saved per model to its custom operations.
+
+    Within a model, the saving is split by the share of each custom
+    instruction in the dynamic custom instruction count. Models whose
+    custom build executes more instructions have a negative saving, which
+    is attributed the same way, so attributed_savings of an operation is
+    the net number of instructions it saved over all models.
+
+    savings_share is the attributed saving relative to the sum of the
+    absolute attributed savings of all operations. The magnitudes add up to
+    1, a negative share is the part of the total effect that was a loss.
+    """
+    saved = summary.groupby("Model")["instructions_saved"].max()
+    df = filtered.join(saved, on="Model", how="inner")
+    df["share"] = df["Count"] / df.groupby("Model")["Count"].transform("sum")
+    df["attributed_savings"] = df["share"] * df["instructions_saved"]
+
+    operations = df.groupby("Sequence").agg(
+        models=("Model", "nunique"),
+        count=("Count", "sum"),
+        mean_probability=("Probability", "mean"),
+        attributed_savings=("attributed_savings", "sum"),
+    )
+    operations["savings_share"] = (
+        operations["attributed_savings"] / operations["attributed_savings"].abs().sum()
+    )
+    operations = operations.sort_values("attributed_savings", ascending=False)
+    return operations.reset_index()
+
+
+def analyse(base_dir, baseline_run=0):
+    report = pd.read_csv(os.path.join(base_dir, REPORT_FILENAME))
+    filtered = pd.read_csv(os.path.join(base_dir, FILTERED_FILENAME))
+
+    summary = model_speedups(report, baseline_run)
+    operations = operation_savings(filtered, summary)
+    overall = {
+        "models": int(summary["Model"].nunique()),
+        "geomean_speedup": geometric_mean(summary["speedup"]),
+        "geomean_rom_rel": geometric_mean(1 + summary["rom_delta_rel"]),
+        "geomean_ram_rel": geometric_mean(1 + summary["ram_delta_rel"]),
+        "instructions_saved": int(summary["instructions_saved"].sum()),
+    }
+    return summary, operations, overall
+
+
+def save(base_dir, summary, operations, overall):
+    summary.to_csv(os.path.join(base_dir, SUMMARY_FILENAME), index=False)
+    operations.to_csv(os.path.join(base_dir, OPERATIONS_FILENAME), index=False)
+    data = {
+        "overall": overall,
+        "models": summary.to_dict(orient="records"),
+        "operations": operations.to_dict(orient="records"),
+    }
+    json_filepath = os.path.join(base_dir, JSON_FILENAME)
+    with open(json_filepath, "w") as file:
+        json.dump(data, file, indent=1)
+    return json_filepath
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Speedup, code size and per-operation savings of the custom instructions"
+    )
+    parser.add_argument(
+        "base_dir",
+        nargs="?",
+        default=os.path.dirname(os.path.abspath(__file__)),
+        help="Results directory with filtered_data.csv and merged_report_data.csv",
+    )
+    parser.add_argument(
+        "--baseline-run", type=int, default=0, help="Run without custom instructions"
+    )
+    args = parser.parse_args()
+
+    summary, operations, overall = analyse(args.base_dir, args.baseline_run)
+
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        print(summary.to_string(index=False, float_format="{:.4f}".format))
+        print()
+        print(operations.to_string(index=False, float_format="{:.4f}".format))
+    print()
+    print(f"Geometric mean speedup over {overall['models']} models: {overall['geomean_speedup']:.4f}")
+    print(f"Geometric mean ROM: {overall['geomean_rom_rel']:.4f}, RAM: {overall['geomean_ram_rel']:.4f}")
+
+    json_filepath = save(args.base_dir, summary, operations, overall)
+    print(f"Summary saved to {json_filepath}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import argparse
+import mmap
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# ETISS log_instrs lines: "0x0000000000002f4c: c.addi # 0x... [rs1_rd=1 | imm=1]"
+INSTRUCTION_PATTERN = re.compile(rb"(?m)^\s*0x[0-9a-fA-F]+:?\s+([\w.]+)")
+
+CHUNK_SIZE = 1 << 20  # instructions per counting step
+EXACT_MAX_N = 3
+
+# Instructions after which a sequence can not be fused into one, without the
+# c. prefix of the compressed forms, see is_fusable. Disassemblers print some
+# of them as pseudo-instructions (j, jr, ret, call, tail, beqz, ...)
+CONTROL_FLOW = {
+    "beq", "bne", "blt", "bge", "bltu", "bgeu", "jal", "jalr",
+    "beqz", "bnez", "blez", "bgez", "bltz", "bgtz",
+    "bgt", "ble", "bgtu", "bleu",
+    "j", "jr", "ret", "call", "tail",
+    "ecall", "ebreak", "mret", "sret", "uret", "wfi",
+}
+
+# Known OpenASIP operations a sequence can be replaced with
+FUSION_PATTERNS = {
+    ("slli", "add"): "SHL1ADD/SHL2ADD",
+    ("mul", "add"): "MAC",
+    ("mul", "sub"): "MSU",
+    ("xor", "sltiu"): "EQ",
+    ("slt", "xori"): "GE",
+    ("srli", "andi"): "EXTRACT",
+}
+
+
+def iter_mnemonics(filepath):
+    """Yield the mnemonics of an instruction log without reading it into memory."""
+    with open(filepath, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for match in INSTRUCTION_PATTERN.finditer(data):
+                yield match.group(1).decode()
+
+
+class Vocabulary:
+    """Interns mnemonics as small integers."""
+
+    def __init__(self, strip_compressed=True):
+        self.strip_compressed = strip_compressed
+        self.ids = {}
+        self.names = []
+
+    def id(self, mnemonic):
+        if self.strip_compressed and mnemonic.startswith("c."):
+            mnemonic = mnemonic[2:]
+        index = self.ids.get(mnemonic)
+        if index is None:
+            index = self.ids[mnemonic] = len(self.names)
+            self.names.append(mnemonic)
+        return index
+
+
+def ngram_keys(ids, n):
+    # 64-bit key per window; exact packing while it fits, a multiplicative
+    # hash otherwise
+    count = len(ids) - n + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.uint64)
+    keys = np.zeros(count, dtype=np.uint64)
+    bits = 64 // n
+    with np.errstate(over="ignore"):
+        for j in range(n):
+            window = ids[j : j + count].astype(np.uint64)
+            if bits >= 16:
+                keys |= window << np.uint64(bits * j)
+            else:
+                keys = keys * np.uint64(0x9E3779B97F4A7C15) + window
+    return keys
+
+
+class CountMinSketch:
+    def __init__(self, width=1 << 20, depth=4, seed=0):
+        random = np.random.default_rng(seed)
+        self.width = width
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        # Odd multipliers, one multiplicative hash per row
+        self.multipliers = random.integers(
+            1, 2**63 - 1, size=depth, dtype=np.uint64
+        ) | np.uint64(1)
+        self.shift = np.uint64(64 - int(np.log2(width)))
+
+    def _indexes(self, keys, row):
+        with np.errstate(over="ignore"):
+            return ((keys * self.multipliers[row]) >> self.shift).astype(np.int64)
+
+    def add(self, keys):
+        for row in range(len(self.table)):
+            self.table[row] += np.bincount(
+                self._indexes(keys, row), minlength=self.width
+            )
+
+    def estimate(self, keys):
+        estimates = [
+            self.table[row][self._indexes(keys, row)] for row in range(len(self.table))
+        ]
+        return np.min(estimates, axis=0)
+
+
+class NgramCounter:
+    """Counts n-grams of one length over a stream of mnemonic ids.
+
+    Up to EXACT_MAX_N the counts are exact. Longer n-grams go into a
+    count-min sketch; only the heaviest candidates of each chunk are kept
+    by name, so memory stays bounded by the sketch and the candidate limit.
+    """
+
+    def __init__(self, n, exact=True, candidates=10000):
+        self.n = n
+        self.exact = exact
+        self.candidate_limit = candidates
+        self.counts = {}  # key -> count, exact mode
+        self.sketch = None if exact else CountMinSketch()
+        self.candidates = {}  # key -> id tuple
+        self.total = 0
+
+    def update(self, ids):
+        keys = ngram_keys(ids, self.n)
+        if not keys.size:
+            return
+        self.total += keys.size
+        unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+
+        if self.exact:
+            for key, start, count in zip(unique.tolist(), first.tolist(), counts.tolist()):
+                if key in self.counts:
+                    self.counts[key] += count
+                else:
+                    self.counts[key] = count
+                    self.candidates[key] = tuple(ids[start : start + self.n].tolist())
+            return
+
+        self.sketch.add(keys)
+        heaviest = np.argsort(counts)[::-1][: self.candidate_limit]
+        for index in heaviest.tolist():
+            key = int(unique[index])
+            if key not in self.candidates:
+                start = int(first[index])
+                self.candidates[key] = tuple(ids[start : start + self.n].tolist())
+        if len(self.candidates) > 2 * self.candidate_limit:
+            self._prune()
+
+    def _prune(self):
+        keys = np.fromiter(self.candidates, dtype=np.uint64)
+        estimates = self.sketch.estimate(keys)
+        keep = np.argsort(estimates)[::-1][: self.candidate_limit]
+        self.candidates = {
+            int(keys[index]): self.candidates[int(keys[index])] for index in keep.tolist()
+        }
+
+    def most_common(self, top):
+        keys = list(self.candidates)
+        if self.exact:
+            counts = [self.counts[key] for key in keys]
+        else:
+            counts = self.sketch.estimate(np.array(keys, dtype=np.uint64)).tolist()
+        order = np.argsort(counts, kind="stable")[::-1][:top]
+        return [(self.candidates[keys[index]], counts[index]) for index in order.tolist()]
+
+
+def count_ngrams(mnemonics, depths, vocabulary, chunk_size=CHUNK_SIZE, candidates=10000):
+    counters = {
+        n: NgramCounter(n, exact=n <= EXACT_MAX_N, candidates=candidates)
+        for n in depths
+    }
+    overlap = max(depths) - 1
+    buffer = []
+    carried = 0  # leading ids already counted in the previous chunk
+
+    def flush(ids, carried):
+        ids = np.array(ids, dtype=np.int32)
+        for n, counter in counters.items():
+            # Skip windows that were complete in the previous chunk
+            counter.update(ids[max(0, carried - n + 1) :])
+
+    for mnemonic in mnemonics:
+        buffer.append(vocabulary.id(mnemonic))
+        if len(buffer) >= chunk_size:
+            flush(buffer, carried)
+            buffer = buffer[len(buffer) - overlap :] if overlap else []
+            carried = len(buffer)
+    if len(buffer) > carried or not carried:
+        flush(buffer, carried)
+    return counters
+
+
+def is_fusable(sequence):
+    # Control flow may only end a sequence. The names are compared without
+    # c., so it does not matter whether the vocabulary stripped it
+    return not any(
+        mnemonic.removeprefix("c.") in CONTROL_FLOW for mnemonic in sequence[:-1]
+    )
+
+
+def fusion_candidates(counters, vocabulary, top=50):
+    records = []
+    for n, counter in counters.items():
+        for ids, count in counter.most_common(top * 4):
+            sequence = tuple(vocabulary.names[i] for i in ids)
+            if not is_fusable(sequence):
+                continue
+            records.append(
+                {
+                    "n": n,
+                    "Sequence": "-".join(sequence),
+                    "Count": int(count),
+                    "Probability": count / counter.total if counter.total else 0.0,
+                    "Exact": counter.exact,
+                    "Operation": FUSION_PATTERNS.get(sequence, ""),
+                }
+            )
+    df = pd.DataFrame(
+        records, columns=["n", "Sequence", "Count", "Probability", "Exact", "Operation"]
+    )
+    return df.groupby("n", group_keys=False).head(top).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find fusable instruction sequences in an ETISS instruction log"
+    )
+    parser.add_argument("trace", help="Instruction log written by log_instrs")
+    parser.add_argument(
+        "--depths",
+        type=int,
+        nargs="+",
+        default=[2, 3],
+        help="Sequence lengths to count",
+    )
+    parser.add_argument("--top", type=int, default=20, help="Sequences per length")
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=10000,
+        help="Tracked candidates per length for the approximate counts",
+    )
+    parser.add_argument(
+        "--keep-compressed",
+        action="store_true",
+        help="Count c.* instructions separately from their full size form",
+    )
+    parser.add_argument(
+        "--output-directory",
+        type=str,
+        default=None,
+        help="Write analyse_instructions_seq<n>.csv files to this directory",
+    )
+    args = parser.parse_args()
+
+    vocabulary = Vocabulary(strip_compressed=not args.keep_compressed)
+    counters = count_ngrams(
+        iter_mnemonics(args.trace),
+        sorted(set(args.depths)),
+        vocabulary,
+        candidates=args.candidates,
+    )
+    df = fusion_candidates(counters, vocabulary, args.top)
+
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        print(df.to_string(index=False, float_format="{:.4f}".format))
+
+    if args.output_directory is not None:
+        os.makedirs(args.output_directory, exist_ok=True)
+        for n, group in df.groupby("n"):
+            output_filepath = os.path.join(
+                args.output_directory, f"analyse_instructions_seq{n}.csv"
+            )
+            group[["Sequence", "Count", "Probability"]].to_csv(
+                output_filepath, index=False
+            )
+            print(f"Saved {output_filepath}")
+
+
+if __name__ == "__main__":
+    main()
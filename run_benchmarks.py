@@ -0,0 +1,227 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+
+RESULTS_DIRECTORY = "results"
+MLONMCU_HOME = "tmp/mlonmcu_env"
+STATE_FILENAME = ".benchmark_state.json"
+
+DEFAULT_CONFIG_GEN = ["_", "etiss.attr=+xopenasipbase"]
+LLVM_INSTALL_DIR = "/home/lithegreat/project/ba/build/seal5_llvm_openasip/.seal5/build/release"
+ETISS_SCRIPT = "/home/lithegreat/project/ba/toolchain/etiss/build/bin/run_helper.sh"
+
+
+def flow_command(model, label, args):
+    # Same flow as run_benchmarks.sh; the comment tags the session of this job
+    command = [
+        "python3", "-m", "mlonmcu.cli.main", "flow", "run", model,
+        "--target", "etiss",
+        "-c", "mlif.toolchain=llvm",
+        "-c", "mlif.extend_attrs=1",
+        "-c", "mlif.global_isel=1",
+        "--post", "compare_rows",
+        "-c", "compare_rows.to_compare=Total Cycles,Total ROM,Total RAM",
+        "--parallel", str(args.parallel),
+        "-c", f"llvm.install_dir={args.llvm_install_dir}",
+    ]
+    for config_gen in args.config_gen:
+        command += ["--config-gen", config_gen]
+    command += [
+        "-c", f"etissvp.script={args.etiss_script}",
+        "-f", "log_instrs", "-c", "log_instrs.to_file=1",
+        "--post", "analyse_instructions",
+        "-c", "analyse_instructions.top=1000",
+        "-c", "analyse_instructions.seq_depth=1",
+        "--post", "filter_cols",
+        "-c", "filter_cols.drop=Platform,Total Cycles,Total CPI,ROM read-only,ROM code,ROM misc,RAM data,RAM zero-init data,Validation",
+        "--comment", label,
+    ]
+    return command
+
+
+def find_session(sessions_directory, label, started):
+    """Session directory whose report carries the comment of a job.
+
+    Jobs run concurrently, so sessions/latest may belong to any of them.
+    """
+    candidates = []
+    for report_filepath in glob.glob(
+        os.path.join(sessions_directory, "*", "report.csv")
+    ):
+        session_directory = os.path.dirname(report_filepath)
+        if os.path.basename(session_directory) == "latest":
+            continue
+        if os.path.getmtime(report_filepath) < started:
+            continue
+        try:
+            report = pd.read_csv(report_filepath, usecols=["Comment"])
+        except (ValueError, OSError):
+            continue
+        if (report["Comment"].astype(str) == label).any():
+            candidates.append((os.path.getmtime(report_filepath), session_directory))
+    if not candidates:
+        return None
+    return max(candidates)[1]
+
+
+class BenchmarkState:
+    """Status of every model of a sweep, saved after each change."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(filepath):
+            with open(filepath, "r") as file:
+                self.jobs = json.load(file)
+
+    def is_done(self, model):
+        return self.jobs.get(model, {}).get("status") == "done"
+
+    def update(self, model, **fields):
+        with self.lock:
+            self.jobs.setdefault(model, {}).update(fields)
+            temporary_filepath = f"{self.filepath}.tmp"
+            with open(temporary_filepath, "w") as file:
+                json.dump(self.jobs, file, indent=1, sort_keys=True)
+            # Atomic, a crash never leaves a truncated state file behind
+            os.replace(temporary_filepath, self.filepath)
+
+
+def run_benchmark(model, args, state):
+    label = f"{model}-{uuid.uuid4().hex[:8]}"
+    log_directory = os.path.join(args.mlonmcu_home, "benchmark_logs")
+    os.makedirs(log_directory, exist_ok=True)
+    log_filepath = os.path.join(log_directory, f"{label}.log")
+
+    state.update(model, status="running", label=label, log=log_filepath)
+    started = time.time()
+    with open(log_filepath, "w") as log:
+        returncode = subprocess.call(
+            flow_command(model, label, args), stdout=log, stderr=subprocess.STDOUT
+        )
+    if returncode != 0:
+        state.update(model, status="failed", returncode=returncode)
+        return model, f"mlonmcu exited with {returncode}, see {log_filepath}"
+
+    sessions_directory = os.path.join(args.mlonmcu_home, "temp", "sessions")
+    session_directory = find_session(sessions_directory, label, started)
+    if session_directory is None:
+        state.update(model, status="failed")
+        return model, f"No session with comment {label} in {sessions_directory}"
+
+    output_directory = os.path.join(args.results_directory, model)
+    os.makedirs(output_directory, exist_ok=True)
+    shutil.copyfile(
+        os.path.join(session_directory, "report.csv"),
+        os.path.join(output_directory, "report.csv"),
+    )
+    analysis_filepath = os.path.join(
+        session_directory,
+        "runs",
+        str(args.analysis_run),
+        "analyse_instructions_seq1.csv",
+    )
+    if os.path.exists(analysis_filepath):
+        shutil.copyfile(
+            analysis_filepath,
+            os.path.join(output_directory, "analyse_instructions_seq1.csv"),
+        )
+    else:
+        print(f"{analysis_filepath} not found")
+
+    state.update(model, status="done", session=session_directory)
+    return model, None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the mlonmcu benchmark flow for many models in parallel"
+    )
+    parser.add_argument(
+        "models",
+        nargs="*",
+        help="Models to benchmark (default: every folder in the results directory)",
+    )
+    parser.add_argument(
+        "--config-gen",
+        action="append",
+        default=None,
+        help="Config-gen variant, may be repeated (default: _ and etiss.attr=+xopenasipbase)",
+    )
+    parser.add_argument(
+        "--analysis-run",
+        type=int,
+        default=None,
+        help="Run whose analyse_instructions output is collected (default: the last variant)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of concurrent flows (default: cores / --parallel)",
+    )
+    parser.add_argument(
+        "--parallel", type=int, default=4, help="mlonmcu --parallel of each flow"
+    )
+    parser.add_argument("--results-directory", type=str, default=RESULTS_DIRECTORY)
+    parser.add_argument("--mlonmcu-home", type=str, default=MLONMCU_HOME)
+    parser.add_argument("--llvm-install-dir", type=str, default=LLVM_INSTALL_DIR)
+    parser.add_argument("--etiss-script", type=str, default=ETISS_SCRIPT)
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run models again that already finished in a previous sweep",
+    )
+    args = parser.parse_args()
+
+    if args.config_gen is None:
+        args.config_gen = DEFAULT_CONFIG_GEN
+    if args.analysis_run is None:
+        args.analysis_run = len(args.config_gen) - 1
+
+    models = args.models or sorted(
+        folder
+        for folder in os.listdir(args.results_directory)
+        if os.path.isdir(os.path.join(args.results_directory, folder))
+        # Store of the aggregator and __pycache__ of the result scripts
+        and not folder.startswith((".", "__"))
+    )
+
+    state = BenchmarkState(os.path.join(args.results_directory, STATE_FILENAME))
+    pending = [model for model in models if args.force or not state.is_done(model)]
+    for model in models:
+        if model not in pending:
+            print(f"Skipping {model}, already done")
+
+    jobs = args.jobs or max(1, (os.cpu_count() or 1) // args.parallel)
+    print(f"Running {len(pending)} models with {jobs} concurrent flows")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(run_benchmark, model, args, state) for model in pending
+        ]
+        for future in as_completed(futures):
+            model, error = future.result()
+            if error is None:
+                print(f"Files have been copied to path: {args.results_directory}/{model}")
+            else:
+                print(f"Error: {model}: {error}")
+                failed.append(model)
+
+    if failed:
+        print(f"{len(failed)} models failed: {', '.join(sorted(failed))}")
+        print("Run the same command again to retry them")
+
+
+if __name__ == "__main__":
+    main()
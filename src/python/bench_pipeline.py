@@ -0,0 +1,193 @@
+import argparse
+import io
+import json
+import os
+import subprocess
+import tempfile
+import time
+from contextlib import redirect_stdout
+from oppToTable import OperationParser
+from gen_op_coredsl import GenerationContext, generate_instruction_set
+from pipeline_profile import profiler
+
+DEFAULT_SIZES = [100, 1000, 10000]
+
+# (trigger body, inputs, outputs) of the synthetic base operations
+BASE_TEMPLATES = {
+    "ADD": ("IO(3) = UINT(1) + UINT(2);", 2, 1),
+    "SUB": ("IO(3) = UINT(1) - UINT(2);", 2, 1),
+    "SHL": ("IO(3) = UINT(1) << UINT(2);", 2, 1),
+    "MIN": (
+        "SIntWord in1 = static_cast<SIntWord>(INT(1));\n"
+        "    SIntWord in2 = static_cast<SIntWord>(INT(2));\n"
+        "    IO(3) = static_cast<SIntWord>((in1 < in2) ? in1 : in2);",
+        2,
+        1,
+    ),
+    "DIV": (
+        'if (UINT(2) == 0) RUNTIME_ERROR("Divide by zero.");\n'
+        "    IO(3) = static_cast<SIntWord>(UINT(1)) / static_cast<SIntWord>(UINT(2));",
+        2,
+        1,
+    ),
+    "MAC": ("IO(4) = UINT(1) + UINT(2) * UINT(3);", 3, 1),
+}
+
+OPERAND = '    <{kind} element-count="1" element-width="32" id="{id}" type="SIntWord"/>\n'
+
+
+def synthetic_opset(directory, size, filename="synthetic"):
+    """Write an .opp/.cc pair with size operations.
+
+    Three quarters are base operations with a trigger body, the rest are
+    composites of two of them, like SHL1ADD in the base opset.
+    """
+    opp = ['<?xml version="1.0" encoding="ISO-8859-1" standalone="no" ?>\n<osal version="0.1">\n']
+    cc = ['#include "OSAL.hh"\n\n']
+    templates = list(BASE_TEMPLATES.items())
+    bases = []
+    for i in range(size):
+        if i % 4 == 3 and len(bases) >= 2:
+            name = f"FUSED{i}"
+            first, second = bases[i % len(bases)], bases[(i * 7) % len(bases)]
+            semantics = (
+                "      SimValue t1;\n"
+                f"      EXEC_OPERATION({first.lower()}, IO(1), IO(2), t1);\n"
+                f"      EXEC_OPERATION({second.lower()}, t1, IO(2), IO(3));\n"
+            )
+            inputs, outputs = 2, 1
+        else:
+            kind, (body, inputs, outputs) = templates[i % len(templates)]
+            name = f"{kind}{i}"
+            semantics = None
+            if inputs == 2:
+                bases.append(name)
+            cc.append(
+                f"OPERATION({name})\n\nTRIGGER\n    {body}\n    return true;\n"
+                f"END_TRIGGER;\n\nEND_OPERATION({name})\n\n"
+            )
+
+        opp.append("  <operation>\n")
+        opp.append(f"    <name>{name}</name>\n")
+        opp.append(f"    <description>Synthetic operation {i}.</description>\n")
+        opp.append(f"    <inputs>{inputs}</inputs>\n    <outputs>{outputs}</outputs>\n")
+        if semantics:
+            opp.append(f"    <trigger-semantics>\n{semantics}    </trigger-semantics>\n")
+        for operand in range(1, inputs + 1):
+            opp.append(OPERAND.format(kind="in", id=operand))
+        for operand in range(inputs + 1, inputs + outputs + 1):
+            opp.append(OPERAND.format(kind="out", id=operand))
+        opp.append("  </operation>\n")
+    opp.append("</osal>\n")
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{filename}.opp"), "w") as file:
+        file.write("".join(opp))
+    with open(os.path.join(directory, f"{filename}.cc"), "w") as file:
+        file.write("".join(cc))
+    return filename
+
+
+def run_pipeline(directory, filename, output_directory):
+    # The same stages main.py runs for one opset, without the table export
+    operation_parser = OperationParser(directory=directory)
+    operation_parser.load_operations()
+    filtered_operations = operation_parser.filter_operations()
+    context = GenerationContext(
+        filtered_operations[filename],
+        filename,
+        trigger_filepath=os.path.join(directory, f"{filename}.cc"),
+        # Random opsets, an index on disk would never be read again
+        cache_directory=None,
+    )
+    generate_instruction_set(None, output_directory, context=context, incremental=False)
+
+
+def benchmark(size, repeat, memory=False):
+    """Best-of-repeat stage timings of the pipeline on a synthetic opset.
+
+    The timed runs do not trace memory. With memory, one more run traces it
+    and only its peaks are kept.
+    """
+    best = None
+    with tempfile.TemporaryDirectory() as directory:
+        opset_directory = os.path.join(directory, "opset")
+        filename = synthetic_opset(opset_directory, size)
+        output_directory = os.path.join(directory, "cdsl")
+        profiler.enable()
+        for _ in range(repeat):
+            profiler.reset()
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                run_pipeline(opset_directory, filename, output_directory)
+            total = time.perf_counter() - start
+            if best is None or total < best["total"]:
+                best = {"total": total, "stages": dict(profiler.stages)}
+        if memory:
+            profiler.reset()
+            profiler.enable(memory=True)
+            with redirect_stdout(io.StringIO()):
+                run_pipeline(opset_directory, filename, output_directory)
+            for name, stats in profiler.stages.items():
+                if name in best["stages"]:
+                    best["stages"][name]["peak"] = stats["peak"]
+        profiler.disable()
+    return best
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the generation pipeline on synthetic opsets of growing size"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size, the best one counts")
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Append the results as one JSON line to this file",
+    )
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Also measure the peak memory of every stage, in a separate run",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        result = benchmark(size, args.repeat, memory=args.memory)
+        results[size] = result
+        print(f"\n{size} operations: {result['total']:.3f} s")
+        profiler.stages = result["stages"]
+        print(profiler.report())
+
+    stages = sorted({stage for result in results.values() for stage in result["stages"]})
+    print("\nScaling (seconds per stage):")
+    print(f"{'stage':<28}" + "".join(f"{size:>10}" for size in args.sizes))
+    for name in stages:
+        row = [results[size]["stages"].get(name, {}).get("seconds", 0.0) for size in args.sizes]
+        print(f"{name:<28}" + "".join(f"{seconds:>10.3f}" for seconds in row))
+
+    if args.output:
+        record = {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": {str(size): result for size, result in results.items()},
+        }
+        with open(args.output, "a") as file:
+            file.write(json.dumps(record) + "\n")
+        print(f"Results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,632 @@
+import argparse
+import time
+import numpy as np
+from cdsl_parser import (
+    Assign,
+    Binary,
+    Block,
+    Call,
+    Cast,
+    CType,
+    Declare,
+    ExprStatement,
+    If,
+    Index,
+    INT,
+    Name,
+    Number,
+    SizeOf,
+    Slice,
+    Ternary,
+    UNSIGNED_LONG,
+    Unary,
+    parse_instruction_set,
+)
+
+XLEN = 32
+REGISTER = CType(False, XLEN)  # X is unsigned<XLEN> in the RISC-V core description
+BOOL = CType(False, 1)  # result of comparisons and logical operators
+OPERAND_FIELDS = ("rs1", "rs2", "rs3", "rd")
+MEMORY = "MEM"  # byte-addressed, MEM[a + 3:a] is the little-endian word at a
+
+
+class EvaluationError(Exception):
+    pass
+
+
+class Value:
+    """A batch of integers of one type, one element per lane.
+
+    Values narrower than 64 bits and signed 64-bit values live in int64
+    arrays, unsigned 64-bit values in uint64 arrays and wider values in
+    object arrays of Python ints, always in the range of their type.
+    """
+
+    def __init__(self, data, ctype):
+        self.data = data
+        self.ctype = ctype
+
+    def bits(self):
+        # Low 64 bits, two's complement
+        return low_bits(self.data)
+
+
+def low_bits(data):
+    data = np.asarray(data)
+    if data.dtype == object:
+        return (data & ((1 << 64) - 1)).astype(np.uint64)
+    return data.astype(np.uint64)
+
+
+def wrap(data, ctype):
+    """Truncate two's complement data to ctype, like an assignment or a cast."""
+    width = ctype.width
+    if width > 64:
+        values = np.asarray(data).astype(object) & ((1 << width) - 1)
+        if ctype.signed:
+            sign = 1 << (width - 1)
+            values = (values ^ sign) - sign
+        return Value(values, ctype)
+    bits = low_bits(data)
+    if width < 64:
+        bits &= np.uint64((1 << width) - 1)
+        values = bits.astype(np.int64)
+        if ctype.signed:
+            sign = np.int64(1 << (width - 1))
+            values = (values ^ sign) - sign
+        return Value(values, ctype)
+    if ctype.signed:
+        return Value(bits.view(np.int64), ctype)
+    return Value(bits, ctype)
+
+
+def signed_type(ctype):
+    # Smallest signed type holding every value of ctype
+    return ctype if ctype.signed else CType(True, ctype.width + 1)
+
+
+def common_type(a, b):
+    """Smallest type holding every value of a and of b."""
+    if a.signed != b.signed:
+        a, b = signed_type(a), signed_type(b)
+    return a if a.width >= b.width else b
+
+
+def result_type(op, a, b):
+    """Type of a binary arithmetic or bitwise operation in CoreDSL.
+
+    Unlike C, the result is wide enough for every result of the operation,
+    so arithmetic never wraps; values are truncated by casts and
+    assignments only.
+    """
+    if op == "+" and a.signed == b.signed:
+        return CType(a.signed, max(a.width, b.width) + 1)
+    if op in ("+", "-"):
+        a, b = signed_type(a), signed_type(b)
+        return CType(True, max(a.width, b.width) + 1)
+    if op == "*":
+        return CType(a.signed or b.signed, a.width + b.width)
+    if op == "/":
+        # Dividing by -1 negates the dividend
+        if b.signed:
+            return CType(True, a.width + 1)
+        return a
+    if op == "%":
+        # The remainder has the sign of the dividend and is smaller than
+        # the divisor
+        if a.signed:
+            return CType(True, min(a.width, b.width if b.signed else b.width + 1))
+        return CType(False, max(min(a.width, b.width - 1 if b.signed else b.width), 1))
+    if op in ("&", "|", "^"):
+        return common_type(a, b)
+    raise EvaluationError(f"Unsupported operator {op}")
+
+
+def exact(*values):
+    # Arrays of the values themselves: int64 if every value fits in it with
+    # room to spare, Python ints otherwise
+    if all(value.ctype.width < 64 for value in values):
+        return [value.data for value in values]
+    return [value.data.astype(object) for value in values]
+
+
+def boolean(mask):
+    return Value(mask.astype(np.int64), BOOL)
+
+
+def truth(value):
+    return value.data != 0
+
+
+def divide(a, b, remainder):
+    # Division truncates toward zero. RISC-V semantics where CoreDSL leaves
+    # the result undefined: x / 0 is all ones, x % 0 is x
+    zero = b == 0
+    safe = np.where(zero, 1, b)
+    quotient = np.abs(a) // np.abs(safe)
+    quotient = np.where((a < 0) != (safe < 0), -quotient, quotient)
+    if remainder:
+        return np.where(zero, a, a - quotient * safe)
+    return np.where(zero, -1, quotient)
+
+
+def shift(op, value, amount):
+    """value << amount or value >> amount in CoreDSL.
+
+    The result keeps the type of value and the amount is not masked:
+    shifting by the width or more leaves 0, or -1 for >> of a negative
+    value. A negative amount shifts the other way.
+    """
+    ctype = value.ctype
+    limit = max(ctype.width, 64) + 1
+    amount = amount.data
+    if amount.dtype == np.uint64:
+        amount = np.minimum(amount, np.uint64(limit))
+    else:
+        amount = np.clip(amount, -limit, limit)
+    amount = amount.astype(np.int64)
+    if op == ">>":
+        amount = -amount
+    # Positive amounts shift left from here on
+    if ctype.width > 64:
+        data = value.data.astype(object)
+        left = data << np.maximum(amount, 0).astype(object)
+        right = data >> np.maximum(-amount, 0).astype(object)
+        return wrap(np.where(amount >= 0, left, right), ctype)
+
+    bits = value.bits()
+    left = bits << np.clip(amount, 0, 63).astype(np.uint64)
+    left = np.where(amount >= 64, np.uint64(0), left)
+    right_amount = np.clip(-amount, 0, 63)
+    if ctype.signed:
+        # int64 shifts are arithmetic, by 63 only the sign is left
+        right = (value.data >> right_amount).astype(np.uint64)
+    else:
+        right = bits >> right_amount.astype(np.uint64)
+        right = np.where(-amount >= 64, np.uint64(0), right)
+    return wrap(np.where(amount >= 0, left, right), ctype)
+
+
+def initial_bytes(addresses):
+    # Contents of memory nothing was stored to, a fixed function of the address
+    mixed = (addresses * np.uint64(0x9E3779B1)) & np.uint64(0xFFFFFFFF)
+    return (mixed >> np.uint64(24)) ^ (addresses & np.uint64(0xFF))
+
+
+def byte_address(addresses, offset):
+    return (addresses + np.uint64(offset)) & np.uint64((1 << XLEN) - 1)
+
+
+class Memory:
+    """Memory of every lane, as seen by MEM loads and stores.
+
+    Bytes nothing was stored to hold a fixed function of their address, so
+    two behaviors loading from the same address read the same data. Stores
+    are kept in order, one (addresses, bytes, lanes) entry per byte.
+    """
+
+    def __init__(self):
+        self.stores = []
+
+    def load_byte(self, addresses):
+        data = initial_bytes(addresses)
+        for stored_addresses, stored, mask in self.stores:
+            data = np.where(mask & (stored_addresses == addresses), stored, data)
+        return data
+
+    def load(self, addresses, count):
+        value = np.zeros(len(addresses), dtype=np.uint64)
+        for offset in range(count):
+            value |= self.load_byte(byte_address(addresses, offset)) << np.uint64(8 * offset)
+        return value
+
+    def store(self, addresses, count, value, mask):
+        for offset in range(count):
+            data = (value >> np.uint64(8 * offset)) & np.uint64(0xFF)
+            self.stores.append((byte_address(addresses, offset), data, mask))
+
+    def touched(self):
+        # Address arrays of every stored byte
+        return [addresses for addresses, _, _ in self.stores]
+
+
+def memory_width(expr):
+    """Bytes of a MEM access: MEM[a] is one, MEM[a + n:a] is n + 1."""
+    if isinstance(expr, Index):
+        return 1
+    high = expr.high
+    if isinstance(high, Binary) and high.op == "+" and high.left == expr.low and isinstance(high.right, Number):
+        return high.right.value + 1
+    return None
+
+
+def is_memory(expr):
+    return isinstance(expr, (Index, Slice)) and expr.base == Name(MEMORY)
+
+
+def builtin_min(args):
+    a, b = (wrap(arg.data, INT).data for arg in args)
+    return Value(np.minimum(a, b), INT)
+
+
+def builtin_remainder(args):
+    # Same as the remainder() helper emitted in every instruction set
+    a, b = (wrap(arg.data, INT).data for arg in args)
+    temp = divide(a, b, remainder=True)
+    adjust = ((temp < 0) & (b > 0)) | ((temp > 0) & (b < 0))
+    return wrap(np.where(adjust, temp + b, temp), INT)
+
+
+def builtin_bwidth(args):
+    return Value(np.full(len(args[0].data), 32, dtype=np.int64), INT)
+
+
+# Functions of the functions{} block every generated instruction set starts with
+FUNCTIONS = {
+    "min": builtin_min,
+    "remainder": builtin_remainder,
+    "BWIDTH": builtin_bwidth,
+}
+
+
+def static_type(expr, variable_type):
+    """Type of an expression under the CoreDSL rules the Evaluator applies.
+
+    variable_type maps a variable name to its CType. Returns None where the
+    type is not known statically.
+    """
+    if isinstance(expr, Number):
+        return expr.ctype
+    if isinstance(expr, Name):
+        return variable_type(expr.name)
+    if is_memory(expr):
+        width = memory_width(expr)
+        return CType(False, 8 * width) if width else None
+    if isinstance(expr, Index):
+        return REGISTER if expr.base == Name("X") else None
+    if isinstance(expr, Cast):
+        return expr.ctype
+    if isinstance(expr, SizeOf):
+        return UNSIGNED_LONG
+    if isinstance(expr, Call):
+        return INT if expr.name in FUNCTIONS else None
+    if isinstance(expr, Slice):
+        if isinstance(expr.high, Number) and isinstance(expr.low, Number):
+            return CType(False, expr.high.value - expr.low.value + 1)
+        return None
+    if isinstance(expr, Unary):
+        operand = static_type(expr.operand, variable_type)
+        if expr.op == "!":
+            return BOOL
+        if operand is None or expr.op == "~":
+            return operand
+        return CType(True, operand.width + 1)
+
+    if isinstance(expr, Binary):
+        if expr.op in ("&&", "||", "==", "!=", "<", ">", "<=", ">="):
+            return BOOL
+        left = static_type(expr.left, variable_type)
+        right = static_type(expr.right, variable_type)
+        if expr.op in ("<<", ">>"):
+            return left
+        if left is None or right is None:
+            return None
+        if expr.op == "::":
+            return CType(False, left.width + right.width)
+        try:
+            return result_type(expr.op, left, right)
+        except EvaluationError:
+            return None
+    if isinstance(expr, Ternary):
+        true = static_type(expr.true, variable_type)
+        false = static_type(expr.false, variable_type)
+        if true is None or false is None:
+            return None
+        return common_type(true, false)
+    return None
+
+
+def sizeof(node, variable_type):
+    ctype = node.operand
+    if not isinstance(ctype, CType):
+        ctype = static_type(ctype, variable_type)
+        if ctype is None:
+            raise EvaluationError(f"Unknown type in {node}")
+    return Number((ctype.width + 7) // 8, UNSIGNED_LONG)
+
+
+class Evaluator:
+    """Executes a parsed behavior block on batches of operand values.
+
+    Control flow is evaluated with lane masks: both branches of an if run,
+    each only updating the lanes its condition selects. Register operands
+    are the symbolic fields rs1, rs2, rs3 and rd; X[field % RFS] reads and
+    writes the lane's value of that field. Arithmetic follows CoreDSL: the
+    result type is wide enough for the result (see result_type), shifts
+    are not masked, and values are truncated by casts and assignments only.
+    MEM accesses go to a Memory.
+    """
+
+    def __init__(self, operands, size, memory=None):
+        self.size = size
+        self.memory = memory if memory is not None else Memory()
+        self.registers = {
+            field: wrap(np.asarray(value), REGISTER) for field, value in operands.items()
+        }
+        self.written = {}  # field -> lanes the behavior wrote
+        self.scopes = [{}]
+
+    # Registers and variables
+
+    def register_field(self, index):
+        if isinstance(index, Binary) and index.op == "%" and index.right == Name("RFS"):
+            index = index.left
+        if isinstance(index, Name) and index.name in OPERAND_FIELDS:
+            return index.name
+        raise EvaluationError(f"Unsupported register index {index}")
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope
+        raise EvaluationError(f"Undeclared variable {name}")
+
+    def variable_type(self, name):
+        return self.lookup(name)[name].ctype
+
+    def memory_access(self, expr):
+        # (addresses, bytes) of a MEM access
+        if isinstance(expr, Index):
+            return wrap(self.evaluate(expr.index).data, REGISTER).bits(), 1
+        low = wrap(self.evaluate(expr.low).data, REGISTER).bits()
+        high = wrap(self.evaluate(expr.high).data, REGISTER).bits()
+        spans = np.unique((high - low) & np.uint64((1 << XLEN) - 1))
+        if len(spans) != 1 or spans[0] >= 8:
+            raise EvaluationError(f"MEM ranges need a constant width of at most 8 bytes, found {expr}")
+        return low, int(spans[0]) + 1
+
+    def read(self, expr):
+        if is_memory(expr):
+            addresses, count = self.memory_access(expr)
+            return wrap(self.memory.load(addresses, count), CType(False, 8 * count))
+        if isinstance(expr, Name):
+            return self.lookup(expr.name)[expr.name]
+        if isinstance(expr, Index) and expr.base == Name("X"):
+            field = self.register_field(expr.index)
+            if field not in self.registers:
+                self.registers[field] = wrap(np.zeros(self.size, dtype=np.int64), REGISTER)
+            return self.registers[field]
+        raise EvaluationError(f"Cannot read {expr}")
+
+    def write(self, target, value, mask):
+        if isinstance(target, Name):
+            scope = self.lookup(target.name)
+            old = scope[target.name]
+            new = wrap(value.data, old.ctype)
+            scope[target.name] = Value(np.where(mask, new.data, old.data), old.ctype)
+        elif is_memory(target):
+            addresses, count = self.memory_access(target)
+            self.memory.store(addresses, count, wrap(value.data, CType(False, 8 * count)).bits(), mask)
+        elif isinstance(target, Index) and target.base == Name("X"):
+            field = self.register_field(target.index)
+            old = self.read(target)
+            new = wrap(value.data, REGISTER)
+            self.registers[field] = Value(np.where(mask, new.data, old.data), REGISTER)
+            written = self.written.get(field, np.zeros(self.size, dtype=bool))
+            self.written[field] = written | mask
+        else:
+            raise EvaluationError(f"Cannot assign to {target}")
+
+    # Statements
+
+    def execute(self, statement, mask):
+        if isinstance(statement, Block):
+            self.scopes.append({})
+            for inner in statement.statements:
+                self.execute(inner, mask)
+            self.scopes.pop()
+        elif isinstance(statement, Declare):
+            self.scopes[-1][statement.name] = wrap(np.zeros(self.size, dtype=np.int64), statement.ctype)
+            if statement.init is not None:
+                self.write(Name(statement.name), self.evaluate(statement.init), mask)
+        elif isinstance(statement, Assign):
+            value = self.evaluate(statement.value)
+            if statement.op != "=":
+                value = self.binary(statement.op[:-1], self.read(statement.target), value)
+            self.write(statement.target, value, mask)
+        elif isinstance(statement, If):
+            condition = truth(self.evaluate(statement.condition))
+            self.execute(statement.then, mask & condition)
+            if statement.otherwise is not None:
+                self.execute(statement.otherwise, mask & ~condition)
+        elif isinstance(statement, ExprStatement):
+            self.evaluate(statement.expr)
+        else:
+            raise EvaluationError(f"Unsupported statement {statement}")
+
+    # Expressions
+
+    def evaluate(self, expr):
+        if isinstance(expr, Number):
+            if expr.ctype.width > 64:
+                return wrap(np.full(self.size, expr.value, dtype=object), expr.ctype)
+            return wrap(np.full(self.size, expr.value & ((1 << 64) - 1), dtype=np.uint64), expr.ctype)
+        if isinstance(expr, (Name, Index)) or is_memory(expr):
+            return self.read(expr)
+        if isinstance(expr, Cast):
+            return wrap(self.evaluate(expr.operand).data, expr.ctype)
+        if isinstance(expr, Unary):
+            return self.unary(expr.op, self.evaluate(expr.operand))
+        if isinstance(expr, Binary):
+            if expr.op in ("&&", "||"):
+                left = truth(self.evaluate(expr.left))
+                right = truth(self.evaluate(expr.right))
+                return boolean(left & right if expr.op == "&&" else left | right)
+            return self.binary(expr.op, self.evaluate(expr.left), self.evaluate(expr.right))
+        if isinstance(expr, Ternary):
+            condition = truth(self.evaluate(expr.condition))
+            true = self.evaluate(expr.true)
+            false = self.evaluate(expr.false)
+            ctype = common_type(true.ctype, false.ctype)
+            return wrap(
+                np.where(condition, wrap(true.data, ctype).data, wrap(false.data, ctype).data),
+                ctype,
+            )
+        if isinstance(expr, Slice):
+            value = self.evaluate(expr.base)
+            high, low = (self.constant(bound) for bound in (expr.high, expr.low))
+            width = high - low + 1
+            if value.ctype.width > 64 or low >= 64:
+                return wrap(value.data.astype(object) >> low, CType(False, width))
+            return wrap(value.bits() >> np.uint64(low), CType(False, width))
+        if isinstance(expr, SizeOf):
+            return self.evaluate(sizeof(expr, self.variable_type))
+        if isinstance(expr, Call):
+            function = FUNCTIONS.get(expr.name)
+            if function is None:
+                raise EvaluationError(f"Unknown function {expr.name}")
+            return function([self.evaluate(arg) for arg in expr.args])
+        raise EvaluationError(f"Unsupported expression {expr}")
+
+    def constant(self, expr):
+        if isinstance(expr, Number):
+            return expr.value
+        raise EvaluationError(f"Bit ranges need constant bounds, found {expr}")
+
+    def unary(self, op, value):
+        if op == "!":
+            return boolean(~truth(value))
+        if op == "-":
+            ctype = CType(True, value.ctype.width + 1)
+            if ctype.width > 64:
+                return wrap(-value.data.astype(object), ctype)
+            return wrap(np.uint64(0) - value.bits(), ctype)
+        if op == "~":
+            if value.ctype.width > 64:
+                return wrap(~value.data.astype(object), value.ctype)
+            return wrap(~value.bits(), value.ctype)
+        raise EvaluationError(f"Unsupported operator {op}")
+
+    def binary(self, op, left, right):
+        if op == "::":
+            width = left.ctype.width + right.ctype.width
+            high = wrap(left.data, CType(False, left.ctype.width))
+            low = wrap(right.data, CType(False, right.ctype.width))
+            if width > 64:
+                bits = (high.data.astype(object) << right.ctype.width) | low.data.astype(object)
+            else:
+                bits = (high.bits() << np.uint64(right.ctype.width)) | low.bits()
+            return wrap(bits, CType(False, width))
+
+        if op in ("<<", ">>"):
+            return shift(op, left, right)
+
+        if op in ("==", "!=", "<", ">", "<=", ">="):
+            # Values are compared as they are, whatever their types
+            a, b = exact(left, right)
+            return boolean(
+                np.asarray(
+                    {
+                        "==": np.equal,
+                        "!=": np.not_equal,
+                        "<": np.less,
+                        ">": np.greater,
+                        "<=": np.less_equal,
+                        ">=": np.greater_equal,
+                    }[op](a, b),
+                    dtype=bool,
+                )
+            )
+
+        ctype = result_type(op, left.ctype, right.ctype)
+        if op in ("/", "%"):
+            a, b = exact(left, right)
+            return wrap(divide(a, b, remainder=op == "%"), ctype)
+
+        if ctype.width > 64:
+            a, b = left.data.astype(object), right.data.astype(object)
+        else:
+            # The result fits ctype, so its low 64 bits are all it takes
+            a, b = left.bits(), right.bits()
+        with np.errstate(over="ignore"):
+            result = {
+                "+": lambda: a + b,
+                "-": lambda: a - b,
+                "*": lambda: a * b,
+                "&": lambda: a & b,
+                "|": lambda: a | b,
+                "^": lambda: a ^ b,
+            }[op]()
+        return wrap(result, ctype)
+
+
+def evaluate_behavior(behavior, operands, memory=None):
+    """Run a behavior on operand arrays, returns (registers, written masks).
+
+    operands maps the fields rs1, rs2, rs3 and rd to arrays of register
+    values; rd is the destination's value before the instruction. Stores go
+    to memory if one is passed.
+    """
+    size = len(next(iter(operands.values())))
+    evaluator = Evaluator(operands, size, memory)
+    evaluator.execute(behavior, np.ones(size, dtype=bool))
+    registers = {field: value.bits().astype(np.uint32) for field, value in evaluator.registers.items()}
+    return registers, evaluator.written
+
+
+def random_operands(size, fields=OPERAND_FIELDS, seed=None):
+    """Random register values, with the corner cases in the first lanes."""
+    random = np.random.default_rng(seed)
+    corners = np.array(
+        [0, 1, 2, 31, 32, 33, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFF, 0xFFFFFFFE],
+        dtype=np.uint32,
+    )
+    operands = {}
+    for i, field in enumerate(fields):
+        values = random.integers(0, 2**32, size=size, dtype=np.uint64).astype(np.uint32)
+        # Every pair of corner values shows up in the first lanes
+        grid = np.tile(np.repeat(corners, len(corners) ** i), len(corners) ** (len(fields) - i))
+        count = min(size, len(grid), len(corners) ** 2)
+        values[:count] = grid[:count]
+        operands[field] = values
+    return operands
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evaluate the behavior of generated CoreDSL instructions on random operands"
+    )
+    parser.add_argument("core_desc", help="Generated .core_desc file")
+    parser.add_argument(
+        "--instructions", nargs="+", default=None, help="Only these instructions"
+    )
+    parser.add_argument("--samples", type=int, default=1 << 20, help="Operand tuples per instruction")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.core_desc, "r") as file:
+        instructions = parse_instruction_set(file.read())
+
+    operands = random_operands(args.samples, seed=args.seed)
+    for instruction in instructions:
+        if args.instructions and instruction.name not in args.instructions:
+            continue
+        if instruction.behavior is None:
+            print(f"{instruction.name:<32}parse error: {instruction.error}")
+            continue
+        start = time.perf_counter()
+        try:
+            registers, written = evaluate_behavior(instruction.behavior, operands)
+        except EvaluationError as e:
+            print(f"{instruction.name:<32}evaluation error: {e}")
+            continue
+        elapsed = time.perf_counter() - start
+        coverage = written["rd"].mean() if "rd" in written else 0.0
+        print(
+            f"{instruction.name:<32}{args.samples / elapsed / 1e6:8.1f} M/s  "
+            f"rd written in {coverage:.1%} of the lanes"
+        )
+
+
+if __name__ == "__main__":
+    main()
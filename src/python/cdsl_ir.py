@@ -0,0 +1,755 @@
+import argparse
+import re
+import numpy as np
+from cdsl_parser import (
+    BINARY_LEVELS,
+    Assign,
+    Binary,
+    Block,
+    Call,
+    Cast,
+    CType,
+    Declare,
+    ExprStatement,
+    If,
+    Index,
+    INT,
+    Name,
+    Number,
+    ParseError,
+    SizeOf,
+    Slice,
+    Ternary,
+    Unary,
+    integer_literal,
+    parse_behavior,
+    parse_instruction_set,
+)
+from cdsl_eval import (
+    FUNCTIONS,
+    MEMORY,
+    REGISTER,
+    EvaluationError,
+    Evaluator,
+    Memory,
+    evaluate_behavior,
+    is_memory,
+    random_operands,
+    sizeof,
+    static_type,
+)
+from pipeline_profile import profiled
+
+EXPRESSIONS = (Number, Name, Index, Slice, Unary, Binary, Ternary, Cast, Call, SizeOf)
+
+# Expressions whose type is the same under C rules and under CoreDSL, where
+# arithmetic widens its result (unsigned<32> + unsigned<32> is unsigned<33>).
+# Casts are only dropped around these, everything else keeps its truncation.
+LEAVES = (Number, Name, Index, Slice, Cast, Call, SizeOf)
+REGISTERS = "X"  # stands for every register in read and write sets
+# Loads and stores show up as MEMORY ("MEM") in the same sets
+
+# Operators whose right operand leaves the value of the left one unchanged
+IDENTITIES = {"+": 0, "-": 0, "|": 0, "^": 0, "<<": 0, ">>": 0, "*": 1}
+
+# Lanes a behavior and its optimized form are compared on, see optimize_behavior
+VALIDATION_SAMPLES = 4096
+
+
+# Traversal
+
+
+def transform(node, function):
+    """Rebuild node bottom-up, function maps every expression node."""
+    if isinstance(node, list):
+        return [transform(item, function) for item in node]
+    if isinstance(node, CType) or not hasattr(node, "_fields"):
+        return node
+    node = type(node)(*(transform(field, function) for field in node))
+    if isinstance(node, EXPRESSIONS):
+        return function(node)
+    return node
+
+
+def walk(node):
+    # Every expression and statement node below node, node included
+    if isinstance(node, list):
+        for item in node:
+            yield from walk(item)
+    elif hasattr(node, "_fields") and not isinstance(node, CType):
+        yield node
+        for field in node:
+            yield from walk(field)
+
+
+def reads(node):
+    """Variable names node reads, REGISTERS if it reads any register."""
+    if isinstance(node, list):
+        return set().union(set(), *(reads(item) for item in node))
+    if isinstance(node, Block):
+        return reads(node.statements)
+    if isinstance(node, Declare):
+        return reads(node.init) if node.init is not None else set()
+    if isinstance(node, Assign):
+        names = reads(node.value)
+        if isinstance(node.target, Index):
+            names |= reads(node.target.index)
+        elif isinstance(node.target, Slice):
+            names |= reads(node.target.high) | reads(node.target.low)
+        if node.op != "=":
+            names |= reads(node.target)
+        return names
+    if isinstance(node, If):
+        names = reads(node.condition) | reads(node.then)
+        if node.otherwise is not None:
+            names |= reads(node.otherwise)
+        return names
+    if isinstance(node, ExprStatement):
+        return reads(node.expr)
+
+    names = set()
+    for inner in walk(node):
+        if isinstance(inner, Name):
+            names.add(inner.name)
+        elif isinstance(inner, Index) and inner.base == Name("X"):
+            names.add(REGISTERS)
+    return names
+
+
+def writes(statement):
+    """Variable names statement assigns, REGISTERS if it writes any register."""
+    names = set()
+    for inner in walk(statement):
+        if isinstance(inner, Assign):
+            if isinstance(inner.target, Name):
+                names.add(inner.target.name)
+            elif is_memory(inner.target):
+                names.add(MEMORY)
+            else:
+                names.add(REGISTERS)
+    return names
+
+
+def count_uses(statements, name):
+    return sum(
+        1
+        for node in walk(statements)
+        if isinstance(node, Name) and node.name == name
+    )
+
+
+def substitute(statements, name, replacement):
+    def function(node):
+        if node == Name(name):
+            return replacement
+        return node
+
+    return transform(statements, function)
+
+
+def strip_assignment_casts(statements, types):
+    # A cast at least as wide as the assigned variable only changes bits the
+    # assignment truncates anyway. Locals keep casts that change signedness,
+    # CoreDSL does not convert those implicitly; registers take any value.
+    def strip(value, ctype):
+        while ctype is not None and isinstance(value, Cast) and value.ctype.width >= ctype.width:
+            operand = static_type(value.operand, types.get)
+            if ctype != REGISTER and (operand is None or operand.signed != ctype.signed):
+                break
+            value = value.operand
+        return value
+
+    result = []
+    for statement in statements:
+        if isinstance(statement, Declare) and statement.init is not None:
+            statement = Declare(statement.ctype, statement.name, strip(statement.init, statement.ctype))
+        elif isinstance(statement, Assign) and statement.op == "=":
+            if isinstance(statement.target, Name):
+                ctype = types.get(statement.target.name)
+            elif is_memory(statement.target):
+                # Stores keep the cast to their width
+                ctype = None
+            else:
+                ctype = REGISTER
+            statement = Assign(statement.target, "=", strip(statement.value, ctype))
+        elif isinstance(statement, If):
+            otherwise = statement.otherwise
+            if otherwise is not None:
+                otherwise = Block(strip_assignment_casts(otherwise.statements, types))
+            statement = If(
+                statement.condition,
+                Block(strip_assignment_casts(statement.then.statements, types)),
+                otherwise,
+            )
+        elif isinstance(statement, Block):
+            statement = Block(strip_assignment_casts(statement.statements, types))
+        result.append(statement)
+    return result
+
+
+# Constant folding
+
+
+def constant(expr):
+    return all(
+        isinstance(node, (Number, Unary, Binary, Ternary, Cast))
+        or (isinstance(node, Call) and node.name in FUNCTIONS)
+        or isinstance(node, CType)
+        for node in walk(expr)
+    )
+
+
+def evaluate_constant(expr):
+    value = Evaluator({}, 1).evaluate(expr)
+    return Number(int(value.data[0]), value.ctype)
+
+
+def fold(statements, types):
+    variable_type = types.get
+
+    def function(node):
+        if isinstance(node, Call) and node.name == "BWIDTH":
+            # Operands are 32 bits wide on RV32
+            return Number(32, INT)
+        if isinstance(node, SizeOf):
+            try:
+                return sizeof(node, variable_type)
+            except EvaluationError:
+                return node
+        if isinstance(node, Cast) and isinstance(node.operand, Cast):
+            if node.operand.ctype.width >= node.ctype.width:
+                # The inner cast keeps all the bits the outer one looks at
+                return Cast(node.ctype, node.operand.operand)
+        if (
+            isinstance(node, Cast)
+            and isinstance(node.operand, LEAVES)
+            and static_type(node.operand, variable_type) == node.ctype
+        ):
+            return node.operand
+        if isinstance(node, Ternary) and isinstance(node.condition, Number):
+            chosen = node.true if node.condition.value else node.false
+            ctype = static_type(node, variable_type)
+            if ctype is None:
+                return node
+            return Cast(ctype, chosen)
+        if isinstance(node, Binary) and node.op in ("<<", ">>") and isinstance(node.right, Number):
+            # The type of a shift amount does not matter, only its value
+            if 0 <= node.right.value < 2**31 and node.right.ctype != INT:
+                return Binary(node.op, node.left, Number(node.right.value, INT))
+        if isinstance(node, Binary) and isinstance(node.right, Number):
+            if IDENTITIES.get(node.op) == node.right.value:
+                # The value stays the same, CoreDSL may widen its type
+                ctype = static_type(node, variable_type)
+                if ctype is not None and ctype == static_type(node.left, variable_type):
+                    return node.left
+                if ctype is not None and static_type(node.left, variable_type) is not None:
+                    return Cast(ctype, node.left)
+        if not isinstance(node, (Number, Name, Index, Slice)) and constant(node):
+            # CoreDSL leaves division by zero undefined, keep it visible
+            if isinstance(node, Binary) and node.op in ("/", "%") and node.right == Number(0, node.right.ctype):
+                return node
+            try:
+                return evaluate_constant(node)
+            except EvaluationError:
+                return node
+        return node
+
+    statements = strip_assignment_casts(transform(statements, function), types)
+    return [literal_constants(statement, types) for statement in statements]
+
+
+def holds(ctype, operand):
+    # Every value of operand is a value of ctype
+    if ctype.signed == operand.signed:
+        return ctype.width >= operand.width
+    return ctype.signed and ctype.width > operand.width
+
+
+def literal_constants(node, types, exact=False):
+    """Give constants their literal type where only their value counts.
+
+    Folded constants keep the CoreDSL type of the expression they replace,
+    (signed<33>)(0) for 32 - 32, emit_number writes that type as a cast.
+    Where node is exact, only its value is used: in conditions and
+    comparisons, as a cast, assigned or shift amount value, and in the
+    operands of arithmetic that is itself exact. There constants become
+    plain literals and widening casts are dropped.
+    """
+
+    def visit(child, child_exact):
+        return literal_constants(child, types, child_exact)
+
+    if isinstance(node, Block):
+        return Block([visit(statement, False) for statement in node.statements])
+    if isinstance(node, Declare):
+        return Declare(node.ctype, node.name, None if node.init is None else visit(node.init, True))
+    if isinstance(node, Assign):
+        target = node.target
+        if isinstance(target, Index):
+            target = Index(target.base, visit(target.index, True))
+        # x /= 0 depends on the type of x
+        return Assign(target, node.op, visit(node.value, node.op not in ("/=", "%=")))
+    if isinstance(node, If):
+        otherwise = None if node.otherwise is None else visit(node.otherwise, False)
+        return If(visit(node.condition, True), visit(node.then, False), otherwise)
+
+    if isinstance(node, Number):
+        return literal(node.value) if exact else node
+    if isinstance(node, Cast):
+        operand = static_type(node.operand, types.get)
+        if exact and operand is not None and holds(node.ctype, operand):
+            return visit(node.operand, True)
+        return Cast(node.ctype, visit(node.operand, True))
+    if isinstance(node, Index):
+        return Index(node.base, visit(node.index, True))
+    if isinstance(node, Call):
+        # Arguments are converted to the parameter types
+        return Call(node.name, [visit(arg, True) for arg in node.args])
+    if isinstance(node, Unary):
+        return Unary(node.op, visit(node.operand, node.op == "!" or (exact and node.op == "-")))
+    if isinstance(node, Ternary):
+        return Ternary(visit(node.condition, True), visit(node.true, exact), visit(node.false, exact))
+    if isinstance(node, Binary):
+        if node.op in ("&&", "||", "==", "!=", "<", ">", "<=", ">="):
+            left = right = True
+        elif node.op in ("+", "-", "*", "&", "|", "^"):
+            left = right = exact
+        elif node.op in ("/", "%"):
+            # Division by zero depends on the result type
+            left = right = exact and isinstance(node.right, Number) and node.right.value != 0
+        elif node.op == ">>":
+            left, right = exact, True
+        elif node.op == "<<":
+            # The result keeps the type of the left operand
+            left, right = False, True
+        else:
+            left = right = False
+        return Binary(node.op, visit(node.left, left), visit(node.right, right))
+    return node
+
+
+
+# Statement level passes
+
+
+def simplify_statements(statements):
+    """Drop empty statements and resolve ifs with constant conditions."""
+    result = []
+    for statement in statements:
+        if isinstance(statement, Block):
+            inner = simplify_statements(statement.statements)
+            if any(isinstance(item, Declare) for item in inner):
+                # Keeps its own scope
+                result.append(Block(inner))
+            else:
+                result.extend(inner)
+        elif isinstance(statement, If):
+            then = Block(simplify_statements(statement.then.statements))
+            otherwise = None
+            if statement.otherwise is not None:
+                otherwise = Block(simplify_statements(statement.otherwise.statements))
+                if not otherwise.statements:
+                    otherwise = None
+            if isinstance(statement.condition, Number):
+                chosen = then if statement.condition.value else otherwise
+                if chosen is not None:
+                    result.extend(simplify_statements([chosen]))
+            elif not then.statements and otherwise is None:
+                # Conditions are side-effect free
+                continue
+            elif not then.statements:
+                result.append(If(Unary("!", statement.condition), otherwise, None))
+            else:
+                result.append(If(statement.condition, then, otherwise))
+        elif isinstance(statement, ExprStatement):
+            # Expressions are side-effect free
+            continue
+        else:
+            result.append(statement)
+    return result
+
+
+def fresh_name(name, taken):
+    index = 1
+    while f"{name}_{index}" in taken:
+        index += 1
+    taken.add(f"{name}_{index}")
+    return f"{name}_{index}"
+
+
+def to_single_assignment(statements, types, taken):
+    """Give every top-level assignment of a local its own declaration.
+
+    Declarations without an initializer are merged into the first assignment,
+    later assignments declare a new version of the variable. Assignments
+    inside ifs keep writing the current version.
+    """
+    current = {}  # name -> name of its current version
+    pending = {}  # declared without initializer, not emitted yet
+    result = []
+
+    def rename(node):
+        def function(inner):
+            if isinstance(inner, Name) and inner.name in current:
+                return Name(current[inner.name])
+            return inner
+
+        return transform(node, function)
+
+    for statement in statements:
+        if isinstance(statement, Declare):
+            current[statement.name] = statement.name
+            if statement.init is None:
+                pending[statement.name] = statement.ctype
+            else:
+                result.append(Declare(statement.ctype, statement.name, rename(statement.init)))
+            continue
+
+        if isinstance(statement, Assign) and isinstance(statement.target, Name) and statement.target.name in current:
+            name = statement.target.name
+            value = rename(statement.value)
+            if statement.op != "=":
+                value = Binary(statement.op[:-1], Name(current[name]), value)
+            if name in pending:
+                result.append(Declare(pending.pop(name), name, value))
+                current[name] = name
+            else:
+                version = fresh_name(name, taken)
+                types[version] = types[name]
+                result.append(Declare(types[name], version, value))
+                current[name] = version
+            continue
+
+        statement = rename(statement)
+        referenced = {node.name for node in walk(statement) if isinstance(node, Name)}
+        for name in list(pending):
+            if current[name] in referenced:
+                result.append(Declare(pending.pop(name), name, None))
+        result.append(statement)
+    return result
+
+
+def forward_temporaries(statements, types):
+    """Replace temporaries by their value and drop unused ones.
+
+    A temporary is forwarded if it is never assigned after its declaration,
+    used once or initialized with a plain name or number, and nothing its
+    value reads is written before its last use.
+    """
+    statements = list(statements)
+    changed = True
+    while changed:
+        changed = False
+        for i, statement in enumerate(statements):
+            if not isinstance(statement, Declare) or statement.init is None:
+                continue
+            name = statement.name
+            rest = statements[i + 1 :]
+            if any(name in writes(later) for later in rest):
+                continue
+            users = [j for j, later in enumerate(rest) if count_uses(later, name)]
+            if not users:
+                del statements[i]
+                changed = True
+                break
+            trivial = isinstance(statement.init, (Number, Name))
+            if count_uses(rest, name) > 1 and not trivial:
+                continue
+
+            last = users[-1]
+            dependencies = reads(statement.init)
+            if any(writes(later) & dependencies for later in rest[:last]):
+                continue
+            if writes(rest[last]) & dependencies and not isinstance(rest[last], (Assign, Declare)):
+                continue
+
+            value = statement.init
+            if not isinstance(value, LEAVES) or static_type(value, types.get) != statement.ctype:
+                value = Cast(statement.ctype, value)
+            statements[i:] = substitute(rest[: last + 1], name, value) + rest[last + 1 :]
+            changed = True
+            break
+    return statements
+
+
+def remove_dead_register_stores(statements, killed=frozenset()):
+    """Drop register writes that are overwritten before anything reads them.
+
+    killed holds the register targets unconditionally written after
+    statements with no register read in between.
+    """
+    killed = set(killed)
+    result = []
+    for statement in reversed(statements):
+        if isinstance(statement, Assign) and isinstance(statement.target, Index) and statement.target.base == Name("X"):
+            if statement.op == "=" and statement.target in killed:
+                continue
+            if REGISTERS in reads(statement) or statement.op != "=":
+                killed = set()
+            else:
+                killed.add(statement.target)
+        elif isinstance(statement, If):
+            then = Block(remove_dead_register_stores(statement.then.statements, killed))
+            otherwise = statement.otherwise
+            if otherwise is not None:
+                otherwise = Block(remove_dead_register_stores(otherwise.statements, killed))
+            statement = If(statement.condition, then, otherwise)
+            if REGISTERS in reads(statement):
+                killed = set()
+        elif isinstance(statement, Block):
+            statement = Block(remove_dead_register_stores(statement.statements, killed))
+            if REGISTERS in reads(statement):
+                killed = set()
+        elif REGISTERS in reads(statement):
+            killed = set()
+        result.append(statement)
+    return result[::-1]
+
+
+def optimize_statements(statements, types, taken):
+    statements = [
+        Block(optimize_statements(statement.statements, types, taken))
+        if isinstance(statement, Block)
+        else statement
+        for statement in statements
+    ]
+    statements = to_single_assignment(statements, types, taken)
+    return forward_temporaries(statements, types)
+
+
+def optimize(block):
+    """Optimized copy of a parsed behavior block."""
+    types = {}
+    for node in walk(block):
+        if isinstance(node, Declare):
+            # Names declared twice with different types get no static type
+            types[node.name] = node.ctype if types.get(node.name, node.ctype) == node.ctype else None
+    taken = {node.name for node in walk(block) if isinstance(node, Name)} | set(types)
+
+    statements = block.statements
+    previous = None
+    while statements != previous:
+        previous = statements
+        statements = fold(statements, types)
+        statements = simplify_statements(statements)
+        statements = optimize_statements(statements, types, taken)
+        statements = remove_dead_register_stores(statements)
+    return Block(statements)
+
+
+# Emission
+
+PRECEDENCE = {op: level + 2 for level, ops in enumerate(BINARY_LEVELS) for op in ops}
+TERNARY = 1
+ARITHMETIC = {"+", "-", "*", "/", "%"}
+UNARY = len(BINARY_LEVELS) + 2
+POSTFIX = UNARY + 1
+
+
+def type_name(ctype):
+    return f"{'signed' if ctype.signed else 'unsigned'}<{ctype.width}>"
+
+
+def precedence(expr):
+    if isinstance(expr, Ternary):
+        return TERNARY
+    if isinstance(expr, Binary):
+        return PRECEDENCE[expr.op]
+    if isinstance(expr, (Unary, Cast, SizeOf)):
+        return UNARY
+    if isinstance(expr, Number) and expr.value < 0:
+        return UNARY
+    return POSTFIX
+
+
+def literal_text(value):
+    # (text, type) of the literal emitted for value
+    magnitude = abs(value)
+    text = f"{magnitude:#x}" if magnitude >= 1 << 16 else str(magnitude)
+    natural = integer_literal(text).ctype
+    if value < 0:
+        text = f"-{text}"
+        natural = static_type(Unary("-", Number(magnitude, natural)), lambda name: None)
+    return text, natural
+
+
+def literal(value):
+    return Number(value, literal_text(value)[1])
+
+
+def emit_number(number):
+    text, natural = literal_text(number.value)
+    if natural == number.ctype:
+        return text
+    # The literal alone would have another type
+    return f"({type_name(number.ctype)})({text})"
+
+
+def emit_expression(expr, parent=0, right=False, parent_op=None):
+    level = precedence(expr)
+    if isinstance(expr, Number):
+        text = emit_number(expr)
+    elif isinstance(expr, Name):
+        text = expr.name
+    elif isinstance(expr, Index):
+        text = f"{emit_expression(expr.base, POSTFIX)}[{emit_expression(expr.index)}]"
+    elif isinstance(expr, Slice):
+        text = (
+            f"{emit_expression(expr.base, POSTFIX)}"
+            f"[{emit_expression(expr.high)}:{emit_expression(expr.low)}]"
+        )
+    elif isinstance(expr, Call):
+        text = f"{expr.name}({', '.join(emit_expression(arg) for arg in expr.args)})"
+    elif isinstance(expr, Cast):
+        text = f"({type_name(expr.ctype)})({emit_expression(expr.operand)})"
+    elif isinstance(expr, SizeOf):
+        operand = expr.operand
+        text = f"sizeof({type_name(operand) if isinstance(operand, CType) else emit_expression(operand)})"
+    elif isinstance(expr, Unary):
+        text = f"{expr.op}{emit_expression(expr.operand, UNARY + 1)}"
+    elif isinstance(expr, Binary):
+        text = (
+            f"{emit_expression(expr.left, level, parent_op=expr.op)} {expr.op} "
+            f"{emit_expression(expr.right, level, right=True, parent_op=expr.op)}"
+        )
+    elif isinstance(expr, Ternary):
+        text = (
+            f"{emit_expression(expr.condition, TERNARY + 1, parent_op='?')} ? "
+            f"{emit_expression(expr.true)} : {emit_expression(expr.false)}"
+        )
+    else:
+        raise ValueError(f"Cannot emit {expr}")
+
+    # Binary operators are left-associative
+    if level < parent or (right and level == parent) or (level == TERNARY and parent > 0):
+        return f"({text})"
+    if isinstance(expr, Binary) and parent_op is not None and expr.op != parent_op:
+        # Spell out the grouping of bitwise, shift and comparison operators
+        if not (expr.op in ARITHMETIC and parent_op in ARITHMETIC):
+            return f"({text})"
+    return text
+
+
+def emit_statements(statements, indent):
+    lines = []
+    pad = " " * indent
+    for statement in statements:
+        if isinstance(statement, Declare):
+            init = "" if statement.init is None else f" = {emit_expression(statement.init)}"
+            lines.append(f"{pad}{type_name(statement.ctype)} {statement.name}{init};")
+        elif isinstance(statement, Assign):
+            lines.append(
+                f"{pad}{emit_expression(statement.target)} {statement.op} "
+                f"{emit_expression(statement.value)};"
+            )
+        elif isinstance(statement, ExprStatement):
+            lines.append(f"{pad}{emit_expression(statement.expr)};")
+        elif isinstance(statement, If):
+            lines.append(f"{pad}if ({emit_expression(statement.condition)}) {{")
+            lines += emit_statements(statement.then.statements, indent + 4)
+            if statement.otherwise is not None:
+                lines.append(f"{pad}}} else {{")
+                lines += emit_statements(statement.otherwise.statements, indent + 4)
+            lines.append(f"{pad}}}")
+        elif isinstance(statement, Block):
+            lines.append(f"{pad}{{")
+            lines += emit_statements(statement.statements, indent + 4)
+            lines.append(f"{pad}}}")
+        else:
+            raise ValueError(f"Cannot emit {statement}")
+    return lines
+
+
+def emit_behavior(block):
+    # Same layout as transform_trigger_code, the writer indents the first line
+    lines = emit_statements(block.statements, 16)
+    if not lines:
+        return ""
+    return "\n".join(lines)[4:] + "\n"
+
+
+# Entry points
+
+
+def equivalent(original, optimized, samples=VALIDATION_SAMPLES):
+    operands = random_operands(samples, seed=0)
+    expected_memory, actual_memory = Memory(), Memory()
+    expected = evaluate_behavior(original, operands, expected_memory)
+    actual = evaluate_behavior(optimized, operands, actual_memory)
+    for addresses in expected_memory.touched() + actual_memory.touched():
+        if not np.array_equal(expected_memory.load_byte(addresses), actual_memory.load_byte(addresses)):
+            return False
+    for field, written in expected[1].items():
+        if not np.array_equal(written, actual[1].get(field, np.zeros_like(written))):
+            return False
+        if not np.array_equal(expected[0][field][written], actual[0][field][written]):
+            return False
+    return set(actual[1]) <= set(expected[1]) or not any(
+        mask.any() for field, mask in actual[1].items() if field not in expected[1]
+    )
+
+
+@profiled("optimize_behavior")
+def optimize_behavior(behavior_code, validate=False):
+    """Optimized CoreDSL text of a generated behavior block.
+
+    Behaviors that do not parse are returned unchanged. With validate the
+    result is also checked against the original on random operands with
+    cdsl_eval and kept only if it has the same meaning; this costs more than
+    the optimization itself, so the generator leaves it to the tests and the
+    --validate flag. Whether the translation matches the OSAL semantics is
+    checked by osal_difftest.
+    """
+    if not behavior_code.strip():
+        return behavior_code
+    try:
+        original = parse_behavior(behavior_code)
+        optimized = optimize(original)
+        text = emit_behavior(optimized)
+        if validate and not equivalent(original, parse_behavior(text)):
+            print("Optimized behavior differs from the original, keeping it unchanged")
+            return behavior_code
+    except (ParseError, EvaluationError, ValueError) as e:
+        print(f"Not optimizing behavior: {e}")
+        return behavior_code
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Show the optimized behavior of generated CoreDSL instructions"
+    )
+    parser.add_argument("core_desc", help="Generated .core_desc file")
+    parser.add_argument(
+        "--instructions", nargs="+", default=None, help="Only these instructions"
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Check every optimized behavior against the original with cdsl_eval",
+    )
+    args = parser.parse_args()
+
+    with open(args.core_desc, "r") as file:
+        instructions = parse_instruction_set(file.read())
+
+    total_before = total_after = 0
+    for instruction in instructions:
+        if args.instructions and instruction.name not in args.instructions:
+            continue
+        if instruction.behavior is None:
+            print(f"{instruction.name}: parse error: {instruction.error}")
+            continue
+        body = instruction.behavior_text.strip()[1:-1]
+        text = optimize_behavior(body, validate=args.validate)
+        before = len(re.findall(r";", body))
+        after = len(re.findall(r";", text))
+        total_before += before
+        total_after += after
+        print(f"{instruction.name}: {before} -> {after} statements")
+        print(f"    {text}")
+    print(f"Total: {total_before} -> {total_after} statements")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+import re
+from collections import namedtuple
+
+# Types are (signed, width); the C names map to their usual LP64 widths,
+# which is what the OSAL reference implementation is compiled with
+CType = namedtuple("CType", ["signed", "width"])
+
+INT = CType(True, 32)
+UNSIGNED = CType(False, 32)
+LONG = CType(True, 64)
+UNSIGNED_LONG = CType(False, 64)
+
+# Expressions
+Number = namedtuple("Number", ["value", "ctype"])
+Name = namedtuple("Name", ["name"])
+Index = namedtuple("Index", ["base", "index"])
+Slice = namedtuple("Slice", ["base", "high", "low"])
+Unary = namedtuple("Unary", ["op", "operand"])
+Binary = namedtuple("Binary", ["op", "left", "right"])
+Ternary = namedtuple("Ternary", ["condition", "true", "false"])
+Cast = namedtuple("Cast", ["ctype", "operand"])
+Call = namedtuple("Call", ["name", "args"])
+SizeOf = namedtuple("SizeOf", ["operand"])  # operand is a CType or an expression
+
+# Statements
+Block = namedtuple("Block", ["statements"])
+Declare = namedtuple("Declare", ["ctype", "name", "init"])
+Assign = namedtuple("Assign", ["target", "op", "value"])
+If = namedtuple("If", ["condition", "then", "otherwise"])
+ExprStatement = namedtuple("ExprStatement", ["expr"])
+
+Instruction = namedtuple(
+    "Instruction", ["name", "encoding", "assembly", "behavior_text", "behavior", "error"]
+)
+
+
+class ParseError(Exception):
+    pass
+
+
+TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<sized>\d+'[bdhBDH][0-9a-fA-F_]+)
+  | (?P<number>0[xX][0-9a-fA-F]+|\d+)[uUlL]*
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op><<=|>>=|::|<<|>>|<=|>=|==|!=|&&|\|\||\+\+|--|[-+*/%&|^]=|[-+*/%&|^~!<>=?:;,()\[\]{}])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+TYPE_WORDS = {"signed", "unsigned", "int", "long", "short", "char", "bool", "const"}
+
+ASSIGN_OPS = {"=", "+=", "-=", "*=", "/=", "%=", "&=", "|=", "^=", "<<=", ">>="}
+
+# Binary operators from the loosest to the tightest binding level
+BINARY_LEVELS = [
+    ["::"],
+    ["||"],
+    ["&&"],
+    ["|"],
+    ["^"],
+    ["&"],
+    ["==", "!="],
+    ["<", ">", "<=", ">="],
+    ["<<", ">>"],
+    ["+", "-"],
+    ["*", "/", "%"],
+]
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None:
+            raise ParseError(f"Unexpected character {text[position]!r} at {position}")
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        tokens.append((kind, match.group(kind)))
+    return tokens
+
+
+def sized_literal(text):
+    # CoreDSL sized literals such as 7'b0110011 are unsigned<width>
+    width, rest = text.split("'")
+    base = {"b": 2, "d": 10, "h": 16}[rest[0].lower()]
+    return Number(int(rest[1:].replace("_", ""), base), CType(False, int(width)))
+
+
+def integer_literal(text):
+    if text[:2] in ("0x", "0X"):
+        value = int(text, 16)
+    elif len(text) > 1 and text.startswith("0"):
+        value = int(text, 8)
+    else:
+        value = int(text)
+    if value < 2**31:
+        return Number(value, INT)
+    if value < 2**32 and text.lower().startswith("0x"):
+        return Number(value, UNSIGNED)
+    return Number(value, LONG if value < 2**63 else UNSIGNED_LONG)
+
+
+class Parser:
+    """Recursive-descent parser for the C-like subset used in behavior blocks."""
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        if index < len(self.tokens):
+            return self.tokens[index][1]
+        return None
+
+    def next(self):
+        if self.position >= len(self.tokens):
+            raise ParseError("Unexpected end of input")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token[1]
+
+    def expect(self, value):
+        token = self.next()
+        if token != value:
+            raise ParseError(f"Expected {value!r}, found {token!r}")
+        return token
+
+    def accept(self, value):
+        if self.peek() == value:
+            self.position += 1
+            return True
+        return False
+
+    def at_end(self):
+        return self.position >= len(self.tokens)
+
+    # Types
+
+    def at_type(self, offset=0):
+        return self.peek(offset) in TYPE_WORDS
+
+    def parse_type(self):
+        words = []
+        while self.at_type():
+            word = self.next()
+            if word in ("signed", "unsigned") and self.peek() == "<":
+                self.expect("<")
+                width = self.parse_expression(level=len(BINARY_LEVELS) - 2)
+                self.expect(">")
+                if not isinstance(width, Number):
+                    raise ParseError("Only constant widths are supported")
+                return CType(word == "signed", width.value)
+            if word != "const":
+                words.append(word)
+        if not words:
+            raise ParseError(f"Expected a type, found {self.peek()!r}")
+
+        signed = "unsigned" not in words
+        if "bool" in words:
+            return CType(False, 1)
+        if "char" in words:
+            return CType(signed, 8)
+        if "short" in words:
+            return CType(signed, 16)
+        if "long" in words:
+            return CType(signed, 64)
+        return CType(signed, 32)
+
+    # Statements
+
+    def parse_block(self):
+        self.expect("{")
+        statements = []
+        while not self.accept("}"):
+            statements.extend(self.parse_statement())
+        return Block(statements)
+
+    def parse_statements(self):
+        # A behavior body without its braces
+        statements = []
+        while not self.at_end():
+            statements.extend(self.parse_statement())
+        return Block(statements)
+
+    def parse_statement(self):
+        token = self.peek()
+        if token == ";":
+            self.next()
+            return []
+        if token == "{":
+            return [self.parse_block()]
+        if token == "if":
+            self.next()
+            self.expect("(")
+            condition = self.parse_expression()
+            self.expect(")")
+            then = self.parse_body()
+            otherwise = None
+            if self.accept("else"):
+                otherwise = self.parse_body()
+            return [If(condition, then, otherwise)]
+        if token in ("for", "while", "do", "return", "break", "continue", "goto"):
+            raise ParseError(f"Unsupported statement {token!r}")
+        if self.at_type():
+            return self.parse_declaration()
+
+        statement = self.parse_simple_statement()
+        self.expect(";")
+        return [statement]
+
+    def parse_body(self):
+        statements = self.parse_statement()
+        if len(statements) == 1 and isinstance(statements[0], Block):
+            return statements[0]
+        return Block(statements)
+
+    def parse_declaration(self):
+        ctype = self.parse_type()
+        declarations = []
+        while True:
+            name = self.next()
+            init = None
+            if self.accept("="):
+                init = self.parse_expression()
+            declarations.append(Declare(ctype, name, init))
+            if not self.accept(","):
+                break
+        self.expect(";")
+        return declarations
+
+    def parse_simple_statement(self):
+        if self.peek() in ("++", "--"):
+            op = self.next()
+            target = self.parse_unary()
+            return Assign(target, op[0] + "=", Number(1, INT))
+        target = self.parse_expression()
+        op = self.peek()
+        if op in ASSIGN_OPS:
+            self.next()
+            return Assign(target, op, self.parse_expression())
+        if op in ("++", "--"):
+            self.next()
+            return Assign(target, op[0] + "=", Number(1, INT))
+        return ExprStatement(target)
+
+    # Expressions
+
+    def parse_expression(self, level=0):
+        if level == 0:
+            condition = self.parse_expression(1)
+            if self.accept("?"):
+                true = self.parse_expression()
+                self.expect(":")
+                false = self.parse_expression()
+                return Ternary(condition, true, false)
+            return condition
+        if level > len(BINARY_LEVELS):
+            return self.parse_unary()
+
+        left = self.parse_expression(level + 1)
+        while self.peek() in BINARY_LEVELS[level - 1]:
+            op = self.next()
+            right = self.parse_expression(level + 1)
+            left = Binary(op, left, right)
+        return left
+
+    def parse_unary(self):
+        token = self.peek()
+        if token in ("-", "+", "~", "!"):
+            self.next()
+            operand = self.parse_unary()
+            if token == "+":
+                return operand
+            return Unary(token, operand)
+        if token == "sizeof":
+            self.next()
+            if self.peek() == "(" and self.at_type(1):
+                self.next()
+                ctype = self.parse_type()
+                self.expect(")")
+                return SizeOf(ctype)
+            return SizeOf(self.parse_unary())
+        if token == "(" and self.at_type(1):
+            self.next()
+            ctype = self.parse_type()
+            self.expect(")")
+            return Cast(ctype, self.parse_unary())
+        return self.parse_postfix()
+
+    def parse_postfix(self):
+        expr = self.parse_primary()
+        while True:
+            if self.accept("["):
+                index = self.parse_expression()
+                if self.accept(":"):
+                    low = self.parse_expression()
+                    self.expect("]")
+                    expr = Slice(expr, index, low)
+                else:
+                    self.expect("]")
+                    expr = Index(expr, index)
+            elif self.peek() == "(" and isinstance(expr, Name):
+                self.next()
+                args = []
+                if not self.accept(")"):
+                    while True:
+                        args.append(self.parse_expression())
+                        if self.accept(")"):
+                            break
+                        self.expect(",")
+                expr = Call(expr.name, args)
+            else:
+                return expr
+
+    def parse_primary(self):
+        if self.at_end():
+            raise ParseError("Unexpected end of input")
+        kind, token = self.tokens[self.position]
+        self.position += 1
+        if token == "(":
+            expr = self.parse_expression()
+            self.expect(")")
+            return expr
+        if kind == "sized":
+            return sized_literal(token)
+        if kind == "number":
+            return integer_literal(token)
+        if kind == "name" and token not in TYPE_WORDS:
+            return Name(token)
+        raise ParseError(f"Unexpected token {token!r}")
+
+
+def parse_behavior(text):
+    """Parse a behavior body, with or without its surrounding braces."""
+    parser = Parser(text)
+    if parser.peek() == "{":
+        block = parser.parse_block()
+        if not parser.at_end():
+            raise ParseError(f"Unexpected token {parser.peek()!r} after behavior")
+        return block
+    return parser.parse_statements()
+
+
+def parse_expression(text):
+    parser = Parser(text)
+    expr = parser.parse_expression()
+    if not parser.at_end():
+        raise ParseError(f"Unexpected token {parser.peek()!r} after expression")
+    return expr
+
+
+def _matching_brace(text, start):
+    depth = 0
+    for match in re.finditer(r"//[^\n]*|/\*.*?\*/|[{}]", text[start:], re.DOTALL):
+        token = match.group(0)
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                return start + match.start()
+    raise ParseError("Unbalanced braces")
+
+
+INSTRUCTION_PATTERN = re.compile(r"^\s*(\w+)\s*\{\s*\n\s*encoding:", re.MULTILINE)
+
+
+def parse_instruction_set(text):
+    """Instructions of a generated .core_desc with their parsed behavior.
+
+    Behaviors that do not parse are kept with behavior None and the error.
+    """
+    instructions = []
+    for match in INSTRUCTION_PATTERN.finditer(text):
+        start = text.index("{", match.start())
+        end = _matching_brace(text, start)
+        body = text[start + 1 : end]
+
+        encoding = re.search(r"encoding:\s*(.*?);", body, re.DOTALL)
+        assembly = re.search(r'assembly:\s*"(.*?)";', body)
+        behavior_start = body.find("behavior:")
+        behavior_text = None
+        behavior = None
+        error = None
+        if behavior_start < 0:
+            error = "No behavior"
+        else:
+            try:
+                brace = body.index("{", behavior_start)
+                behavior_text = body[brace : _matching_brace(body, brace) + 1]
+                behavior = parse_behavior(behavior_text)
+            except (ParseError, ValueError) as e:
+                error = str(e)
+        instructions.append(
+            Instruction(
+                match.group(1),
+                encoding.group(1).strip() if encoding else None,
+                assembly.group(1) if assembly else None,
+                behavior_text,
+                behavior,
+                error,
+            )
+        )
+    return instructions
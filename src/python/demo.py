@@ -26,6 +26,8 @@ from seal5.flow import Seal5Flow
 from seal5.logging import set_log_level
 from seal5.types import PatchStage
 
+from seal5_driver import StagedFlow
+
 # set_log_level(console_level=logging.DEBUG, file_level=logging.DEBUG)
 set_log_level(console_level="DEBUG", file_level="DEBUG")
 
@@ -34,7 +36,6 @@ EXAMPLES_DIR = Path(os.path.dirname(os.path.realpath(__file__)))
 VERBOSE = bool(int(os.environ.get("VERBOSE", 0)))
 SKIP_PATTERNS = bool(int(os.environ.get("SKIP_PATTERNS", 0)))
 INTERACTIVE = bool(int(os.environ.get("INTERACTIVE", 0)))
-PREPATCHED = bool(int(os.environ.get("PREPATCHED", 0)))
 BUILD_CONFIG = os.environ.get("BUILD_CONFIG", "release")
 IGNORE_ERROR = bool(int(os.environ.get("IGNORE_ERROR", 1)))
 TEST = bool(int(os.environ.get("TEST", 0)))
@@ -46,39 +47,31 @@ PROGRESS = bool(int(os.environ.get("PROGRESS", 1)))
 CLONE_DEPTH = bool(int(os.environ.get("CLONE_DEPTH", 1)))
 DEST = os.environ.get("DEST", "./build/seal5_llvm_openasip").rstrip("/")
 NAME = os.environ.get("NAME", "openasip")
+FORCE = bool(int(os.environ.get("FORCE", 0)))
+DRY_RUN = bool(int(os.environ.get("DRY_RUN", 0)))
+# Load the shards written by main.py --shard-by instead of the single file
+SHARDED = bool(int(os.environ.get("SHARDED", 0)))
 
-seal5_flow = Seal5Flow(DEST, name=NAME)
-
-# Optional: clean existing settings/models for fresh run
-seal5_flow.reset(settings=True, interactive=False)
-seal5_flow.clean(temp=True, patches=True, models=True, inputs=True, interactive=INTERACTIVE)
-
-if PREPATCHED:
-    if seal5_flow.repo is None or "seal5-openasip-stage0" not in seal5_flow.repo.tags:
-        raise RuntimeError("PREPATCHED can only be used after LLVM was patched at least once.")
-
-# Clone LLVM and init seal5 metadata directory
-seal5_flow.initialize(
-    clone=True,
-    clone_url="https://github.com/llvm/llvm-project.git",
-    # clone_ref="llvmorg-17.0.6",
-    clone_ref="seal5-openasip-stage0" if PREPATCHED else "llvmorg-18.1.0-rc3",
-    clone_depth=CLONE_DEPTH,
-    progress=PROGRESS,
-    force=True,
-    verbose=VERBOSE,
-)
+CLONE_URL = "https://github.com/llvm/llvm-project.git"
+# CLONE_REF = "llvmorg-17.0.6"
+CLONE_REF = "llvmorg-18.1.0-rc3"
+# Tag of the LLVM tree after the PHASE_0 patches
+STAGE0_TAG = "seal5-openasip-stage0"
 
 # Load CoreDSL inputs
 cdsl_files = [
     # EXAMPLES_DIR / "cdsl" / "rv_openasip" / "OpenASIP_.core_desc",
     EXAMPLES_DIR / ".." / "cdsl" / "base.core_desc",
 ]
-seal5_flow.load(cdsl_files, verbose=VERBOSE, overwrite=True)
+# Every file a stage reads, the top file alone does not cover its imports
+cdsl_inputs = list(cdsl_files)
+if SHARDED:
+    shard_directory = EXAMPLES_DIR / ".." / "cdsl" / "base_shards"
+    cdsl_files = [shard_directory / "base_top.core_desc"]
+    cdsl_inputs = sorted(shard_directory.glob("*.core_desc"))
 
 # Load test inputs
 test_files = []  # TODO
-seal5_flow.load(test_files, verbose=VERBOSE, overwrite=True)
 
 # Load YAML inputs
 cfg_files = [
@@ -91,38 +84,92 @@ cfg_files = [
     EXAMPLES_DIR / ".." / "cfg" / "passes.yml",
     EXAMPLES_DIR / ".." / "cfg" / "git.yml",
 ]
-seal5_flow.load(cfg_files, verbose=VERBOSE, overwrite=False)
+# Configs the initial LLVM build depends on, the others only affect the patches
+llvm_cfg_files = [EXAMPLES_DIR / ".." / "cfg" / "llvm.yml", EXAMPLES_DIR / ".." / "cfg" / "git.yml"]
+
+seal5_flow = Seal5Flow(DEST, name=NAME)
+
+
+def initialize():
+    # Optional: clean existing settings/models for fresh run
+    seal5_flow.reset(settings=True, interactive=False)
+    seal5_flow.clean(temp=True, patches=True, models=True, inputs=True, interactive=INTERACTIVE)
+
+    # Clone LLVM and init seal5 metadata directory
+    seal5_flow.initialize(
+        clone=True,
+        clone_url=CLONE_URL,
+        clone_ref=CLONE_REF,
+        clone_depth=CLONE_DEPTH,
+        progress=PROGRESS,
+        force=True,
+        verbose=VERBOSE,
+    )
+    load_inputs()
+
+    # Clone & install Seal5 dependencies
+    # 1. CDSL2LLVM (add PHASE_0 patches)
+    seal5_flow.setup(force=True, progress=PROGRESS, verbose=VERBOSE)
+
+
+def load_inputs():
+    seal5_flow.load(cdsl_files, verbose=VERBOSE, overwrite=True)
+    seal5_flow.load(test_files, verbose=VERBOSE, overwrite=True)
+    seal5_flow.load(cfg_files, verbose=VERBOSE, overwrite=False)
+
+    # Override settings from Python
+    seal5_flow.settings.llvm.default_config = BUILD_CONFIG
+
+
+def restore_stage0():
+    # Move the existing clone back to the tag locally. The later patches are
+    # commits on top of it, untracked files such as the Seal5 metadata
+    # directory with the build and the installed dependencies are kept
+    repo = seal5_flow.repo
+    if repo is None or STAGE0_TAG not in repo.tags:
+        raise RuntimeError(f"{STAGE0_TAG} is missing, rerun with FORCE=1")
+    repo.git.reset("--hard", STAGE0_TAG)
+
+    seal5_flow.reset(settings=True, interactive=False)
+    seal5_flow.clean(temp=True, patches=True, models=True, inputs=True, interactive=INTERACTIVE)
+    load_inputs()
 
-# Override settings from Python
-seal5_flow.settings.llvm.default_config = BUILD_CONFIG
 
-# Clone & install Seal5 dependencies
-# 1. CDSL2LLVM (add PHASE_0 patches)
-seal5_flow.setup(force=True, progress=PROGRESS, verbose=VERBOSE)
+def build_base():
+    initialize()
 
-# Apply initial patches
-if not PREPATCHED:
+    # Apply initial patches
     seal5_flow.patch(verbose=VERBOSE, stages=[PatchStage.PHASE_0])
 
-# Build initial LLVM
-seal5_flow.build(verbose=VERBOSE, config=BUILD_CONFIG)
+    # Build initial LLVM
+    seal5_flow.build(verbose=VERBOSE, config=BUILD_CONFIG)
 
-# Transform inputs
-#   1. Create M2-ISA-R metamodel
-#   2. Convert to Seal5 metamodel (including aliases, builtins,...)
-#   3. Analyse/optimize instructions
-seal5_flow.transform(verbose=VERBOSE)
 
-# Generate patches (except Patterns)
-seal5_flow.generate(verbose=VERBOSE, skip=["pattern_gen"])
+def transform():
+    if not staged_flow.ran("base"):
+        # The tree still carries the patches of the last run, reset it to the
+        # initial build instead of cloning and building LLVM again
+        restore_stage0()
 
-# Apply next patches
-seal5_flow.patch(verbose=VERBOSE, stages=[PatchStage.PHASE_1, PatchStage.PHASE_2])
+    # Transform inputs
+    #   1. Create M2-ISA-R metamodel
+    #   2. Convert to Seal5 metamodel (including aliases, builtins,...)
+    #   3. Analyse/optimize instructions
+    seal5_flow.transform(verbose=VERBOSE)
 
-# Build patched LLVM
-seal5_flow.build(verbose=VERBOSE, config=BUILD_CONFIG)
+    # Generate patches (except Patterns)
+    seal5_flow.generate(verbose=VERBOSE, skip=["pattern_gen"])
 
-if not SKIP_PATTERNS:
+
+def build_patched():
+    # Apply next patches
+    seal5_flow.patch(verbose=VERBOSE, stages=[PatchStage.PHASE_1, PatchStage.PHASE_2])
+
+    # Build patched LLVM
+    seal5_flow.build(verbose=VERBOSE, config=BUILD_CONFIG)
+
+
+def patterns():
     # Build PatternGen & llc
     seal5_flow.build(verbose=VERBOSE, config=BUILD_CONFIG, target="pattern-gen")
     seal5_flow.build(verbose=VERBOSE, config=BUILD_CONFIG, target="llc")
@@ -133,26 +180,46 @@ if not SKIP_PATTERNS:
     # Apply patches
     seal5_flow.patch(verbose=VERBOSE, stages=list(range(PatchStage.PHASE_3, PatchStage.PHASE_5 + 1)))
 
-# Build patched LLVM
-seal5_flow.build(verbose=VERBOSE, config=BUILD_CONFIG)
 
-if TEST:
+def build_final():
+    # Build patched LLVM
+    seal5_flow.build(verbose=VERBOSE, config=BUILD_CONFIG)
+
+
+def test():
     # Test patched LLVM
     seal5_flow.test(verbose=VERBOSE, ignore_error=IGNORE_ERROR)
 
-if INSTALL:
+
+def install():
     # Install final LLVM
     seal5_flow.install(verbose=VERBOSE, config=BUILD_CONFIG)
 
-if DEPLOY:
+
+def deploy():
     # Deploy patched LLVM (export sources)
     # TODO: combine commits and create tag
     seal5_flow.deploy(f"{DEST}_source.zip", verbose=VERBOSE)
 
-if EXPORT:
+
+def export():
     # Export patches, logs, reports
     seal5_flow.export(f"{DEST}.tar.gz", verbose=VERBOSE)
 
-if CLEANUP:
+
+# Stages are skipped when their inputs did not change since they last completed
+staged_flow = StagedFlow(f"{DEST}_stages.json", force=FORCE)
+staged_flow.add("base", build_base, [CLONE_URL, CLONE_REF, CLONE_DEPTH, BUILD_CONFIG] + llvm_cfg_files)
+staged_flow.add("transform", transform, cdsl_inputs + test_files + cfg_files)
+staged_flow.add("build_patched", build_patched)
+staged_flow.add("patterns", patterns, enabled=not SKIP_PATTERNS)
+staged_flow.add("build_final", build_final)
+staged_flow.add("test", test, [IGNORE_ERROR], enabled=TEST)
+staged_flow.add("install", install, after="build_final", enabled=INSTALL)
+staged_flow.add("deploy", deploy, after="build_final", enabled=DEPLOY)
+staged_flow.add("export", export, after="build_final", enabled=EXPORT)
+staged_flow.run(dry_run=DRY_RUN)
+
+if CLEANUP and not DRY_RUN:
     # Optional: cleanup temorary files, build dirs,...
     seal5_flow.clean(temp=True, patches=True, models=True, inputs=True, interactive=INTERACTIVE)
@@ -0,0 +1,271 @@
+import os
+import re
+import numpy as np
+
+FILTER_CONFIG = "src/cfg/filter.yml"
+
+# Major opcodes by the names used in the Seal5 filter config
+MAJOR_OPCODES = {
+    "LOAD": 0b0000011,
+    "custom-0": 0b0001011,
+    "OP-IMM": 0b0010011,
+    "STORE": 0b0100011,
+    "custom-1": 0b0101011,
+    "OP": 0b0110011,
+    "custom-2": 0b1011011,
+    "OP-P": 0b1110111,
+    "custom-3": 0b1111011,
+}
+
+CUSTOM_OPCODES = ["custom-0", "custom-1", "custom-2", "custom-3"]
+
+FUNCT3_VALUES = 8
+FUNCT7_VALUES = 128
+FUNCT2_VALUES = 4
+
+# funct7 -> funct3 values of R-type instructions the RV32 target already
+# decodes under the OP opcode
+RV32_OP_FUNCT7 = {
+    0b0000000: range(8),  # RV32I ADD, SLL, SLT, SLTU, XOR, SRL, OR, AND
+    0b0000001: range(8),  # RV32M
+    0b0100000: (0b000, 0b100, 0b101, 0b110, 0b111),  # SUB, SRA, Zbb XNOR/ORN/ANDN
+    0b0010000: (0b010, 0b100, 0b110),  # Zba SH1ADD, SH2ADD, SH3ADD
+    0b0000101: (0b001, 0b010, 0b011, 0b100, 0b101, 0b110, 0b111),  # Zbb/Zbc
+    0b0110000: (0b001, 0b101),  # Zbb ROL, ROR
+    0b0000100: (0b100,),  # Zbb ZEXT.H / Zbkb PACK
+    0b0100100: (0b001, 0b101),  # Zbs BCLR, BEXT
+    0b0010100: (0b001,),  # Zbs BSET
+    0b0110100: (0b001,),  # Zbs BINV
+    0b0000111: (0b101, 0b111),  # Zicond CZERO.EQZ, CZERO.NEZ
+}
+
+KNOWN_OCCUPANCY = {
+    "OP": RV32_OP_FUNCT7,
+}
+
+ENCODING_PATTERN = re.compile(
+    r"^(?:7'b(?P<funct7>[01]{7})|rs3\[4:0\] :: 2'b(?P<funct2>[01]{2})) :: (?:rs2\[4:0\]|5'b00000) :: "
+    r"rs1\[4:0\] :: 3'b(?P<funct3>[01]{3}) :: (?:rd\[4:0\]|5'b00000) :: 7'b(?P<opcode>[01]{7})$"
+)
+
+# Instruction name and encoding as written by gen_op_coredsl.write_instruction
+INSTRUCTION_PATTERN = re.compile(r"^\s*(\w+)\s*\{\s*\n\s*encoding:\s*([^;]+);", re.MULTILINE)
+
+
+def opcode_value(name):
+    # Names from the filter config, either symbolic or the 5 bits [6:2]
+    if name in MAJOR_OPCODES:
+        return MAJOR_OPCODES[name]
+    if isinstance(name, str) and name.startswith("0b"):
+        return (int(name, 2) << 2) | 0b11
+    if isinstance(name, int):
+        return (name << 2) | 0b11
+    return None
+
+
+def load_opcodes(filter_filepath=FILTER_CONFIG):
+    # Opcodes Seal5 keeps for the generated instruction set
+    if not os.path.exists(filter_filepath):
+        return list(CUSTOM_OPCODES)
+
+    import yaml
+
+    with open(filter_filepath, "r") as file:
+        config = yaml.safe_load(file) or {}
+    opcodes = config.get("filter", {}).get("opcodes", {}).get("keep")
+    # YAML reads 0b00000 as the integer 0, opcode_value handles both forms
+    return list(opcodes) if opcodes else list(CUSTOM_OPCODES)
+
+
+def operand_shape(inputs, outputs):
+    if inputs == 2 and outputs == 1:
+        return "R"
+    if inputs == 3 and outputs == 1:
+        return "R4"
+    # Loads and other one-source operations, and stores. Both are R-type
+    # with the unused register field fixed to zero and take one R slot
+    if inputs == 1 and outputs == 1:
+        return "R1"
+    if inputs == 2 and outputs == 0:
+        return "RS"
+    return None
+
+
+def format_encoding(shape, opcode, funct3, funct):
+    if shape == "R":
+        return f"7'b{funct:07b} :: rs2[4:0] :: rs1[4:0] :: 3'b{funct3:03b} :: rd[4:0] :: 7'b{opcode:07b}"
+    if shape == "R1":
+        return f"7'b{funct:07b} :: 5'b00000 :: rs1[4:0] :: 3'b{funct3:03b} :: rd[4:0] :: 7'b{opcode:07b}"
+    if shape == "RS":
+        return f"7'b{funct:07b} :: rs2[4:0] :: rs1[4:0] :: 3'b{funct3:03b} :: 5'b00000 :: 7'b{opcode:07b}"
+    return f"rs3[4:0] :: 2'b{funct:02b} :: rs2[4:0] :: rs1[4:0] :: 3'b{funct3:03b} :: rd[4:0] :: 7'b{opcode:07b}"
+
+
+def parse_encoding(encoding):
+    # Returns (opcode, funct3, funct7 values) of an encoding we emit, or None
+    match = ENCODING_PATTERN.match(encoding.strip())
+    if not match:
+        return None
+    opcode = int(match.group("opcode"), 2)
+    funct3 = int(match.group("funct3"), 2)
+    if match.group("funct7") is not None:
+        funct7 = [int(match.group("funct7"), 2)]
+    else:
+        funct2 = int(match.group("funct2"), 2)
+        funct7 = list(range(funct2, FUNCT7_VALUES, FUNCT2_VALUES))
+    return opcode, funct3, funct7
+
+
+class EncodingSpace:
+    """Free R-type space (funct3 x funct7) of every usable major opcode.
+
+    Each opcode is a FUNCT3_VALUES x FUNCT7_VALUES bitmap of used slots. A
+    two-source, one-source or store operation takes one slot, a three-source
+    (R4) operation takes the 32 funct7 values sharing its funct2 under one
+    funct3.
+    """
+
+    def __init__(self, opcodes=None):
+        if opcodes is None:
+            opcodes = load_opcodes()
+        self.opcodes = []  # (name, opcode value) in preference order
+        self.used = {}  # opcode value -> bool array [funct3, funct7]
+        self.owners = {}  # (opcode, funct3, funct7) -> instruction name
+
+        # Custom opcodes first, standard opcodes only take what the RV32
+        # extensions leave free once the custom space is full
+        opcodes = sorted(opcodes, key=lambda name: name not in CUSTOM_OPCODES)
+        for name in opcodes:
+            value = opcode_value(name)
+            if value is None or value in self.used:
+                print(f"Ignoring unknown opcode {name}")
+                continue
+            used = np.zeros((FUNCT3_VALUES, FUNCT7_VALUES), dtype=bool)
+            if name in KNOWN_OCCUPANCY:
+                for funct7, funct3_values in KNOWN_OCCUPANCY[name].items():
+                    used[list(funct3_values), funct7] = True
+            elif name not in CUSTOM_OPCODES:
+                # No decode table for this opcode, never place anything there
+                used[:, :] = True
+            self.opcodes.append((name, value))
+            self.used[value] = used
+
+    def reserve(self, encoding, name="existing"):
+        """Mark an encoding as taken, returns the names it collides with."""
+        parsed = parse_encoding(encoding)
+        if parsed is None:
+            return []
+        opcode, funct3, funct7_values = parsed
+        used = self.used.get(opcode)
+        if used is None:
+            return []
+        collisions = sorted(
+            {
+                self.owners.get((opcode, funct3, funct7), "RV32 base instruction")
+                for funct7 in funct7_values
+                if used[funct3, funct7]
+            }
+        )
+        used[funct3, funct7_values] = True
+        for funct7 in funct7_values:
+            self.owners.setdefault((opcode, funct3, funct7), name)
+        return collisions
+
+    def reserve_file(self, filepath):
+        # Encodings of an instruction set generated earlier stay where they are
+        with open(filepath, "r") as file:
+            content = file.read()
+        for name, encoding in INSTRUCTION_PATTERN.findall(content):
+            collisions = self.reserve(encoding, name)
+            if collisions:
+                print(f"Warning: {name} in {filepath} collides with {', '.join(collisions)}")
+
+    def _take(self, name, opcode, funct3, funct7_values):
+        self.used[opcode][funct3, funct7_values] = True
+        for funct7 in funct7_values:
+            self.owners[(opcode, funct3, funct7)] = name
+
+    def allocate_r(self, name, shape="R"):
+        # First free slot in preference order: opcode, funct3, funct7
+        for _, opcode in self.opcodes:
+            free = np.flatnonzero(~self.used[opcode])
+            if free.size:
+                funct3, funct7 = divmod(int(free[0]), FUNCT7_VALUES)
+                self._take(name, opcode, funct3, [funct7])
+                return format_encoding(shape, opcode, funct3, funct7)
+        return None
+
+    def allocate_r4(self, name):
+        # R4 groups are taken from the end of the custom space, so that they
+        # do not fragment the region the two-source operations fill from the
+        # start
+        custom = [opcode for name, opcode in self.opcodes if name in CUSTOM_OPCODES]
+        standard = [
+            opcode for name, opcode in self.opcodes if name not in CUSTOM_OPCODES
+        ]
+        for opcode in list(reversed(custom)) + standard:
+            used = self.used[opcode]
+            for funct3 in reversed(range(FUNCT3_VALUES)):
+                for funct2 in reversed(range(FUNCT2_VALUES)):
+                    funct7_values = list(range(funct2, FUNCT7_VALUES, FUNCT2_VALUES))
+                    if not used[funct3, funct7_values].any():
+                        self._take(name, opcode, funct3, funct7_values)
+                        return format_encoding("R4", opcode, funct3, funct2)
+        return None
+
+    def capacity(self):
+        # Remaining slots per opcode: free two-source slots and R4 groups
+        capacity = {}
+        for name, opcode in self.opcodes:
+            used = self.used[opcode]
+            groups = used.reshape(FUNCT3_VALUES, FUNCT7_VALUES // FUNCT2_VALUES, FUNCT2_VALUES)
+            capacity[name] = {
+                "used": int(used.sum()),
+                "free_r": int((~used).sum()),
+                "free_r4": int((~groups.any(axis=1)).sum()),
+            }
+        return capacity
+
+    def report(self):
+        lines = [f"{'opcode':<12}{'used':>8}{'free R':>10}{'free R4':>10}"]
+        for name, capacity in self.capacity().items():
+            lines.append(
+                f"{name:<12}{capacity['used']:>8}{capacity['free_r']:>10}{capacity['free_r4']:>10}"
+            )
+        return "\n".join(lines)
+
+
+def allocate_encodings(operations, space=None):
+    """Place all operations at once.
+
+    operations is a list of (name, inputs, outputs). R4 operations are placed
+    before the one-slot ones, since they need aligned groups of 32 slots.
+    Returns name -> encoding; operations that do not fit or have an
+    unsupported shape map to "".
+    """
+    if space is None:
+        space = EncodingSpace()
+
+    encodings = {}
+    shapes = {name: operand_shape(inputs, outputs) for name, inputs, outputs in operations}
+    # The one-slot shapes R, R1 and RS share a pass, in operation order
+    for group in (("R4",), ("R", "R1", "RS")):
+        for name, inputs, outputs in operations:
+            shape = shapes[name]
+            if shape not in group:
+                continue
+            if shape == "R4":
+                encoding = space.allocate_r4(name)
+            else:
+                encoding = space.allocate_r(name, shape)
+            if encoding is None:
+                print(f"Error: Encoding space exhausted, no {shape} slot left for {name}")
+                encoding = ""
+            encodings[name] = encoding
+
+    for name, inputs, outputs in operations:
+        if shapes[name] is None:
+            print(f"Error: Unsupported number of inputs and outputs for {name}")
+            encodings[name] = ""
+
+    return encodings
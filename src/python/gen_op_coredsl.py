@@ -1,8 +1,20 @@
-from operator import ge
 import pandas as pd
 import os
+import io
 import argparse
 import re
+from trigger_index import CACHE_DIRECTORY, load_trigger_index
+from osal_rewrite import RewriteError, rewrite_trigger_code
+from operation_store import find_operation_table, load_operation_table
+from generation_manifest import GenerationManifest, operation_hash
+from encoding_allocator import EncodingSpace, allocate_encodings, operand_shape
+from pipeline_profile import profiled, stage
+from cdsl_ir import optimize_behavior
+from cdsl_parser import ParseError
+from op_composer import Composer, ComposeError, composite
+from op_graph import OperationGraph
+from packed_simd import PackedError, is_packed, packed_behavior_code
+from memory_ops import PostIncrementError, address_operand, post_increment_variant
 
 
 def find_single_exec_operations(df):
@@ -27,81 +39,18 @@ def find_single_exec_operations(df):
     return single_exec_operations
 
 
+@profiled("extract_trigger_code")
 def extract_trigger_code(filepath, operations):
-    operation_codes = {}
+    # Backed by the shared trigger index, the .cc file is scanned only once
+    return load_trigger_index(filepath).bodies(operations)
 
-    with open(filepath, "r") as file:
-        content = file.read()
 
-        for operation in operations:
-            pattern = rf"OPERATION\({operation}\)(.*?)END_OPERATION\({operation}\)"
-            match = re.search(pattern, content, re.DOTALL)
-
-            if match:
-                operation_code = match.group(1).strip()
-                operation_codes[operation] = operation_code
-
-    return operation_codes
-
-
-def transform_trigger_code(trigger_code, remove_RFS=False):
+@profiled("transform_trigger_code")
+def transform_trigger_code(trigger_code, remove_RFS=False, inputs=None):
     transformed_code = ""
 
-    # Replace UINT and ULONG with appropriate formats
-    trigger_code = re.sub(r"UINT\((\d+)\)", r"X[rs\1 % RFS]", trigger_code)
-    trigger_code = re.sub(r"ULONG\((\d+)\)", r"X[rs\1 % RFS]", trigger_code)
-    trigger_code = re.sub(r"INT\((\d+)\)", r"X[rs\1 % RFS]", trigger_code)
-
-    # Replace SIntWord and UIntWord with signed<32> and unsigned<32> respectively
-    trigger_code = re.sub(r"SIntWord", r"signed<32>", trigger_code)
-    trigger_code = re.sub(r"UIntWord", r"unsigned<32>", trigger_code)
-
-    # Replace MIN and OSAL_WORD_WIDTH with appropriate formats
-    trigger_code = re.sub(r"MIN\(([^)]+)\)", r"min(\1)", trigger_code)
-    trigger_code = re.sub(r"OSAL_WORD_WIDTH", r"32", trigger_code)
-
-    # Replace other specific patterns
-    trigger_code = re.sub(r"BWIDTH\(([^)]+)\)", r"BWIDTH(X[rs\1 % RFS])", trigger_code)
-    trigger_code = re.sub(r"remainder\(([^)]+)\)", r"remainder(\1)", trigger_code)
-    trigger_code = re.sub(
-        r"static_cast<((?:[^<>]+|<[^<>]*>)+)>\(([^)]+)\)", r"(\1)(\2)", trigger_code
-    )
-    trigger_code = re.sub(
-        r"static_cast<((?:[^<>]+|<[^<>]*>)+)>\(([^)]+)\)", r"(\1)(\2)", trigger_code
-    )
-    trigger_code = re.sub(r"raise\(([^,]+), ([^)]+)\)", r"raise(\1, \2)", trigger_code)
-    trigger_code = re.sub(r"return true;", r"", trigger_code)
-    trigger_code = re.sub(r"long long", r"long", trigger_code)
-    trigger_code = re.sub(r"sizeof\(unsigned<32>\)", r"4", trigger_code)
-
-    # Remove TRIGGER and END_TRIGGER; lines
-    trigger_code = re.sub(r"END_TRIGGER;", r"", trigger_code)
-    trigger_code = re.sub(r"TRIGGER", r"", trigger_code)
-
-    # Replace IO
-    if re.search(r"IO\(4\)", trigger_code):
-        trigger_code = re.sub(r"IO\(4\)", r"X[rd % RFS]", trigger_code)
-        trigger_code = re.sub(r"IO\(1\)", r"X[rs1 % RFS]", trigger_code)
-        trigger_code = re.sub(r"IO\(2\)", r"X[rs2 % RFS]", trigger_code)
-        trigger_code = re.sub(r"IO\(3\)", r"X[rs3 % RFS]", trigger_code)
-    else:
-        trigger_code = re.sub(r"IO\(1\)", r"X[rs1 % RFS]", trigger_code)
-        trigger_code = re.sub(r"IO\(2\)", r"X[rs2 % RFS]", trigger_code)
-        trigger_code = re.sub(r"IO\(3\)", r"X[rd % RFS]", trigger_code)
-
-    # Change specific condition if (X[rs2 % RFS] == 0) to if (X[rs2 % RFS] != 0) and remove RUNTIME_ERROR
-    trigger_code = re.sub(
-        r'if\s*\(X\[rs2\s*%\s*RFS\]\s*==\s*0\)\s*RUNTIME_ERROR\("Divide by zero."\)',
-        r"if (X[rs2 % RFS] != 0) {",
-        trigger_code,
-    )
-
-    # Change specific condition if (bitToSearch > 1) RUNTIME_ERROR("LMDB's 2nd operand must be 0 or 1!");
-    trigger_code = re.sub(
-        r'if\s*\(bitToSearch\s*>\s*1\)\s*RUNTIME_ERROR\("LMDB\'s 2nd operand must be 0 or 1!"\);',
-        r"if (bitToSearch <= 1) {",
-        trigger_code,
-    )
+    # Translate all OSAL macros in a single pass, see osal_rewrite.TRIGGER_RULES
+    trigger_code = rewrite_trigger_code(trigger_code, remove_RFS, inputs)
 
     # Add necessary indentation and formatting with 12 spaces
     lines = trigger_code.strip().splitlines()
@@ -109,7 +58,9 @@ def transform_trigger_code(trigger_code, remove_RFS=False):
     inside_if_block = False
     for line in lines:
         # Check for if statement and ensure it has correct indentation
-        if line.startswith("if (X[rs2 % RFS] != 0) {"):
+        if line.startswith("if (X[rs2 % RFS] != 0) {") or line.startswith(
+            "if (X[rs2] != 0) {"
+        ):
             transformed_code += f"{' ' * 12}{line}\n"
             inside_if_block = True
         elif line.startswith("if (bitToSearch <= 1) {"):
@@ -132,347 +83,500 @@ def transform_trigger_code(trigger_code, remove_RFS=False):
     if inside_if_block:
         transformed_code += f"{' ' * 16}}}\n"
 
-    if remove_RFS:
-        transformed_code = re.sub(r" % RFS", r"", transformed_code)
-
     return transformed_code
 
 
-def find_based_operation(row, generate_single_exec_operations=False):
-    semantics = row["trigger_semantics"]
-
-    if pd.notna(semantics):
-        # Find all EXEC_OPERATION occurrences
-        matches = re.findall(
-            r"EXEC_OPERATION\(\s*(\w+)\s*(?:,\s*(.*?)\s*)?(?:,\s*(.*?)\s*)?(?:,\s*(.*?)\s*)?\);",
-            semantics
+class GenerationContext:
+    """Operation table and derived lookups shared by every generation stage.
+
+    The table is loaded once; the single-exec set, the name -> row index, the
+    trigger index and the operation graph are computed up front so that
+    generating an operation never has to go back to the input file.
+    """
+
+    @profiled("build_context")
+    def __init__(
+        self,
+        df,
+        filename,
+        trigger_filepath=None,
+        generate_single_exec_operations=False,
+        remove_RFS=False,
+        cache_directory=CACHE_DIRECTORY,
+    ):
+        self.df = df
+        self.filename = filename
+        self.generate_single_exec_operations = generate_single_exec_operations
+        self.remove_RFS = remove_RFS
+
+        self.all_operations = df["name"].tolist()
+        self.operation_names = set(self.all_operations)
+        self.single_exec_operations = set(find_single_exec_operations(df))
+        self.rows = {row["name"]: row for _, row in df.iterrows()}
+
+        if trigger_filepath is None:
+            trigger_filepath = f"openasip/openasip/opset/base/{filename}.cc"
+        self.trigger_filepath = trigger_filepath
+        self.trigger_index = load_trigger_index(trigger_filepath, cache_directory)
+        self.composer = Composer(
+            self.rows,
+            self.trigger_index,
+            lambda code, inputs: transform_trigger_code(code, remove_RFS, inputs),
+            remove_RFS,
         )
-
-        if len(matches) == 1:  # If there is only one EXEC_OPERATION
-            based_operation = matches[0][
-                0
-            ]  # Get the first match's first group (operation name)
-            print(f"base_operation of {row['name']}: {based_operation.upper()}")
-            return [based_operation.upper()]
-
-        elif len(matches) == 2:  # If there are exactly two EXEC_OPERATIONs
-            if generate_single_exec_operations:  # If only a single operation is allowed
-                print(
-                    f"Error: Multiple EXEC_OPERATION found but single_exec_operations is set to True for {row['name']}."
-                )
-                return None
-            else:  # If multiple operations are allowed, return both operation names
-                based_operations = [match[0].upper() for match in matches]
-                print(f"base_operations of {row['name']}: {based_operations}")
-                return based_operations
-
-        elif len(matches) > 2:  # If there are more than two EXEC_OPERATIONs
-            print(f"Error: More than two EXEC_OPERATION found for {row['name']}.")
-            return None
-
-    # Return None if no EXEC_OPERATION is found or semantics is NaN
-    return None
-
-
-def transform_no_trigger_op_code(behavior_code, remove_RFS):
-    if remove_RFS:
-        if re.search(r"IO\(4\)", behavior_code):
-            behavior_code = re.sub(r"IO\(4\)", r"X[rd]", behavior_code)
-            behavior_code = re.sub(r"IO\(1\)", r"X[rs1]", behavior_code)
-            behavior_code = re.sub(r"IO\(2\)", r"X[rs2]", behavior_code)
-            behavior_code = re.sub(r"IO\(3\)", r"X[rs3]", behavior_code)
+        with stage("build_graph"):
+            self.graph = OperationGraph(self.rows, self.trigger_index)
+
+    @classmethod
+    def from_file(cls, input_filepath, **kwargs):
+        filename = os.path.splitext(os.path.basename(input_filepath))[0]
+        df = load_operation_table(input_filepath)
+        return cls(df, filename, **kwargs)
+
+
+@profiled("generate_behavior_code")
+def generate_behavior_code(operation_name, row, context):
+    if is_packed(row):
+        # Lane-wise kernel, the scalar trigger would mix up the lanes
+        try:
+            return packed_behavior_code(row, context.composer.register)
+        except PackedError as e:
+            print(f"Error: {e}")
+            return -1
+
+    if context.trigger_index.get(operation_name, ""):
+        try:
+            return context.composer.translation(operation_name)
+        except RewriteError as e:
+            print(f"Error: Cannot translate {operation_name}: {e}")
+            return -1
+
+    print(f"Trigger code not found for operation {operation_name}")
+    if not composite(row):
+        return ""
+    # Composite of other operations, see op_composer
+    try:
+        return context.composer.behavior_code(operation_name)
+    except ComposeError as e:
+        print(f"Error: {e}")
+        return -1
+
+
+def write_functions(f):
+    f.write("    functions{\n")
+    f.write("        // Returns the minimum of two signed integers.\n")
+    f.write("        signed<32> min(signed<32> a, signed<32> b) {\n")
+    f.write("            return (a < b) ? a : b;\n")
+    f.write("        }\n")
+    f.write("        // Returns the remainder of two signed integers.\n")
+    f.write("        signed<32> remainder(signed<32> a, signed<32> b) {\n")
+    f.write("            signed<32> temp = a % b;\n")
+    f.write("            if ((temp < 0 && b > 0) || (temp > 0 && b < 0)) {\n")
+    f.write("                temp += b;\n")
+    f.write("            }\n")
+    f.write("            return temp;\n")
+    f.write("        }\n")
+    f.write("        signed<32> BWIDTH(signed<32> a) {\n")
+    f.write("            return 32;\n")
+    f.write("        }\n")
+    f.write("    }\n")
+
+
+def write_instruction(f, filename, row, behavior_code, encoding, inputs, outputs):
+    operation_name = row["name"]
+    description = row["description"]
+    operands_list = []
+    for i in range(outputs):
+        operands_list.append(f"{{name(rd)}}")
+    for i in range(inputs):
+        operands_list.append(f"{{name(rs{i+1})}}")
+
+    operands_str = ", ".join(operands_list)
+
+    # Write description as comment at the beginning of each operation
+    if pd.notna(description):
+        # Split description into lines and write each line as a comment
+        description_lines = description.splitlines()
+        for line in description_lines:
+            f.write(f"        // {line}\n")
+
+    # Write operands section
+    f.write(f"        OpenASIP_{filename}_{operation_name} " + "{\n")
+
+    # Write encoding section
+    f.write("            encoding: ")
+
+    f.write(f"{encoding};\n")
+
+    # Write assembly section
+    f.write('            assembly: "')
+
+    f.write(f'{operands_str}";\n')  # Complete assembly format
+
+    f.write("            behavior: {\n")
+    f.write(f"    {behavior_code}")
+
+    f.write("            }\n")
+    f.write("        }\n")
+
+
+def write_if_changed(filepath, content):
+    existing_content = None
+    if os.path.exists(filepath):
+        with open(filepath, "r") as file:
+            existing_content = file.read()
+
+    # Leaving an unchanged file untouched keeps its mtime, so the downstream
+    # Seal5/LLVM and ETISS builds see no change
+    if content == existing_content:
+        print(f"Instruction set {filepath} is unchanged, leaving it untouched")
+        return False
+    with open(filepath, "w") as file:
+        file.write(content)
+    print(f"Generated instruction set saved to {filepath}")
+    return True
+
+
+SHARD_MODES = ("operation", "shape", "kind")
+
+
+def shard_name(row, inputs, outputs, shard_by):
+    if shard_by == "operation":
+        name = row["name"]
+    elif shard_by == "shape":
+        name = operand_shape(inputs, outputs)
+    elif shard_by == "kind":
+        # Composites of other operations vs. operations with their own trigger
+        semantics = row.get("trigger_semantics")
+        if isinstance(semantics, str) and "EXEC_OPERATION" in semantics:
+            name = "composite"
         else:
-            behavior_code = re.sub(r"IO\(1\)", r"X[rs1]", behavior_code)
-            behavior_code = re.sub(r"IO\(2\)", r"X[rs2]", behavior_code)
-            behavior_code = re.sub(r"IO\(3\)", r"X[rd]", behavior_code)
+            name = "plain"
     else:
-        if re.search(r"IO\(4\)", behavior_code):
-            behavior_code = re.sub(r"IO\(4\)", r"X[rd % RFS]", behavior_code)
-            behavior_code = re.sub(r"IO\(1\)", r"X[rs1 % RFS]", behavior_code)
-            behavior_code = re.sub(r"IO\(2\)", r"X[rs2 % RFS]", behavior_code)
-            behavior_code = re.sub(r"IO\(3\)", r"X[rs3 % RFS]", behavior_code)
-        else:
-            behavior_code = re.sub(r"IO\(1\)", r"X[rs1 % RFS]", behavior_code)
-            behavior_code = re.sub(r"IO\(2\)", r"X[rs2 % RFS]", behavior_code)
-            behavior_code = re.sub(r"IO\(3\)", r"X[rd % RFS]", behavior_code)
-
-    return behavior_code
-
-
-def transform_behavior_code(based_operation, trigger_code, semantics, remove_RFS=False):
-    match = re.search(
-        rf"EXEC_OPERATION\({based_operation.lower()},\s*(.*?),\s*(.*?),\s*(.*?)\);",
-        semantics
-    )
-    if match:
-        # Extract the operands and result
-        operand1, operand2, result = match.groups()
-        if remove_RFS:
-            trigger_code = trigger_code.replace("X[rs1]", operand1)
-            trigger_code = trigger_code.replace("X[rs2]", operand2)
-            trigger_code = trigger_code.replace("X[rd]", result)
-        else:
-            trigger_code = trigger_code.replace("X[rs1 % RFS]", operand1)
-            trigger_code = trigger_code.replace("X[rs2 % RFS]", operand2)
-            trigger_code = trigger_code.replace("X[rd % RFS]", result)
-
-    trigger_code = re.sub(r'\bshifted\s*=', 'signed<32> shifted =', trigger_code)
-    trigger_code = re.sub(r'\bt1\s*=', 'signed<32> t1 =', trigger_code)
-
-    return trigger_code
-
-
-def generate_single_exec_operation_behavior_code(
-    operation_name,
-    filename,
-    row,
-    remove_RFS,
-    generate_single_exec_operations,
-    single_exec_operations,
-):
-    trigger_filepath = f"openasip/openasip/opset/base/{filename}.cc"
-    trigger_code = extract_trigger_code(trigger_filepath, single_exec_operations)
-    behavior_code = transform_trigger_code(
-        trigger_code.get(operation_name, ""), remove_RFS
-    )
-    if not behavior_code:
-        print(f"Trigger code not found for operation {operation_name}")
-        based_operation = find_based_operation(row, generate_single_exec_operations)
-        if based_operation:
-            behavior_code = transform_trigger_code(
-                trigger_code.get(based_operation[0], ""), remove_RFS
-            )
-            semantics = row["trigger_semantics"]
-            behavior_code = transform_behavior_code(
-                based_operation[0], behavior_code, semantics, remove_RFS
-            )
-            behavior_code = transform_no_trigger_op_code(behavior_code, remove_RFS)
-
-    return behavior_code
-
-
-def generate_behavior_code(
-    operation_name,
-    input_filepath,
-    filename,
-    row,
-    df,
-    remove_RFS,
-    generate_single_exec_operations,
-    all_operations,
-):
-    single_exec_operations = find_single_exec_operations(pd.read_excel(input_filepath))
-    if generate_single_exec_operations:
-        behavior_code = generate_single_exec_operation_behavior_code(
-            operation_name,
-            filename,
-            row,
-            remove_RFS,
-            generate_single_exec_operations,
-            single_exec_operations,
+        raise ValueError(f"Unknown shard mode {shard_by}, use one of {SHARD_MODES}")
+    return re.sub(r"\W", "_", name).lower()
+
+
+def shard_files(filename, emitted, shard_by):
+    """Contents of the shard files of one opset, file name -> text.
+
+    The helper functions live in a common set every shard extends, and the
+    top file imports all shards and combines them into OpenASIP_<filename>,
+    so loading the top file is equivalent to the monolithic output.
+    """
+    groups = {}
+    for row, behavior_code, encoding, inputs, outputs in emitted:
+        shard = shard_name(row, inputs, outputs, shard_by)
+        groups.setdefault(shard, []).append(
+            (row, behavior_code, encoding, inputs, outputs)
         )
-    else:
-        if operation_name in single_exec_operations:
-            behavior_code = generate_single_exec_operation_behavior_code(
-                operation_name,
-                filename,
-                row,
-                remove_RFS,
-                generate_single_exec_operations,
-                single_exec_operations,
-            )
-        else:
-            trigger_filepath = f"openasip/openasip/opset/base/{filename}.cc"
-            trigger_code_dict = extract_trigger_code(trigger_filepath, all_operations)
-            behavior_code = trigger_code_dict.get(operation_name, "")
 
-            if not behavior_code:
-                print(f"Trigger code not found for operation {operation_name}")
-                based_operations = find_based_operation(
-                    row, generate_single_exec_operations
-                )
-                for based_operation in based_operations:
-                    if based_operation not in all_operations:
-                        print(f"Error: Based operation {based_operations} not found.")
-                        return -1
-                if based_operations:
-                    behavior_code = ""
-                    semantics = row["trigger_semantics"]
-                    for i in range(len(based_operations)):
-                        print(
-                            f"generating behavior code of {operation_name}: {based_operations[i]}"
-                        )
-                        trigger_code = trigger_code_dict.get(based_operations[i], "")
-                        inter_behavior_code = transform_trigger_code(
-                            trigger_code, remove_RFS
-                        )
-                        inter_behavior_code = transform_behavior_code(
-                            based_operations[i],
-                            inter_behavior_code,
-                            semantics,
-                            remove_RFS,
-                        )
-                        if i == 0:
-                            behavior_code += inter_behavior_code
-                        else:
-                            behavior_code += f"    {inter_behavior_code}"
-                    behavior_code = transform_no_trigger_op_code(
-                        behavior_code, remove_RFS
-                    )
-
-    return behavior_code
-
-def generate_encoding(operation_name, inputs, outputs, counters):
-    func7_counter, func3_counter = counters
-
-    if inputs == 2 and outputs == 1:
-        func7 = f"7'b{func7_counter:07b}"
-        func7_counter += 1
-        encoding = (
-            f"{func7} :: rs2[4:0] :: rs1[4:0] :: 3'b000 :: rd[4:0] :: 7'b0001011"
-        )
-    elif inputs == 3 and outputs == 1:
-        func3 = f"3'b{func3_counter:03b}"
-        func3_counter += 1
-        encoding = (
-            f"rs3[4:0] :: 2'b00 :: rs2[4:0] :: rs1[4:0] :: {func3} :: rd[4:0] :: 7'b0110011"
-        )
-    else:
-        print(f"Error: Unsupported number of inputs and outputs for {operation_name}")
-        encoding = ""
+    common = f"{filename}_common.core_desc"
+    files = {}
+    with io.StringIO() as f:
+        f.write(f"InstructionSet OpenASIP_{filename}_common extends RV32I {{\n")
+        write_functions(f)
+        f.write("}\n")
+        files[common] = f.getvalue()
+
+    for shard in sorted(groups):
+        with io.StringIO() as f:
+            f.write(f'import "{common}"\n\n')
+            f.write(
+                f"InstructionSet OpenASIP_{filename}_{shard} "
+                f"extends OpenASIP_{filename}_common {{\n"
+            )
+            f.write("    instructions {\n")
+            for row, behavior_code, encoding, inputs, outputs in groups[shard]:
+                write_instruction(f, filename, row, behavior_code, encoding, inputs, outputs)
+            f.write("    }\n")
+            f.write("}\n")
+            files[f"{filename}_{shard}.core_desc"] = f.getvalue()
+
+    with io.StringIO() as f:
+        for shard in sorted(groups):
+            f.write(f'import "{filename}_{shard}.core_desc"\n')
+        f.write("\n")
+        bases = [f"OpenASIP_{filename}_{shard}" for shard in sorted(groups)]
+        if not bases:
+            bases = [f"OpenASIP_{filename}_common"]
+            f.write(f'import "{common}"\n\n')
+        f.write(f"InstructionSet OpenASIP_{filename} extends {', '.join(bases)} {{\n")
+        f.write("}\n")
+        files[f"{filename}_top.core_desc"] = f.getvalue()
+    return files
 
-    # Update counters in-place
-    counters[0] = func7_counter
-    counters[1] = func3_counter
 
-    return encoding
+def write_shards(shard_directory, files):
+    os.makedirs(shard_directory, exist_ok=True)
+    changed = False
+    for name, content in files.items():
+        changed |= write_if_changed(os.path.join(shard_directory, name), content)
 
+    # Shards of groups that no longer exist would still be picked up by globs
+    for name in os.listdir(shard_directory):
+        if name.endswith(".core_desc") and name not in files:
+            os.remove(os.path.join(shard_directory, name))
+            print(f"Removed stale shard {name}")
+            changed = True
+    return changed
 
 
-def generate_instruction_set(
+def build_instructions(
     input_filepath,
     output_directory,
     generate_single_exec_operations=False,
     remove_RFS=False,
+    context=None,
+    incremental=True,
+    selected_operations=None,
+    optimize=True,
+    post_increment=False,
 ):
-    # Extract file name without extension
-    filename = os.path.splitext(os.path.basename(input_filepath))[0]
-
-    # Load Excel file
-    df = pd.read_excel(input_filepath)
+    """Behavior blocks of the operations of one opset, before any encoding.
+
+    Returns a dictionary with the opset name, the (row, behavior, inputs,
+    outputs) instructions and skipped operations in table order and the
+    manifest hit counts. Encodings are allocated separately, so several
+    opsets can be placed in one encoding space, see emit_instruction_set.
+    """
+    # Load the operation table once, every stage below reuses the context
+    if context is None:
+        context = GenerationContext.from_file(
+            input_filepath,
+            generate_single_exec_operations=generate_single_exec_operations,
+            remove_RFS=remove_RFS,
+        )
+    filename = context.filename
 
-    # Create output directory if it doesn't exist
-    if not os.path.exists(output_directory):
-        os.makedirs(output_directory)
+    # Create output directory if it doesn't exist, --all-opsets workers
+    # may create it at the same time
+    os.makedirs(output_directory, exist_ok=True)
 
     output_filepath = os.path.join(output_directory, f"{filename}.core_desc")
 
-    with open(output_filepath, "w") as f:
-        f.write("InstructionSet OpenASIP_{} extends RV32I {{\n".format(filename))
-        f.write("    functions{\n")
-        f.write("        // Returns the minimum of two signed integers.\n")
-        f.write("        signed<32> min(signed<32> a, signed<32> b) {\n")
-        f.write("            return (a < b) ? a : b;\n")
-        f.write("        }\n")
-        f.write("        // Returns the remainder of two signed integers.\n")
-        f.write("        signed<32> remainder(signed<32> a, signed<32> b) {\n")
-        f.write("            signed<32> temp = a % b;\n")
-        f.write("            if ((temp < 0 && b > 0) || (temp > 0 && b < 0)) {\n")
-        f.write("                temp += b;\n")
-        f.write("            }\n")
-        f.write("            return temp;\n")
-        f.write("        }\n")
-        f.write("        signed<32> BWIDTH(signed<32> a) {\n")
-        f.write("            return 32;\n")
-        f.write("        }\n")
-        f.write("    }\n")
-        f.write("    instructions {\n")
-
-        single_exec_operations = find_single_exec_operations(df)
-
-        all_operations = df["name"].tolist()
-
-        # Initialize counters as a list
-        counters = [0, 0]
-
-        for index, row in df.iterrows():
-            operation_name = row["name"]
-
-            # Check if generate_single_exec_operations is True and operation_name is NOT in single_exec_operations
-            if (
-                generate_single_exec_operations
-                and operation_name not in single_exec_operations
-            ):
-                print(
-                    f"Skipping operation {operation_name} as it is not in single_exec_operations list"
-                )
-                continue
-
-            print(f"\nGenerating code for operation {operation_name}")
-
-            behavior_code = generate_behavior_code(
-                operation_name,
-                input_filepath,
-                filename,
-                row,
-                df,
-                remove_RFS,
-                generate_single_exec_operations,
-                all_operations,
+    # Behavior blocks of operations whose inputs did not change are reused
+    manifest = GenerationManifest.for_output(output_filepath)
+    flags = {
+        "remove_RFS": context.remove_RFS,
+        "single_exec_operations": context.generate_single_exec_operations,
+        "optimize": optimize,
+        "post_increment": post_increment,
+    }
+
+    single_exec_operations = context.single_exec_operations
+
+    skipped_operations = []
+
+    # First collect the behavior of every operation, so that the encoding
+    # space can be planned for exactly the operations that get emitted. The
+    # based operations of a composite are translated before it, see op_graph
+    instructions = []
+    position = {name: index for index, name in enumerate(context.all_operations)}
+    for operation_name in context.graph.order:
+        row = context.rows[operation_name]
+
+        # Check if generate_single_exec_operations is True and operation_name is NOT in single_exec_operations
+        if (
+            context.generate_single_exec_operations
+            and operation_name not in single_exec_operations
+        ):
+            print(
+                f"Skipping operation {operation_name} as it is not in single_exec_operations list"
             )
-            if behavior_code == -1:
-                continue
-            description = row["description"]
-            # Determine number of rd and rs based on inputs and outputs columns
-            inputs = int(row["inputs"]) if pd.notna(row["inputs"]) else 0
-            outputs = int(row["outputs"]) if pd.notna(row["outputs"]) else 0
-            encoding = generate_encoding(
-                operation_name, inputs, outputs, counters
+            skipped_operations.append(operation_name)
+            continue
+
+        # Profile-guided selection, see op_selection
+        if selected_operations is not None and operation_name not in selected_operations:
+            print(f"Skipping operation {operation_name} as it is not selected")
+            skipped_operations.append(operation_name)
+            continue
+
+        problem = context.graph.problems.get(operation_name)
+        if problem:
+            print(f"\nSkipping operation {operation_name}")
+            print(f"Error: {problem}")
+            skipped_operations.append(operation_name)
+            continue
+
+        key = operation_hash(row, context.trigger_index, flags, context.rows)
+        if incremental:
+            found, behavior_code = manifest.lookup(operation_name, key)
+        else:
+            # Regenerated unconditionally, still reported as a miss
+            found, behavior_code = False, None
+            manifest.misses += 1
+        if found:
+            print(f"\nReusing cached code for operation {operation_name}")
+            if behavior_code is None:
+                behavior_code = -1
+        else:
+            print(f"\nGenerating code for operation {operation_name}")
+            behavior_code = generate_behavior_code(operation_name, row, context)
+            if optimize and behavior_code != -1:
+                behavior_code = optimize_behavior(behavior_code)
+            manifest.store(
+                operation_name, key, None if behavior_code == -1 else behavior_code
             )
-            operands_list = []
-            for i in range(outputs):
-                operands_list.append(f"{{name(rd)}}")
-            for i in range(inputs):
-                operands_list.append(f"{{name(rs{i+1})}}")
-
-            operands_str = ", ".join(operands_list)
-
-            # Write description as comment at the beginning of each operation
-            if pd.notna(description):
-                # Split description into lines and write each line as a comment
-                description_lines = description.splitlines()
-                for line in description_lines:
-                    f.write(f"        // {line}\n")
-
-            # Write operands section
-            f.write(f"        OpenASIP_{filename}_{operation_name} " + "{\n")
 
-            # Write encoding section
-            f.write("            encoding: ")
+        if behavior_code == -1:
+            skipped_operations.append(operation_name)
+            continue
 
-            f.write(f"{encoding};\n")
+        # Determine number of rd and rs based on inputs and outputs columns
+        inputs = int(row["inputs"]) if pd.notna(row["inputs"]) else 0
+        outputs = int(row["outputs"]) if pd.notna(row["outputs"]) else 0
+        instructions.append((row, behavior_code, inputs, outputs))
 
-            # Write assembly section
-            f.write('            assembly: "')
-
-            f.write(f'{operands_str}";\n')  # Complete assembly format
-
-            f.write("            behavior: {\n")
-            f.write(f"    {behavior_code}")
+        # Load/store with the address register advanced past the access
+        if post_increment and address_operand(row) is not None:
+            try:
+                variant, variant_code = post_increment_variant(
+                    row, behavior_code, context.composer.register
+                )
+            except (PostIncrementError, ParseError) as e:
+                print(f"No post-increment variant of {operation_name}: {e}")
+            else:
+                if optimize:
+                    variant_code = optimize_behavior(variant_code)
+                position[variant["name"]] = position[operation_name] + 0.5
+                instructions.append((variant, variant_code, inputs, outputs))
+
+    # Encodings and output follow the order of the operation table
+    instructions.sort(key=lambda instruction: position[instruction[0]["name"]])
+    skipped_operations.sort(key=position.get)
+
+    manifest.prune(context.operation_names)
+    manifest.save()
+
+    return {
+        "filename": filename,
+        "instructions": instructions,
+        "skipped": skipped_operations,
+        "hits": manifest.hits,
+        "misses": manifest.misses,
+    }
+
+
+def emit_instruction_set(built, output_directory, encoding_space, shard_by=None):
+    """Allocate encodings for built instructions and write the instruction set."""
+    filename = built["filename"]
+    instructions = built["instructions"]
+    skipped_operations = list(built["skipped"])
+    generated_operations = []
+    output_filepath = os.path.join(output_directory, f"{filename}.core_desc")
 
-            f.write("            }\n")
-            f.write("        }\n")
+    with stage("allocate_encodings"):
+        encodings = allocate_encodings(
+            [(row["name"], inputs, outputs) for row, _, inputs, outputs in instructions],
+            encoding_space,
+        )
 
-        f.write("    }\n")
-        f.write("}\n")
+    emitted = []
+    for row, behavior_code, inputs, outputs in instructions:
+        encoding = encodings[row["name"]]
+        if not encoding:
+            # Unsupported operand shape or no free slot left
+            skipped_operations.append(row["name"])
+            continue
+        emitted.append((row, behavior_code, encoding, inputs, outputs))
+        generated_operations.append(row["name"])
+
+    shards = None
+    if shard_by is None:
+        # Build the file in memory, it is only written if its content changed
+        with stage("emit"), io.StringIO() as f:
+            f.write("InstructionSet OpenASIP_{} extends RV32I {{\n".format(filename))
+            write_functions(f)
+            f.write("    instructions {\n")
+            for row, behavior_code, encoding, inputs, outputs in emitted:
+                write_instruction(f, filename, row, behavior_code, encoding, inputs, outputs)
+            f.write("    }\n")
+            f.write("}\n")
+            content = f.getvalue()
+
+        with stage("write_output"):
+            changed = write_if_changed(output_filepath, content)
+    else:
+        with stage("emit"):
+            files = shard_files(filename, emitted, shard_by)
+        with stage("write_output"):
+            shard_directory = os.path.join(output_directory, f"{filename}_shards")
+            changed = write_shards(shard_directory, files)
+        output_filepath = os.path.join(shard_directory, f"{filename}_top.core_desc")
+        shards = {name: os.path.join(shard_directory, name) for name in files}
+
+    print(f"Reused {built['hits']} cached operations, regenerated {built['misses']}")
+    print("Remaining encoding space:")
+    print(encoding_space.report())
+
+    return {
+        "filename": filename,
+        "output_filepath": output_filepath,
+        "generated": generated_operations,
+        "skipped": skipped_operations,
+        "changed": changed,
+        "capacity": encoding_space.capacity(),
+        "shards": shards,
+    }
+
+
+def reserve_existing_encodings(encoding_space, output_directory, filenames):
+    """Reserve the encodings of the instruction sets already in output_directory.
+
+    The files of the opsets in filenames are left out, they are about to be
+    regenerated. Shards of an opset live in <filename>_shards.
+    """
+    if not os.path.isdir(output_directory):
+        return
+    for entry in sorted(os.listdir(output_directory)):
+        path = os.path.join(output_directory, entry)
+        if entry.endswith("_shards") and os.path.isdir(path):
+            if entry[: -len("_shards")] in filenames:
+                continue
+            for shard in sorted(os.listdir(path)):
+                if shard.endswith(".core_desc"):
+                    encoding_space.reserve_file(os.path.join(path, shard))
+        elif entry.endswith(".core_desc") and entry[: -len(".core_desc")] not in filenames:
+            encoding_space.reserve_file(path)
 
-    print(f"Generated instruction set saved to {output_filepath}")
 
+@profiled("generate_instruction_set")
+def generate_instruction_set(
+    input_filepath,
+    output_directory,
+    generate_single_exec_operations=False,
+    remove_RFS=False,
+    context=None,
+    incremental=True,
+    encoding_space=None,
+    selected_operations=None,
+    shard_by=None,
+    optimize=True,
+    post_increment=False,
+):
+    built = build_instructions(
+        input_filepath,
+        output_directory,
+        generate_single_exec_operations,
+        remove_RFS,
+        context=context,
+        incremental=incremental,
+        selected_operations=selected_operations,
+        optimize=optimize,
+        post_increment=post_increment,
+    )
+    if encoding_space is None:
+        # Opsets generated earlier keep their encodings, see reserve_file
+        encoding_space = EncodingSpace()
+        reserve_existing_encodings(encoding_space, output_directory, {built["filename"]})
+    return emit_instruction_set(built, output_directory, encoding_space, shard_by)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
-        description="Generate instruction set from Excel file"
+        description="Generate instruction set from an operation table"
     )
     parser.add_argument(
         "--filename",
@@ -490,11 +594,26 @@ if __name__ == "__main__":
         action="store_true",
         help="Remove % RFS from the behavior code",
     )
+    parser.add_argument(
+        "--no-optimize",
+        action="store_true",
+        help="Emit the translated behavior code without folding constants and temporaries",
+    )
+    parser.add_argument(
+        "--post-increment",
+        action="store_true",
+        help="Also emit a <name>_PI variant of every load/store that increments its address register",
+    )
     args = parser.parse_args()
     filename = args.filename
-    input_filepath = f"Operations/{filename}.xlsx"
-    output_directory = "src/cdslL"
+    input_filepath = find_operation_table("Operations", filename)
+    output_directory = "src/cdsl"
 
     generate_instruction_set(
-        input_filepath, output_directory, args.single_exec_operations, args.remove_RFS
+        input_filepath,
+        output_directory,
+        args.single_exec_operations,
+        args.remove_RFS,
+        optimize=not args.no_optimize,
+        post_increment=args.post_increment,
     )
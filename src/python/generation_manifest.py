@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import re
+import pandas as pd
+
+# Bump when the generated CoreDSL changes for unchanged inputs. The sources of
+# the translation modules are hashed as well, so a forgotten bump after
+# editing them cannot serve stale behavior blocks.
+GENERATOR_VERSION = "1"
+GENERATOR_MODULES = (
+    "gen_op_coredsl.py",
+    "osal_rewrite.py",
+    "op_composer.py",
+    "op_graph.py",
+    "packed_simd.py",
+    "memory_ops.py",
+    "cdsl_ir.py",
+    "cdsl_parser.py",
+    "cdsl_eval.py",
+)
+
+MANIFEST_VERSION = 1
+
+_generator_fingerprint = None
+
+
+def generator_fingerprint():
+    global _generator_fingerprint
+    if _generator_fingerprint is None:
+        digest = hashlib.sha256(GENERATOR_VERSION.encode())
+        module_directory = os.path.dirname(os.path.abspath(__file__))
+        for module in GENERATOR_MODULES:
+            with open(os.path.join(module_directory, module), "rb") as file:
+                digest.update(file.read())
+        _generator_fingerprint = digest.hexdigest()
+    return _generator_fingerprint
+
+
+def _row_fields(row):
+    # Stable text form of the .opp node as parsed into the operation table
+    fields = {}
+    for column, value in row.items():
+        if isinstance(value, str) or not pd.isna(value):
+            fields[column] = str(value)
+    return fields
+
+
+def operation_hash(row, trigger_index, flags, rows=None):
+    """Content hash of everything the behavior block of one operation uses.
+
+    With the operation table in rows, the operations a composite calls are
+    followed transitively, so editing a callee of a nested composite
+    invalidates it as well.
+    """
+    digest = hashlib.sha256()
+    digest.update(generator_fingerprint().encode())
+    digest.update(json.dumps(flags, sort_keys=True).encode())
+    digest.update(json.dumps(_row_fields(row), sort_keys=True).encode())
+
+    operations = [row["name"]]
+    seen = set()
+    while operations:
+        operation = operations.pop(0)
+        if operation in seen:
+            continue
+        seen.add(operation)
+        digest.update(operation.encode())
+        digest.update(trigger_index.get(operation, "").encode())
+        if operation == row["name"]:
+            semantics = row.get("trigger_semantics")
+        elif rows is not None and operation in rows:
+            semantics = rows[operation].get("trigger_semantics")
+            digest.update(json.dumps(_row_fields(rows[operation]), sort_keys=True).encode())
+        else:
+            continue
+        if isinstance(semantics, str):
+            operations += [
+                name.upper()
+                for name in re.findall(r"EXEC_OPERATION\(\s*(\w+)", semantics)
+            ]
+
+    return digest.hexdigest()
+
+
+class GenerationManifest:
+    """Per-operation content hashes and behavior blocks of one .core_desc."""
+
+    def __init__(self, filepath, operations=None):
+        self.filepath = filepath
+        self.operations = operations or {}  # name -> {"hash", "behavior"}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_output(cls, output_filepath):
+        filepath = f"{output_filepath}.manifest.json"
+        if os.path.exists(filepath):
+            try:
+                with open(filepath, "r") as file:
+                    data = json.load(file)
+                if data.get("version") == MANIFEST_VERSION:
+                    return cls(filepath, data["operations"])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring broken manifest {filepath}: {e}")
+        return cls(filepath)
+
+    def lookup(self, operation_name, key):
+        # Returns (found, behavior); behavior None marks a cached skip
+        entry = self.operations.get(operation_name)
+        if entry is not None and entry["hash"] == key:
+            self.hits += 1
+            return True, entry["behavior"]
+        self.misses += 1
+        return False, None
+
+    def store(self, operation_name, key, behavior):
+        self.operations[operation_name] = {"hash": key, "behavior": behavior}
+
+    def prune(self, operation_names):
+        for name in list(self.operations):
+            if name not in operation_names:
+                del self.operations[name]
+
+    def save(self):
+        data = {"version": MANIFEST_VERSION, "operations": self.operations}
+        content = json.dumps(data, indent=1, sort_keys=True)
+        if os.path.exists(self.filepath):
+            with open(self.filepath, "r") as file:
+                if file.read() == content:
+                    return
+        with open(self.filepath, "w") as file:
+            file.write(content)
@@ -1,12 +1,149 @@
 import os
+import io
 import argparse
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
 from oppToTable import OperationParser
-from gen_op_coredsl import generate_instruction_set
+from gen_op_coredsl import (
+    SHARD_MODES,
+    GenerationContext,
+    build_instructions,
+    emit_instruction_set,
+    generate_instruction_set,
+    reserve_existing_encodings,
+)
+from encoding_allocator import EncodingSpace
+from op_selection import profile_guided_selection
+from pipeline_profile import profiler, stage
+from operation_store import (
+    DEFAULT_FORMAT,
+    STORE_FORMATS,
+    operation_table_path,
+    save_operation_table,
+)
+
+
+def generate_opset(task):
+    # Runs in a worker process, the log is returned so that the parent can
+    # print it in a deterministic order. Encodings are allocated by the
+    # parent, all opsets share one encoding space
+    (
+        input_filepath,
+        trigger_filepath,
+        output_directory,
+        single_exec_operations,
+        remove_RFS,
+        incremental,
+        selected_operations,
+        profile,
+        optimize,
+        post_increment,
+    ) = task
+    # A worker process runs several tasks, each reports only its own stages
+    profiler.reset()
+    if profile:
+        profiler.enable(memory=profile == "memory")
+    log = io.StringIO()
+    with redirect_stdout(log):
+        try:
+            context = GenerationContext.from_file(
+                input_filepath,
+                trigger_filepath=trigger_filepath,
+                generate_single_exec_operations=single_exec_operations,
+                remove_RFS=remove_RFS,
+            )
+            built = build_instructions(
+                input_filepath,
+                output_directory,
+                single_exec_operations,
+                remove_RFS,
+                context=context,
+                incremental=incremental,
+                selected_operations=selected_operations,
+                optimize=optimize,
+                post_increment=post_increment,
+            )
+            built["error"] = None
+        except Exception as e:
+            filename = os.path.splitext(os.path.basename(input_filepath))[0]
+            print(f"Error generating {filename}: {e}")
+            built = {"filename": filename, "error": str(e)}
+    built["log"] = log.getvalue()
+    built["profile"] = profiler.stages
+    return built
+
+
+def select_operations(df, filename, args):
+    # None keeps every operation of the opset
+    if args.select_from_results is None:
+        return None
+    return profile_guided_selection(
+        df,
+        filename,
+        args.select_from_results,
+        encoding_budget=args.encoding_budget,
+        output_directory=args.output_directory,
+    )
+
+
+def generate_all_opsets(filtered_operations, args, output_directory):
+    tasks = [
+        (
+            operation_table_path(args.output_directory, filename, args.store_format),
+            os.path.join(args.directory, f"{filename}.cc"),
+            output_directory,
+            args.single_exec_operations,
+            args.remove_RFS,
+            not args.force_regenerate,
+            select_operations(filtered_operations[filename], filename, args),
+            "memory" if args.profile_memory else args.profile,
+            not args.no_optimize,
+            args.post_increment,
+        )
+        for filename in sorted(filtered_operations)
+    ]
+    max_workers = args.jobs or os.cpu_count() or 1
+
+    # map() keeps the task order, so logs and summary do not depend on scheduling
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        built_opsets = list(executor.map(generate_opset, tasks))
+
+    # Encodings are allocated one opset after the other in one space, so the
+    # instruction sets can be loaded together without collisions
+    encoding_space = EncodingSpace()
+    reserve_existing_encodings(encoding_space, output_directory, set(filtered_operations))
+    summaries = []
+    for built in built_opsets:
+        print(built["log"], end="")
+        profiler.merge(built["profile"])
+        if built["error"]:
+            summaries.append(
+                {"filename": built["filename"], "generated": [], "skipped": [], "error": built["error"]}
+            )
+            continue
+        summary = emit_instruction_set(built, output_directory, encoding_space, args.shard_by)
+        summary["error"] = None
+        summaries.append(summary)
+
+    print("\nSummary:")
+    print(f"{'opset':<24}{'generated':>10}{'skipped':>10}")
+    total_generated = 0
+    total_skipped = 0
+    for summary in summaries:
+        generated = len(summary["generated"])
+        skipped = len(summary["skipped"])
+        total_generated += generated
+        total_skipped += skipped
+        status = f"  error: {summary['error']}" if summary["error"] else ""
+        print(f"{summary['filename']:<24}{generated:>10}{skipped:>10}{status}")
+    print(f"{'total':<24}{total_generated:>10}{total_skipped:>10}")
+
+    return summaries
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Parse and filter XML operation files. And Generate instruction set from Excel file"
+        description="Parse and filter XML operation files. And Generate instruction set from the operation table"
     )
     parser.add_argument(
         "--directory",
@@ -79,6 +216,11 @@ def main():
         action="store_true",
         help="Exclude operations with type RawData",
     )
+    parser.add_argument(
+        "--present-operands-only",
+        action="store_true",
+        help="Check element widths only for operands an operation has, keeps one-input operations such as loads",
+    )
     parser.add_argument(
         "--skip-filters",
         action="store_true",
@@ -90,6 +232,17 @@ def main():
         default="./Operations",
         help="Directory to save filtered results",
     )
+    parser.add_argument(
+        "--store-format",
+        choices=list(STORE_FORMATS),
+        default=DEFAULT_FORMAT,
+        help="Format of the saved operation tables",
+    )
+    parser.add_argument(
+        "--export-excel",
+        action="store_true",
+        help="Additionally export the operation tables as .xlsx",
+    )
     parser.add_argument(
         "--filename",
         type=str,
@@ -106,9 +259,74 @@ def main():
         action="store_true",
         help="Remove % RFS from the behavior code",
     )
+    parser.add_argument(
+        "--force-regenerate",
+        action="store_true",
+        help="Regenerate every operation instead of reusing unchanged ones",
+    )
+    parser.add_argument(
+        "--all-opsets",
+        action="store_true",
+        help="Generate an instruction set for every filtered opset in parallel",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes for --all-opsets (default: all cores)",
+    )
+    parser.add_argument(
+        "--select-from-results",
+        type=str,
+        default=None,
+        help="Results directory with analyse_instructions profiles; only generate the operations that pay off",
+    )
+    parser.add_argument(
+        "--encoding-budget",
+        type=int,
+        default=None,
+        help="Maximum number of operations kept by --select-from-results",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print wall time and call counts of every pipeline stage",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Like --profile, also tracing peak memory; slows the stages down, so time them without it",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=SHARD_MODES,
+        default=None,
+        help="Write one instruction set per operation group plus a <filename>_top.core_desc instead of one file",
+    )
+    parser.add_argument(
+        "--no-optimize",
+        action="store_true",
+        help="Emit the translated behavior code without folding constants and temporaries",
+    )
+    parser.add_argument(
+        "--post-increment",
+        action="store_true",
+        help="Also emit a <name>_PI variant of every load/store that increments its address register",
+    )
 
     args = parser.parse_args()
 
+    if args.profile or args.profile_memory:
+        profiler.enable(memory=args.profile_memory)
+    try:
+        run(args)
+    finally:
+        if profiler.enabled:
+            print("\nProfile:")
+            print(profiler.report())
+
+
+def run(args):
     operation_parser = OperationParser(directory=args.directory)
     operation_parser.load_operations()
 
@@ -131,23 +349,63 @@ def main():
             no_HalfFloatWord=args.no_HalfFloatWord,
             no_FloatWord=args.no_FloatWord,
             no_RawData=args.no_RawData,
+            present_operands_only=args.present_operands_only,
         )
 
-    for filename, df_operations in filtered_operations.items():
-        output_directory = args.output_directory
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
+    with stage("save_operation_tables"):
+        for filename, df_operations in filtered_operations.items():
+            output_directory = args.output_directory
+            output_filepath = save_operation_table(
+                df_operations, output_directory, filename, args.store_format
+            )
+            print(f"Saved {filename} to {output_filepath}")
+            if args.export_excel and args.store_format != "xlsx":
+                output_filepath = save_operation_table(
+                    df_operations, output_directory, filename, "xlsx"
+                )
+                print(f"Exported {filename}.xlsx to {output_filepath}")
+
+    output_directory = "src/cdsl"
 
-        output_filepath = os.path.join(output_directory, f"{filename}.xlsx")
-        df_operations.to_excel(output_filepath, index=False)
-        print(f"Saved {filename}.xlsx to {output_filepath}")
+    if args.all_opsets:
+        generate_all_opsets(filtered_operations, args, output_directory)
+        return
 
     filename = args.filename
-    input_filepath = f"Operations/{filename}.xlsx"
-    output_directory = "src/cdsl"
+    input_filepath = operation_table_path(
+        args.output_directory, filename, args.store_format
+    )
+
+    # The filtered table is already in memory, only fall back to the store
+    # for opsets that were not loaded in this run
+    context = None
+    if filename in filtered_operations:
+        context = GenerationContext(
+            filtered_operations[filename],
+            filename,
+            trigger_filepath=os.path.join(args.directory, f"{filename}.cc"),
+            generate_single_exec_operations=args.single_exec_operations,
+            remove_RFS=args.remove_RFS,
+        )
+    else:
+        context = GenerationContext.from_file(
+            input_filepath,
+            trigger_filepath=os.path.join(args.directory, f"{filename}.cc"),
+            generate_single_exec_operations=args.single_exec_operations,
+            remove_RFS=args.remove_RFS,
+        )
 
     generate_instruction_set(
-        input_filepath, output_directory, args.single_exec_operations, args.remove_RFS
+        input_filepath,
+        output_directory,
+        args.single_exec_operations,
+        args.remove_RFS,
+        context=context,
+        incremental=not args.force_regenerate,
+        selected_operations=select_operations(context.df, filename, args),
+        shard_by=args.shard_by,
+        optimize=not args.no_optimize,
+        post_increment=args.post_increment,
     )
 
 
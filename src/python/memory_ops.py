@@ -0,0 +1,86 @@
+import pandas as pd
+from cdsl_parser import Assign, Binary, Block, Declare, Index, INT, Name, Number, parse_behavior
+from cdsl_eval import REGISTER, is_memory, memory_width
+from cdsl_ir import emit_behavior, walk
+
+POST_INCREMENT_SUFFIX = "_PI"
+
+
+class PostIncrementError(Exception):
+    pass
+
+
+def address_operand(row):
+    """Number of the input operand holding a memory address, or None."""
+    flags = [row.get("reads_memory"), row.get("writes_memory")]
+    if not any(pd.notna(flag) and bool(flag) for flag in flags):
+        return None
+    inputs = int(row["inputs"]) if pd.notna(row["inputs"]) else 0
+    for i in range(1, inputs + 1):
+        if row.get(f"io_{i}_mem_address") == "yes":
+            return i
+    return None
+
+
+def memory_address(access):
+    # MEM[a] and MEM[a + n:a] both start at a
+    return access.index if isinstance(access, Index) else access.low
+
+
+def post_increment_behavior(behavior_code, address):
+    """Behavior that also advances the address register past the access.
+
+    address is the X expression of the address operand. Every MEM access has
+    to use it unchanged and all of them must have the same width, which is
+    what the register is incremented by. The address is saved first, so the
+    increment wins if the loaded register is the address register itself.
+    """
+    block = parse_behavior(behavior_code)
+    accesses = [node for node in walk(block) if is_memory(node)]
+    if not accesses:
+        raise PostIncrementError("no memory access")
+    if any(memory_address(access) != address for access in accesses):
+        raise PostIncrementError("memory accessed at an offset from the address operand")
+    widths = {memory_width(access) for access in accesses}
+    if len(widths) != 1 or None in widths:
+        raise PostIncrementError("memory accesses of different widths")
+    if any(isinstance(node, Assign) and node.target == address for node in walk(block)):
+        raise PostIncrementError("the address operand is written")
+
+    taken = {node.name for node in walk(block) if isinstance(node, (Name, Declare))}
+    saved = "address"
+    index = 1
+    while saved in taken:
+        saved = f"address_{index}"
+        index += 1
+    statements = (
+        [Declare(REGISTER, saved, address)]
+        + block.statements
+        + [Assign(address, "=", Binary("+", Name(saved), Number(widths.pop(), INT)))]
+    )
+    return emit_behavior(Block(statements))
+
+
+def post_increment_row(row):
+    variant = row.copy()
+    variant["name"] = f"{row['name']}{POST_INCREMENT_SUFFIX}"
+    description = row.get("description")
+    note = "The address register is incremented past the accessed data."
+    description = description.strip() if pd.notna(description) else ""
+    if description and description[-1] not in ".!?":
+        description += "."
+    # Written as one comment line each, see write_instruction
+    variant["description"] = f"{description}\n{note}" if description else note
+    return variant
+
+
+def post_increment_variant(row, behavior_code, register):
+    """(row, behavior code) of the post-increment form of a memory operation.
+
+    register maps an operand field (rs1, ...) to its X expression.
+    """
+    operand = address_operand(row)
+    if operand is None:
+        raise PostIncrementError("no memory address operand")
+    code = post_increment_behavior(behavior_code, register(f"rs{operand}"))
+    return post_increment_row(row), code
@@ -0,0 +1,339 @@
+import re
+import pandas as pd
+from cdsl_parser import (
+    Assign,
+    Binary,
+    Block,
+    Cast,
+    Declare,
+    If,
+    Index,
+    Name,
+    Number,
+    ParseError,
+    integer_literal,
+    parse_behavior,
+)
+from cdsl_eval import REGISTER, is_memory
+from cdsl_ir import emit_behavior, transform, walk
+from osal_rewrite import EXEC_PATTERN, RewriteError, split_arguments
+from pipeline_profile import profiled
+
+DECLARATION_PATTERN = re.compile(r"^SimValue\s+(\w+(?:\s*,\s*\w+)*)$")
+COPY_PATTERN = re.compile(r"^(IO\(\d+\)|\w+)\s*=\s*(.+)$")
+IO_PATTERN = re.compile(r"^IO\((\d+)\)$")
+LITERAL_PATTERN = re.compile(r"^(?:0[xX][0-9a-fA-F]+|\d+)[uUlL]*$")
+
+
+class ComposeError(Exception):
+    pass
+
+
+def parse_semantics(semantics):
+    """Steps of a trigger-semantics block.
+
+    ("declare", [names]) for SimValue intermediates, ("exec", operation,
+    [operands]) for EXEC_OPERATION calls and ("copy", target, source) for
+    plain assignments between operands.
+    """
+    steps = []
+    text = re.sub(r"//[^\n]*|/\*.*?\*/", "", semantics, flags=re.DOTALL)
+    position = 0
+    for match in EXEC_PATTERN.finditer(text):
+        steps += _plain_steps(text[position : match.start()])
+        steps.append(("exec", match.group(1).upper(), split_arguments(match.group(2))))
+        position = match.end()
+    steps += _plain_steps(text[position:])
+    return steps
+
+
+def _plain_steps(text):
+    steps = []
+    for statement in text.split(";"):
+        statement = " ".join(statement.split())
+        if not statement:
+            continue
+        match = DECLARATION_PATTERN.match(statement)
+        if match:
+            steps.append(("declare", [name.strip() for name in match.group(1).split(",")]))
+            continue
+        match = COPY_PATTERN.match(statement)
+        if match:
+            steps.append(("copy", match.group(1), match.group(2).strip()))
+            continue
+        raise ComposeError(f"Unsupported statement in trigger-semantics: {statement}")
+    return steps
+
+
+def exec_operations(semantics):
+    # Names of the operations a trigger-semantics block calls, in order
+    if not isinstance(semantics, str):
+        return []
+    return [step[1] for step in parse_semantics(semantics) if step[0] == "exec"]
+
+
+def composite(row):
+    semantics = row["trigger_semantics"]
+    return isinstance(semantics, str) and bool(semantics.strip())
+
+
+def operand_counts(row):
+    inputs = int(row["inputs"]) if pd.notna(row["inputs"]) else 0
+    outputs = int(row["outputs"]) if pd.notna(row["outputs"]) else 0
+    return inputs, outputs
+
+
+def register_field(index):
+    # rs1 for both X[rs1 % RFS] and X[rs1]
+    if isinstance(index, Binary) and index.op == "%" and index.right == Name("RFS"):
+        index = index.left
+    if isinstance(index, Name):
+        return index.name
+    return None
+
+
+class Composer:
+    """Inlines the operations a composite calls into one behavior block.
+
+    The behavior of every operation is a block over its own registers rs1,
+    rs2, rs3 (sources) and rd (result). A composite calls them through
+    EXEC_OPERATION: each callee's sources are replaced by the argument
+    expressions and its result is written to the destination SimValue, so
+    the composite's own registers are written only at the very end, like
+    the operand slots of OSAL. SimValues are declared at their first write,
+    and a callee result written by one final assignment is used directly,
+    without a local of its own. Callees may be composites themselves.
+    Translations and blocks are memoized per operation, so every operation
+    is translated once however many composites execute it.
+    """
+
+    def __init__(self, rows, trigger_index, translate, remove_RFS=False):
+        self.rows = rows
+        self.trigger_index = trigger_index
+        self.translate = translate
+        self.remove_RFS = remove_RFS
+        self.translations = {}  # name -> translated trigger body
+        self.blocks = {}
+
+    def register(self, field):
+        if self.remove_RFS:
+            return Index(Name("X"), Name(field))
+        return Index(Name("X"), Binary("%", Name(field), Name("RFS")))
+
+    def translation(self, name):
+        """Translated trigger body of an operation, translated only once."""
+        if name not in self.translations:
+            inputs, _ = operand_counts(self.rows[name])
+            self.translations[name] = self.translate(self.trigger_index.get(name, ""), inputs)
+        return self.translations[name]
+
+    @profiled("compose_behavior")
+    def behavior_code(self, name):
+        """CoreDSL text of the behavior of a composite operation."""
+        return emit_behavior(self.behavior(name))
+
+    def behavior(self, name, stack=()):
+        if name in stack:
+            raise ComposeError(f"Cyclic composition {' -> '.join(stack + (name,))}")
+        if name not in self.blocks:
+            if name not in self.rows:
+                raise ComposeError(f"Based operation {name} not found")
+            trigger_code = self.trigger_index.get(name, "")
+            if trigger_code:
+                try:
+                    self.blocks[name] = parse_behavior(self.translation(name))
+                except (RewriteError, ParseError) as e:
+                    # Returns from loops and other control flow end up here
+                    raise ComposeError(f"Cannot inline {name}: {e}")
+            elif composite(self.rows[name]):
+                self.blocks[name] = self.compose(name, stack + (name,))
+            else:
+                raise ComposeError(f"Trigger code not found for operation {name}")
+        return self.blocks[name]
+
+    def compose(self, name, stack):
+        row = self.rows[name]
+        inputs, outputs = operand_counts(row)
+        if outputs > 1:
+            raise ComposeError(f"{name} has {outputs} outputs, at most one is supported")
+
+        taken = set()
+        statements = []
+        intermediates = {}  # SimValue and output operand -> local name
+        pending = set()  # locals declared by the first write, see write
+
+        def local(base):
+            candidate = base
+            index = 1
+            while candidate in taken:
+                candidate = f"{base}_{index}"
+                index += 1
+            taken.add(candidate)
+            return candidate
+
+        def declare(base):
+            variable = local(base)
+            pending.add(variable)
+            return variable
+
+        def read(variable):
+            if variable in pending:
+                # Read before it is written, SimValues start out as zero
+                pending.discard(variable)
+                statements.append(Declare(REGISTER, variable, Number(0, REGISTER)))
+            return Name(variable)
+
+        def write(variable, value):
+            if variable in pending:
+                pending.discard(variable)
+                statements.append(Declare(REGISTER, variable, value))
+            else:
+                statements.append(Assign(Name(variable), "=", value))
+
+        def slot(text):
+            # Local behind a SimValue or the output operand, None otherwise
+            match = IO_PATTERN.match(text)
+            if match:
+                number = int(match.group(1))
+                if 1 <= number <= inputs:
+                    return None
+                if number == inputs + 1 and outputs:
+                    if text not in intermediates:
+                        intermediates[text] = declare(f"io{number}")
+                    return intermediates[text]
+                raise ComposeError(f"{name} has no operand IO({number})")
+            return intermediates.get(text)
+
+        def operand(text):
+            match = IO_PATTERN.match(text)
+            if match and 1 <= int(match.group(1)) <= inputs:
+                return self.register(f"rs{match.group(1)}")
+            variable = slot(text)
+            if variable is not None:
+                return read(variable)
+            if LITERAL_PATTERN.match(text):
+                # Passed as a SimValue, i.e. a register-sized word
+                return Cast(REGISTER, integer_literal(re.sub(r"[uUlL]+$", "", text)))
+            raise ComposeError(f"Unsupported operand {text} in {name}")
+
+        def target(text):
+            variable = slot(text)
+            if variable is None:
+                if IO_PATTERN.match(text):
+                    raise ComposeError(f"{name} writes its source operand {text}")
+                raise ComposeError(f"Unsupported operand {text} in {name}")
+            return variable
+
+        for step in parse_semantics(row["trigger_semantics"]):
+            if step[0] == "declare":
+                for variable in step[1]:
+                    intermediates[variable] = declare(variable)
+            elif step[0] == "copy":
+                write(target(step[1]), operand(step[2]))
+            else:
+                body, destination, value = self.inline(
+                    step[1], step[2], operand, target, read, local, stack
+                )
+                statements += body
+                if destination is not None:
+                    write(destination, value)
+
+        if outputs:
+            result = intermediates.get(f"IO({inputs + 1})")
+            if result is None:
+                raise ComposeError(f"{name} never writes its result IO({inputs + 1})")
+            last = statements[-1] if statements else None
+            if isinstance(last, Declare) and last.name == result:
+                # Written once, at the very end: straight into the register
+                statements[-1] = Assign(self.register("rd"), "=", last.init)
+            else:
+                statements.append(Assign(self.register("rd"), "=", read(result)))
+        return Block(statements)
+
+    def inline(self, callee, arguments, operand, target, read, local, stack):
+        """Statements of one EXEC_OPERATION call.
+
+        Returns (statements, local, value): the callee's result, if any, is
+        value, which the caller writes to local after the statements.
+        """
+        if callee not in self.rows:
+            raise ComposeError(f"Based operation {callee} not found")
+        inputs, outputs = operand_counts(self.rows[callee])
+        if len(arguments) != inputs + outputs:
+            raise ComposeError(
+                f"EXEC_OPERATION({callee.lower()}) with {len(arguments)} operands, expected {inputs + outputs}"
+            )
+        if outputs > 1:
+            raise ComposeError(f"{callee} has {outputs} outputs, at most one is supported")
+        block = self.behavior(callee, stack)
+
+        # The callee's locals get names of their own in the composite
+        renamed = {
+            node.name: local(f"{callee.lower()}_{node.name}")
+            for node in walk(block)
+            if isinstance(node, Declare)
+        }
+        registers = {f"rs{i + 1}": operand(argument) for i, argument in enumerate(arguments[:inputs])}
+        statements = block.statements
+        value = None
+        if outputs:
+            destination = target(arguments[inputs])
+            last = statements[-1] if statements else None
+            result_writes = [
+                node
+                for node in walk(block)
+                if isinstance(node, Index) and node.base == Name("X") and register_field(node.index) == "rd"
+            ]
+            if (
+                isinstance(last, Assign)
+                and last.op == "="
+                and len(result_writes) == 1
+                and result_writes[0] is last.target
+            ):
+                # The result is written once, as the last statement, and
+                # never read: it is handed back as an expression
+                statements = statements[:-1]
+                value = last.value
+            else:
+                # The result slot starts with the destination's value, like
+                # the output SimValue passed to EXEC_OPERATION
+                result = local(f"{callee.lower()}_result")
+                registers["rd"] = Name(result)
+                initial = read(destination)
+
+        def substitute(node):
+            if isinstance(node, Name) and node.name in renamed:
+                return Name(renamed[node.name])
+            if isinstance(node, Index) and node.base == Name("X"):
+                field = register_field(node.index)
+                if field not in registers:
+                    raise ComposeError(f"{callee} uses register {field} it has no operand for")
+                return registers[field]
+            return node
+
+        def rename_declarations(statements):
+            renamed_statements = []
+            for statement in statements:
+                if isinstance(statement, Declare):
+                    statement = Declare(statement.ctype, renamed[statement.name], statement.init)
+                elif isinstance(statement, Block):
+                    statement = Block(rename_declarations(statement.statements))
+                elif isinstance(statement, If):
+                    otherwise = statement.otherwise
+                    if otherwise is not None:
+                        otherwise = Block(rename_declarations(otherwise.statements))
+                    then = Block(rename_declarations(statement.then.statements))
+                    statement = If(statement.condition, then, otherwise)
+                renamed_statements.append(statement)
+            return renamed_statements
+
+        body = transform(rename_declarations(statements), substitute)
+        for node in walk(body):
+            if isinstance(node, Assign) and not isinstance(node.target, Name) and not is_memory(node.target):
+                raise ComposeError(f"{callee} writes a source operand")
+        if not outputs:
+            # A store, nothing to hand back
+            return body, None, None
+        if value is not None:
+            return body, destination, transform(value, substitute)
+        return [Declare(REGISTER, result, initial)] + body, destination, Name(result)
@@ -0,0 +1,133 @@
+import argparse
+from op_composer import ComposeError, composite, exec_operations
+from operation_store import find_operation_table, load_operation_table
+from trigger_index import load_trigger_index
+
+
+class OperationGraph:
+    """Operation -> operations it executes, built from all trigger-semantics.
+
+    Operations with a trigger body are leaves, composites depend on the
+    operations their EXEC_OPERATION calls name. Missing operations and
+    cycles are found when the graph is built, and an operation depending on
+    an operation that cannot be built is marked as well, so generation can
+    skip them before translating anything.
+    """
+
+    def __init__(self, rows, trigger_index):
+        self.rows = rows
+        self.trigger_index = trigger_index
+        self.dependencies = {}  # name -> executed operations, without repeats
+        self.problems = {}  # name -> reason it cannot be built
+
+        for name, row in rows.items():
+            self.dependencies[name] = []
+            if trigger_index.get(name, "") or not composite(row):
+                continue
+            try:
+                operations = exec_operations(row["trigger_semantics"])
+            except ComposeError as e:
+                self.problems[name] = str(e)
+                continue
+            self.dependencies[name] = list(dict.fromkeys(operations))
+
+        self.order = self._topological_order()
+        for name in self.order:
+            if name not in self.problems:
+                problem = self._dependency_problem(name)
+                if problem:
+                    self.problems[name] = problem
+
+    def _topological_order(self):
+        # Dependencies come first, members of a cycle are marked on the way
+        order = []
+        state = {}
+        for name in self.rows:
+            if name not in state:
+                self._visit(name, [name], state, order)
+        return order
+
+    def _visit(self, name, stack, state, order):
+        state[name] = "visiting"
+        for dependency in self.dependencies[name]:
+            if dependency not in self.rows:
+                continue
+            if state.get(dependency) == "visiting":
+                cycle = stack[stack.index(dependency) :] + [dependency]
+                for member in cycle[:-1]:
+                    self.problems.setdefault(
+                        member, f"Cyclic composition {' -> '.join(cycle)}"
+                    )
+            elif dependency not in state:
+                self._visit(dependency, stack + [dependency], state, order)
+        state[name] = "done"
+        order.append(name)
+
+    def _dependency_problem(self, name):
+        for dependency in self.dependencies[name]:
+            if dependency not in self.rows:
+                return f"Based operation {dependency} not found"
+            if dependency in self.problems:
+                return f"Based operation {dependency} cannot be built: {self.problems[dependency]}"
+            if not self.has_trigger(dependency) and not composite(self.rows[dependency]):
+                return f"Trigger code not found for operation {dependency}"
+        return None
+
+    def has_trigger(self, name):
+        return bool(self.trigger_index.get(name, ""))
+
+    def closure(self, operations):
+        """The operations and everything they execute, transitively."""
+        needed = set()
+        pending = list(operations)
+        while pending:
+            name = pending.pop()
+            if name in needed or name not in self.rows:
+                continue
+            needed.add(name)
+            pending += self.dependencies[name]
+        return needed
+
+    def required_bases(self, operations):
+        """Operations with a trigger body that building operations translates."""
+        return {name for name in self.closure(operations) if self.has_trigger(name)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Show the EXEC_OPERATION dependencies of an operation table"
+    )
+    parser.add_argument("--filename", type=str, default="base", help="Opset name")
+    parser.add_argument(
+        "--trigger-file",
+        type=str,
+        default=None,
+        help="OSAL .cc file, defaults to openasip/openasip/opset/base/<filename>.cc",
+    )
+    parser.add_argument(
+        "--operations",
+        nargs="+",
+        default=None,
+        help="Only show the base operations these operations need",
+    )
+    args = parser.parse_args()
+
+    df = load_operation_table(find_operation_table("Operations", args.filename))
+    rows = {row["name"]: row for _, row in df.iterrows()}
+    trigger_filepath = args.trigger_file or f"openasip/openasip/opset/base/{args.filename}.cc"
+    graph = OperationGraph(rows, load_trigger_index(trigger_filepath))
+
+    if args.operations:
+        operations = [name.upper() for name in args.operations]
+        print(" ".join(sorted(graph.required_bases(operations))))
+        return
+
+    for name in graph.order:
+        if graph.dependencies[name]:
+            print(f"{name}: {' '.join(graph.dependencies[name])}")
+    for name, problem in graph.problems.items():
+        print(f"Error: {name}: {problem}")
+
+
+if __name__ == "__main__":
+    main()
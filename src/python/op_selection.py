@@ -0,0 +1,189 @@
+import glob
+import os
+import re
+import pandas as pd
+
+PROFILE_FILENAME = "analyse_instructions_seq1.csv"
+FILTERED_PROFILE_FILENAME = "filtered_data.csv"
+
+# OSAL operations the RV32IM target already executes as one instruction, a
+# custom instruction for them saves nothing
+NATIVE_OPERATIONS = {
+    "ADD",
+    "SUB",
+    "AND",
+    "IOR",
+    "XOR",
+    "SHL",
+    "SHR",
+    "SHRU",
+    "MUL",
+    "MULHI",
+    "MULHIU",
+    "DIV",
+    "DIVU",
+    "MOD",
+    "MODU",
+    "GT",
+    "GTU",
+    "LT",
+    "LTU",
+}
+
+
+def load_profiles(results_directory):
+    """Dynamic instruction histograms of all benchmark models.
+
+    Reads <model>/analyse_instructions_seq1.csv of every model folder and
+    falls back to the merged filtered_data.csv. Returns a frame with the
+    columns Model, Sequence, Count and Probability.
+    """
+    frames = []
+    pattern = os.path.join(results_directory, "*", PROFILE_FILENAME)
+    for filepath in sorted(glob.glob(pattern)):
+        df = pd.read_csv(filepath)
+        df.insert(0, "Model", os.path.basename(os.path.dirname(filepath)))
+        frames.append(df)
+
+    if frames:
+        return pd.concat(frames, ignore_index=True)
+
+    filepath = os.path.join(results_directory, FILTERED_PROFILE_FILENAME)
+    if os.path.exists(filepath):
+        return pd.read_csv(filepath)
+
+    print(f"No instruction profiles found in {results_directory}")
+    return pd.DataFrame(columns=["Model", "Sequence", "Count", "Probability"])
+
+
+def operation_profiles(profiles, filename):
+    # Keep the custom instructions of one opset, named openasip_<opset>_<op>
+    prefix = f"openasip_{filename}_"
+    df = profiles[profiles["Sequence"].str.startswith(prefix)].copy()
+    df["operation"] = df["Sequence"].str[len(prefix) :].str.upper()
+    return df
+
+
+def estimated_savings(row):
+    """Base instructions saved per execution of one custom instruction."""
+    if row["name"] in NATIVE_OPERATIONS:
+        return 0
+    semantics = row.get("trigger_semantics")
+    if isinstance(semantics, str):
+        # A composite replaces the sequence of its EXEC_OPERATIONs
+        executed = len(re.findall(r"EXEC_OPERATION\(", semantics))
+        if executed > 1:
+            return executed - 1
+    return 1
+
+
+def rank_operations(df, profiles, filename):
+    """Rank the operations of an opset by frequency weighted savings.
+
+    The score sums, over all models, the dynamic probability of the
+    instruction times its estimated savings, so every model weighs the same
+    regardless of its run length. Operations without a profile were not
+    part of the measured build, profiled is False for them.
+    """
+    used = operation_profiles(profiles, filename)
+    per_operation = used.groupby("operation").agg(
+        count=("Count", "sum"),
+        probability=("Probability", "sum"),
+        models=("Model", "nunique"),
+    )
+
+    records = []
+    for _, row in df.iterrows():
+        name = row["name"]
+        savings = estimated_savings(row)
+        profiled = name in per_operation.index
+        if profiled:
+            profile = per_operation.loc[name]
+            count = int(profile["count"])
+            probability = float(profile["probability"])
+            models = int(profile["models"])
+        else:
+            count, probability, models = 0, 0.0, 0
+        records.append(
+            {
+                "name": name,
+                "savings": savings,
+                "count": count,
+                "models": models,
+                "profiled": profiled,
+                "probability": probability,
+                "score": probability * savings,
+                "saved_instructions": count * savings,
+            }
+        )
+
+    ranking = pd.DataFrame(
+        records,
+        columns=[
+            "name",
+            "savings",
+            "count",
+            "models",
+            "profiled",
+            "probability",
+            "score",
+            "saved_instructions",
+        ],
+    )
+    ranking = ranking.sort_values(
+        ["score", "saved_instructions", "name"], ascending=[False, False, True]
+    )
+    return ranking.reset_index(drop=True)
+
+
+def select_operations(ranking, encoding_budget=None):
+    # Operations that ran and save nothing are not worth an encoding. The
+    # ones that were never built cannot have run, they are kept after the
+    # profiled ones unless they save nothing anyway
+    unprofiled = ~ranking["profiled"] & (ranking["savings"] > 0)
+    selected = pd.concat([ranking[ranking["score"] > 0], ranking[unprofiled]])
+    if encoding_budget is not None:
+        selected = selected.head(encoding_budget)
+    return selected["name"].tolist()
+
+
+def save_ranking(ranking, selected, output_directory, filename):
+    os.makedirs(output_directory, exist_ok=True)
+    ranking = ranking.copy()
+    ranking["selected"] = ranking["name"].isin(selected)
+    output_filepath = os.path.join(output_directory, f"{filename}_ranking.csv")
+    ranking.to_csv(output_filepath, index=False)
+    return output_filepath
+
+
+def profile_guided_selection(
+    df, filename, results_directory, encoding_budget=None, output_directory=None
+):
+    """Operations of an opset worth generating according to the profiles.
+
+    None, i.e. every operation, if the profiles have no data of the opset.
+    """
+    profiles = load_profiles(results_directory)
+    if operation_profiles(profiles, filename).empty:
+        # Nothing of this opset was measured, a selection would be empty
+        print(
+            f"Warning: No instruction profiles of {filename} in {results_directory}, "
+            f"keeping all {len(df)} operations"
+        )
+        return None
+    ranking = rank_operations(df, profiles, filename)
+    selected = select_operations(ranking, encoding_budget)
+
+    print(f"Selected {len(selected)} of {len(ranking)} operations of {filename}:")
+    for _, row in ranking[ranking["name"].isin(selected)].iterrows():
+        if not row["profiled"]:
+            print(f"  {row['name']:<16}not profiled")
+            continue
+        print(
+            f"  {row['name']:<16}score {row['score']:.3f}  "
+            f"saves {row['saved_instructions']} instructions"
+        )
+    if output_directory is not None:
+        output_filepath = save_ranking(ranking, selected, output_directory, filename)
+        print(f"Ranking saved to {output_filepath}")
+    return selected
@@ -0,0 +1,207 @@
+import numpy as np
+
+
+class Predicate:
+    """Composable row predicate over an operation table.
+
+    Predicates combine with &, | and ~ and compile either to one boolean
+    mask (mask) or to a pandas query expression (to_query). A column can be
+    absent from some opsets of a concatenated pool; absent_columns maps such
+    a column to the rows whose opset lacks it, and the leaf predicates treat
+    those rows as if the column did not exist, like a per-opset filter would.
+    """
+
+    def __init__(self, mask_function, expression):
+        self._mask_function = mask_function
+        self.expression = expression
+
+    def mask(self, df, absent_columns=None):
+        mask = self._mask_function(df, absent_columns or {})
+        if isinstance(mask, (bool, np.bool_)):
+            return np.full(len(df), bool(mask))
+        return np.asarray(mask, dtype=bool)
+
+    def apply(self, df, absent_columns=None):
+        return df[self.mask(df, absent_columns)]
+
+    def to_query(self):
+        return self.expression
+
+    def __and__(self, other):
+        return Predicate(
+            lambda df, absent: self.mask(df, absent) & other.mask(df, absent),
+            f"({self.expression}) and ({other.expression})",
+        )
+
+    def __or__(self, other):
+        return Predicate(
+            lambda df, absent: self.mask(df, absent) | other.mask(df, absent),
+            f"({self.expression}) or ({other.expression})",
+        )
+
+    def __invert__(self):
+        return Predicate(
+            lambda df, absent: ~self.mask(df, absent), f"not ({self.expression})"
+        )
+
+    def __repr__(self):
+        return f"Predicate({self.expression})"
+
+
+def _column_mask(df, absent_columns, column, check, missing):
+    # check maps the column values to a boolean array, rows without the
+    # column evaluate to missing
+    if column not in df.columns:
+        return missing
+    mask = check(df[column])
+    absent = absent_columns.get(column)
+    if absent is not None:
+        mask = np.where(absent, missing, mask)
+    return mask
+
+
+def always():
+    return Predicate(lambda df, absent: True, "True")
+
+
+def all_of(predicates):
+    predicates = list(predicates)
+    if not predicates:
+        return always()
+    result = predicates[0]
+    for predicate in predicates[1:]:
+        result = result & predicate
+    return result
+
+
+def flag(column):
+    # Boolean operation property such as control_flow or reads_memory
+    return Predicate(
+        lambda df, absent: _column_mask(
+            df,
+            absent,
+            column,
+            lambda values: values.fillna(False).to_numpy(dtype=bool),
+            False,
+        ),
+        f"`{column}`",
+    )
+
+
+def between(column, minimum, maximum, missing_value=0):
+    def check(values):
+        values = values.fillna(missing_value).to_numpy(dtype=np.int64)
+        return (values >= minimum) & (values <= maximum)
+
+    return Predicate(
+        lambda df, absent: _column_mask(
+            df, absent, column, check, minimum <= missing_value <= maximum
+        ),
+        f"{minimum} <= `{column}`.fillna({missing_value}) <= {maximum}",
+    )
+
+
+def is_in(column, values, missing=True):
+    # Missing values never match, like isin on NaN
+    allowed = list(values)
+    return Predicate(
+        lambda df, absent: _column_mask(
+            df,
+            absent,
+            column,
+            lambda values: values.isin(allowed).fillna(False).to_numpy(dtype=bool),
+            missing,
+        ),
+        f"`{column}`.isin({allowed})",
+    )
+
+
+def not_equal(column, value, missing=True):
+    return Predicate(
+        lambda df, absent: _column_mask(
+            df,
+            absent,
+            column,
+            lambda values: (values != value).fillna(True).to_numpy(dtype=bool),
+            missing,
+        ),
+        f"`{column}` != {value!r}",
+    )
+
+
+def equal(column, value, missing=False):
+    return Predicate(
+        lambda df, absent: _column_mask(
+            df,
+            absent,
+            column,
+            lambda values: (values == value).fillna(False).to_numpy(dtype=bool),
+            missing,
+        ),
+        f"`{column}` == {value!r}",
+    )
+
+
+def operand_filter(
+    min_inputs=0,
+    max_inputs=3,
+    min_outputs=0,
+    max_outputs=1,
+    element_widths=[1, 5, 8, 16, 32],
+    no_control_flow=False,
+    no_call=False,
+    no_branch=False,
+    is_element_count_1=False,
+    no_side_effects=False,
+    no_memory_reads=False,
+    no_memory_writes=False,
+    no_HalfFloatWord=False,
+    no_FloatWord=False,
+    no_RawData=False,
+    present_operands_only=False,
+):
+    """Predicate equivalent to the OperationParser.filter_operations flags."""
+    excluded_types = []
+    if no_HalfFloatWord:
+        excluded_types.append("HalfFloatWord")
+    if no_FloatWord:
+        excluded_types.append("FloatWord")
+    if no_RawData:
+        excluded_types.append("RawData")
+
+    predicates = []
+
+    # Operand checks cover operands 1 .. max_inputs - 1 (resp. max_outputs - 1).
+    # With present_operands_only the width check only applies to operands the
+    # operation has, so that one-input operations such as loads are kept
+    for prefix, count, count_column in (("io", max_inputs, "inputs"), ("oo", max_outputs, "outputs")):
+        for i in range(1, count):
+            for excluded_type in excluded_types:
+                predicates.append(not_equal(f"{prefix}_{i}_type", excluded_type))
+            width = is_in(f"{prefix}_{i}_element_width", element_widths)
+            if present_operands_only:
+                width = width | between(count_column, 0, i - 1)
+            predicates.append(width)
+
+    predicates.append(between("inputs", min_inputs, max_inputs))
+    predicates.append(between("outputs", min_outputs, max_outputs))
+
+    if no_control_flow:
+        predicates.append(~flag("control_flow"))
+    if no_call:
+        predicates.append(~flag("is_call"))
+    if no_branch:
+        predicates.append(~flag("is_branch"))
+
+    if is_element_count_1:
+        for i in range(1, max_inputs):
+            predicates.append(equal(f"io_{i}_element_count", 1, missing=True))
+
+    if no_side_effects:
+        predicates.append(~flag("has_side_effects"))
+    if no_memory_reads:
+        predicates.append(~flag("reads_memory"))
+    if no_memory_writes:
+        predicates.append(~flag("writes_memory"))
+
+    return all_of(predicates)
@@ -0,0 +1,116 @@
+import os
+import pandas as pd
+
+# Operation tables are exchanged between main.py and gen_op_coredsl through
+# this store. Parquet/Feather keep the column types and load without parsing;
+# xlsx is only meant as an export for humans.
+DEFAULT_FORMAT = "parquet"
+
+# Columns holding integers in the .opp attributes, everything else stays text
+INTEGER_COLUMNS = ("inputs", "outputs")
+INTEGER_OPERAND_FIELDS = ("element_count", "element_width")
+BOOLEAN_COLUMNS = (
+    "reads_memory",
+    "writes_memory",
+    "has_side_effects",
+    "is_branch",
+    "control_flow",
+    "is_call",
+)
+
+
+def is_integer_column(column):
+    if column in INTEGER_COLUMNS:
+        return True
+    if column.startswith(("io_", "oo_")):
+        return column.endswith(INTEGER_OPERAND_FIELDS)
+    return False
+
+
+def is_type_column(column):
+    return column.startswith(("io_", "oo_")) and column.endswith("_type")
+
+
+def normalize_operation_table(df):
+    # Integer operand fields become nullable Int64 so that missing operands
+    # stay distinguishable from 0, flags become plain booleans and operand
+    # types categoricals
+    for column in df.columns:
+        if is_integer_column(column):
+            if df[column].dtype != "Int64":
+                values = df[column]
+                if values.dtype == object or pd.api.types.is_string_dtype(values):
+                    values = values.replace("", None)
+                df[column] = pd.to_numeric(values, errors="coerce").astype("Int64")
+        elif column in BOOLEAN_COLUMNS and df[column].dtype != bool:
+            df[column] = df[column].fillna(False).astype(bool)
+        elif is_type_column(column) and df[column].dtype != "category":
+            df[column] = df[column].astype("category")
+    return df
+
+
+def _write_parquet(df, filepath):
+    df.to_parquet(filepath, index=False)
+
+
+def _read_parquet(filepath):
+    return pd.read_parquet(filepath, memory_map=True)
+
+
+def _write_feather(df, filepath):
+    # Uncompressed so that reading can map the file instead of decoding it
+    df.reset_index(drop=True).to_feather(filepath, compression="uncompressed")
+
+
+def _read_feather(filepath):
+    from pyarrow import feather
+
+    return feather.read_table(filepath, memory_map=True).to_pandas()
+
+
+def _write_excel(df, filepath):
+    df.to_excel(filepath, index=False)
+
+
+def _read_excel(filepath):
+    return normalize_operation_table(pd.read_excel(filepath))
+
+
+# format -> (extension, writer, reader)
+STORE_FORMATS = {
+    "parquet": (".parquet", _write_parquet, _read_parquet),
+    "feather": (".feather", _write_feather, _read_feather),
+    "xlsx": (".xlsx", _write_excel, _read_excel),
+}
+
+
+def operation_table_path(directory, filename, format=DEFAULT_FORMAT):
+    extension = STORE_FORMATS[format][0]
+    return os.path.join(directory, f"{filename}{extension}")
+
+
+def find_operation_table(directory, filename):
+    # Prefer the typed formats over an Excel export of the same opset
+    for format in STORE_FORMATS:
+        filepath = operation_table_path(directory, filename, format)
+        if os.path.exists(filepath):
+            return filepath
+    return operation_table_path(directory, filename)
+
+
+def save_operation_table(df, directory, filename, format=DEFAULT_FORMAT):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    _, writer, _ = STORE_FORMATS[format]
+    filepath = operation_table_path(directory, filename, format)
+    writer(df, filepath)
+    return filepath
+
+
+def load_operation_table(filepath):
+    extension = os.path.splitext(filepath)[1]
+    for _, (format_extension, _, reader) in STORE_FORMATS.items():
+        if extension == format_extension:
+            return reader(filepath)
+    raise ValueError(f"Unsupported operation table format: {filepath}")
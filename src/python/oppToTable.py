@@ -1,254 +1,257 @@
 import os
 import xml.etree.ElementTree as ET
+import numpy as np
 import pandas as pd
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from operation_store import (
+    DEFAULT_FORMAT,
+    STORE_FORMATS,
+    normalize_operation_table,
+    save_operation_table,
+)
+from operation_filter import operand_filter
+from pipeline_profile import profiled
+
+
+OPERATION_FLAGS = {
+    "reads-memory": "reads_memory",
+    "writes-memory": "writes_memory",
+    "side-effects": "has_side_effects",
+    "is-branch": "is_branch",
+    "control-flow": "control_flow",
+    "is-call": "is_call",
+}
+
+
+def _operand_columns(operation):
+    # One pass over the children of an <operation>, no repeated find() calls
+    data = {
+        "name": "",
+        "description": "",
+        "trigger_semantics": "",
+        "inputs": "",
+        "outputs": "",
+    }
+    flags = dict.fromkeys(OPERATION_FLAGS.values(), False)
+    input_operands = []
+    output_operands = []
+
+    for child in operation:
+        tag = child.tag
+        if tag == "in":
+            input_operands.append(child)
+        elif tag == "out":
+            output_operands.append(child)
+        elif tag == "trigger-semantics":
+            data["trigger_semantics"] = child.text
+        elif tag in OPERATION_FLAGS:
+            flags[OPERATION_FLAGS[tag]] = True
+        elif tag in data:
+            data[tag] = child.text
+
+    data.update(flags)
+
+    for i, operand in enumerate(input_operands, start=1):
+        mem_address = "no"
+        mem_data = "no"
+        can_swap = ""
+        for child in operand:
+            if child.tag == "mem-address":
+                mem_address = "yes"
+            elif child.tag == "mem-data":
+                mem_data = "yes"
+            elif child.tag == "can-swap" and not can_swap:
+                swap = child.find("in")
+                if swap is not None:
+                    can_swap = swap.attrib.get("id")
+        attrib = operand.attrib
+        data[f"input_operand_{i}_id"] = attrib.get("id", "")
+        data[f"io_{i}_element_count"] = attrib.get("element-count", "")
+        data[f"io_{i}_element_width"] = attrib.get("element-width", "")
+        data[f"io_{i}_type"] = attrib.get("type", "")
+        data[f"io_{i}_mem_address"] = mem_address
+        data[f"io_{i}_mem_data"] = mem_data
+        data[f"io_{i}_can_swap"] = can_swap
+
+    for i, operand in enumerate(output_operands, start=1):
+        mem_data = "no"
+        for child in operand:
+            if child.tag == "mem-data":
+                mem_data = "yes"
+        attrib = operand.attrib
+        data[f"output_operand_{i}_id"] = attrib.get("id", "")
+        data[f"oo_{i}_element_count"] = attrib.get("element-count", "")
+        data[f"oo_{i}_element_width"] = attrib.get("element-width", "")
+        data[f"oo_{i}_type"] = attrib.get("type", "")
+        data[f"oo_{i}_memory_data"] = attrib.get("memory_data", "")
+        data[f"oo_{i}_mem_data"] = mem_data
+
+    return data
+
+
+def parse_opp_file(filepath):
+    """Parse one .opp file into a typed, columnar DataFrame.
+
+    Runs in a worker process. The file is streamed with iterparse and every
+    <operation> element is dropped as soon as its row has been recorded.
+    """
+    columns = {}
+    row_count = 0
+
+    context = ET.iterparse(filepath, events=("start", "end"))
+    root = None
+    for event, element in context:
+        if root is None:
+            root = element
+        if event != "end" or element.tag != "operation":
+            continue
+
+        for column, value in _operand_columns(element).items():
+            values = columns.get(column)
+            if values is None:
+                # Operand columns first seen on a later operation are backfilled
+                values = columns[column] = [None] * row_count
+            values.append(value)
+        row_count += 1
+        for values in columns.values():
+            if len(values) < row_count:
+                values.append(None)
+
+        element.clear()
+        root.clear()
+
+    return normalize_operation_table(pd.DataFrame(columns))
+
+
+def _load_opp_file(filepath):
+    filename = os.path.splitext(os.path.basename(filepath))[0]
+    try:
+        return filename, parse_opp_file(filepath)
+    except (FileNotFoundError, ET.ParseError) as e:
+        print(f"Error parsing {filepath}: {e}")
+        return filename, None
 
 
 class OperationParser:
-    def __init__(self, directory="openasip/openasip/opset/base"):
+    def __init__(self, directory="openasip/openasip/opset/base", max_workers=None):
         self.directory = directory
+        self.max_workers = max_workers
         self.operations = {}  # Dictionary to store operations from different .opp files
+        self._pool = None  # Concatenated operations, see operation_pool
+        self._version = 0  # Bumped by operations_changed
 
     def oppToTable(self, filepath):
-        # Parse the XML file
-        try:
-            tree = ET.parse(filepath)
-            root = tree.getroot()
-
-            operations = []
-
-            # Loop through each operation node
-            for operation in root.findall("operation"):
-                # Extract basic operation information
-                name = (
-                    operation.find("name").text
-                    if operation.find("name") is not None
-                    else ""
-                )
-                description = (
-                    operation.find("description").text
-                    if operation.find("description") is not None
-                    else ""
-                )
-                trigger_semantics = (
-                    operation.find("trigger-semantics").text
-                    if operation.find("trigger-semantics") is not None
-                    else ""
-                )
-                inputs = (
-                    operation.find("inputs").text
-                    if operation.find("inputs") is not None
-                    else ""
-                )
-                outputs = (
-                    operation.find("outputs").text
-                    if operation.find("outputs") is not None
-                    else ""
-                )
-                reads_memory = (
-                    True if operation.find("reads-memory") is not None else False
-                )
-                writes_memory = (
-                    True if operation.find("writes-memory") is not None else False
-                )
-                has_side_effects = (
-                    True if operation.find("side-effects") is not None else False
-                )
-                is_branch = True if operation.find("is-branch") is not None else False
-                control_flow = (
-                    True if operation.find("control-flow") is not None else False
-                )
-                is_call = True if operation.find("is-call") is not None else False
-
-                # Get input operands information
-                input_operands = []
-                for i, operand in enumerate(operation.findall("in"), start=1):
-                    mem_address = (
-                        "yes" if operand.find("mem-address") is not None else "no"
-                    )
-                    mem_data = "yes" if operand.find("mem-data") is not None else "no"
-                    can_swap = (
-                        operand.find("can-swap/in").attrib.get("id")
-                        if operand.find("can-swap/in") is not None
-                        else ""
-                    )
-                    input_operands.append(
-                        {
-                            f"input_operand_{i}_id": operand.attrib.get("id", ""),
-                            f"io_{i}_element_count": operand.attrib.get(
-                                "element-count", ""
-                            ),
-                            f"io_{i}_element_width": operand.attrib.get(
-                                "element-width", ""
-                            ),
-                            f"io_{i}_type": operand.attrib.get("type", ""),
-                            f"io_{i}_mem_address": mem_address,
-                            f"io_{i}_mem_data": mem_data,
-                            f"io_{i}_can_swap": can_swap,
-                        }
-                    )
-
-                # Get output operands information
-                output_operands = []
-                for i, operand in enumerate(operation.findall("out"), start=1):
-                    mem_data = "yes" if operand.find("mem-data") is not None else "no"
-                    output_operands.append(
-                        {
-                            f"output_operand_{i}_id": operand.attrib.get("id", ""),
-                            f"oo_{i}_element_count": operand.attrib.get(
-                                "element-count", ""
-                            ),
-                            f"oo_{i}_element_width": operand.attrib.get(
-                                "element-width", ""
-                            ),
-                            f"oo_{i}_type": operand.attrib.get("type", ""),
-                            f"oo_{i}_memory_data": operand.attrib.get(
-                                "memory_data", ""
-                            ),
-                            f"oo_{i}_mem_data": mem_data,
-                        }
-                    )
-
-                # Flatten the input and output operands into single dictionaries
-                input_operands_flat = {
-                    k: v for d in input_operands for k, v in d.items()
-                }
-                output_operands_flat = {
-                    k: v for d in output_operands for k, v in d.items()
-                }
-
-                # Combine all data into a single operation dictionary
-                operation_data = {
-                    "name": name,
-                    "description": description,
-                    "trigger_semantics": trigger_semantics,
-                    "inputs": inputs,
-                    "outputs": outputs,
-                    "reads_memory": reads_memory,
-                    "writes_memory": writes_memory,
-                    "has_side_effects": has_side_effects,
-                    "is_branch": is_branch,
-                    "control_flow": control_flow,
-                    "is_call": is_call,
-                }
-                operation_data.update(input_operands_flat)
-                operation_data.update(output_operands_flat)
-
-                operations.append(operation_data)
-
-            # Extract the filename (without extension)
-            filename = os.path.splitext(os.path.basename(filepath))[0]
-            self.operations[filename] = pd.DataFrame(
-                operations
-            )  # Store operations as a DataFrame
-
-        except (FileNotFoundError, ET.ParseError) as e:
-            print(f"Error parsing {filepath}: {e}")
+        filename, df_operations = _load_opp_file(filepath)
+        if df_operations is not None:
+            self.operations[filename] = df_operations  # Store operations as a DataFrame
+            self.operations_changed()
 
+    @profiled("load_operations")
     def load_operations(self):
         self.operations = {}  # Clear the operations data
 
         # Loop through all .opp files in the directory
-        for filename in os.listdir(self.directory):
-            if filename.endswith(".opp"):
-                filepath = os.path.join(self.directory, filename)
-                self.oppToTable(filepath)
-
-    def filter_operations(
-        self,
-        min_inputs=0,
-        max_inputs=3,
-        min_outputs=0,
-        max_outputs=1,
-        element_widths=[1, 5, 8, 16, 32],
-        no_control_flow=False,
-        no_call=False,
-        no_branch=False,
-        is_element_count_1=False,
-        no_side_effects=False,
-        no_memory_reads=False,
-        no_memory_writes=False,
-        no_HalfFloatWord=False,
-        no_FloatWord=False,
-        no_RawData=False,
-    ):
-        filtered_operations = {}
+        filepaths = [
+            os.path.join(self.directory, filename)
+            for filename in sorted(os.listdir(self.directory))
+            if filename.endswith(".opp")
+        ]
+        max_workers = self.max_workers or os.cpu_count() or 1
+        max_workers = min(max_workers, len(filepaths))
+
+        if max_workers <= 1:
+            results = map(_load_opp_file, filepaths)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(_load_opp_file, filepaths))
+
+        for filename, df_operations in results:
+            if df_operations is not None:
+                self.operations[filename] = df_operations
+        self.operations_changed()
+
+    def operations_changed(self):
+        # Call after modifying an operation table in place, the pool is
+        # rebuilt by the next select
+        self._version += 1
+
+    def operation_pool(self):
+        """All opsets concatenated into one frame indexed by (opset, row).
+
+        Returns the frame and, for columns that only some opsets have, a mask
+        of the rows whose opset lacks the column (see operation_filter).
+        The pool is cached until operations_changed is called or a table is
+        added, replaced or resized.
+        """
+        key = (
+            self._version,
+            tuple((name, id(df), df.shape) for name, df in self.operations.items()),
+        )
+        if self._pool is not None and self._pool[0] == key:
+            return self._pool[1], self._pool[2]
+
+        names = list(self.operations)
+        frames = [self.operations[name] for name in names]
+        if frames:
+            pool = pd.concat(frames, keys=names, names=["opset", None])
+        else:
+            pool = pd.DataFrame()
+        for column in pool.columns:
+            if column.endswith("_type") and column.startswith(("io_", "oo_")):
+                pool[column] = pool[column].astype("category")
+
+        absent_columns = {}
+        lengths = [len(frame) for frame in frames]
+        for column in pool.columns:
+            present = [column in frame.columns for frame in frames]
+            if not all(present):
+                absent_columns[column] = np.repeat(
+                    [not value for value in present], lengths
+                )
 
+        self._pool = (key, pool, absent_columns)
+        return pool, absent_columns
+
+    def select(self, predicate):
+        # Apply a predicate to the whole pool with a single vectorized mask
+        pool, absent_columns = self.operation_pool()
+        return pool[predicate.mask(pool, absent_columns)]
+
+    def split_by_opset(self, selected):
+        groups = {
+            name: group.droplevel("opset")
+            for name, group in selected.groupby(level="opset", sort=False, observed=True)
+        }
+        result = {}
+        for name, df_operations in self.operations.items():
+            group = groups.get(name)
+            if group is None:
+                group = df_operations.iloc[0:0]
+            # The pool has category operand types and widens columns other
+            # opsets lack, each table gets its own dtypes back
+            result[name] = group[df_operations.columns].astype(
+                df_operations.dtypes.to_dict()
+            )
+        return result
+
+    @profiled("filter_operations")
+    def filter_operations(self, predicate=None, **kwargs):
+        # Keyword arguments are the flags of operation_filter.operand_filter,
+        # an explicit predicate can be passed instead
+        if predicate is None:
+            predicate = operand_filter(**kwargs)
+        return self.split_by_opset(self.select(predicate))
+
+    def save(self, directory, format=DEFAULT_FORMAT):
         for filename, df_operations in self.operations.items():
-            # Initialize mask to select all rows
-            mask = pd.Series([True] * len(df_operations))
-
-            # Filter based on inputs
-            for i in range(1, max_inputs):
-                col_name = f"io_{i}_type"
-                if col_name in df_operations.columns:
-                    if no_HalfFloatWord:
-                        mask &= df_operations[col_name] != "HalfFloatWord"
-                    if no_FloatWord:
-                        mask &= df_operations[col_name] != "FloatWord"
-                    if no_RawData:
-                        mask &= df_operations[col_name] != "RawData"
-                col_name_width = f"io_{i}_element_width"
-                if col_name_width in df_operations.columns:
-                    df_operations[col_name_width] = pd.to_numeric(df_operations[col_name_width], errors='coerce').fillna(-1).astype(int)
-                    mask &= df_operations[col_name_width].isin(element_widths)
-
-            # Filter based on outputs
-            for i in range(1, max_outputs):
-                col_name = f"oo_{i}_type"
-                if col_name in df_operations.columns:
-                    if no_HalfFloatWord:
-                        mask &= df_operations[col_name] != "HalfFloatWord"
-                    if no_FloatWord:
-                        mask &= df_operations[col_name] != "FloatWord"
-                    if no_RawData:
-                        mask &= df_operations[col_name] != "RawData"
-
-                col_name_width = f"oo_{i}_element_width"
-                if col_name_width in df_operations.columns:
-                    df_operations[col_name_width] = pd.to_numeric(df_operations[col_name_width], errors='coerce').fillna(-1).astype(int)
-                    mask &= df_operations[col_name_width].isin(element_widths)
-
-            # Additional filters
-            mask &= df_operations["inputs"].fillna(0).astype(int) >= min_inputs
-            mask &= df_operations["inputs"].fillna(0).astype(int) <= max_inputs
-            mask &= df_operations["outputs"].fillna(0).astype(int) >= min_outputs
-            mask &= df_operations["outputs"].fillna(0).astype(int) <= max_outputs
-
-            if no_control_flow:
-                mask &= ~df_operations["control_flow"]
-
-            if no_call:
-                mask &= ~df_operations["is_call"]
-
-            if no_branch:
-                mask &= ~df_operations["is_branch"]
-
-            if is_element_count_1:
-                for i in range(1, max_inputs):
-                    col_name_count = f"io_{i}_element_count"
-                    if col_name_count in df_operations.columns:
-                        df_operations[col_name_count] = pd.to_numeric(df_operations[col_name_count], errors='coerce').fillna(0).astype(int)
-                        mask &= df_operations[col_name_count] == 1
-
-            if no_side_effects:
-                mask &= ~df_operations["has_side_effects"]
-
-            if no_memory_reads:
-                mask &= ~df_operations["reads_memory"]
-
-            if no_memory_writes:
-                mask &= ~df_operations["writes_memory"]
-
-            filtered_operations[filename] = df_operations[mask]
-
-        return filtered_operations
+            output_filepath = save_operation_table(
+                df_operations, directory, filename, format
+            )
+            print(f"Saved {filename} to {output_filepath}")
 
     def save_to_excel(self, directory):
-        for filename, df_operations in self.operations.items():
-            output_filepath = os.path.join(directory, f"{filename}.xlsx")
-            df_operations.to_excel(output_filepath, index=False)
-            print(f"Saved {filename}.xlsx to {output_filepath}")
+        self.save(directory, format="xlsx")
 
 
 if __name__ == "__main__":
@@ -326,6 +329,11 @@ if __name__ == "__main__":
         action="store_true",
         help="Exclude operations with type RawData",
     )
+    parser.add_argument(
+        "--present-operands-only",
+        action="store_true",
+        help="Check element widths only for operands an operation has, keeps one-input operations such as loads",
+    )
     parser.add_argument(
         "--skip-filters",
         action="store_true",
@@ -337,6 +345,17 @@ if __name__ == "__main__":
         default="./Operations",
         help="Directory to save filtered results",
     )
+    parser.add_argument(
+        "--store-format",
+        choices=list(STORE_FORMATS),
+        default=DEFAULT_FORMAT,
+        help="Format of the saved operation tables",
+    )
+    parser.add_argument(
+        "--export-excel",
+        action="store_true",
+        help="Additionally export the operation tables as .xlsx",
+    )
 
     args = parser.parse_args()
 
@@ -362,13 +381,17 @@ if __name__ == "__main__":
             no_HalfFloatWord=args.no_HalfFloatWord,
             no_FloatWord=args.no_FloatWord,
             no_RawData=args.no_RawData,
+            present_operands_only=args.present_operands_only,
         )
 
     for filename, df_operations in filtered_operations.items():
         output_directory = args.output_directory
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
-
-        output_filepath = os.path.join(output_directory, f"{filename}.xlsx")
-        df_operations.to_excel(output_filepath, index=False)
-        print(f"Saved {filename}.xlsx to {output_filepath}")
+        output_filepath = save_operation_table(
+            df_operations, output_directory, filename, args.store_format
+        )
+        print(f"Saved {filename} to {output_filepath}")
+        if args.export_excel and args.store_format != "xlsx":
+            output_filepath = save_operation_table(
+                df_operations, output_directory, filename, "xlsx"
+            )
+            print(f"Exported {filename}.xlsx to {output_filepath}")
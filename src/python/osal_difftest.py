@@ -0,0 +1,374 @@
+import argparse
+import ctypes
+import hashlib
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from trigger_index import load_trigger_index
+from osal_rewrite import EXEC_PATTERN, split_arguments
+from oppToTable import parse_opp_file
+from cdsl_parser import parse_instruction_set
+from cdsl_eval import EvaluationError, evaluate_behavior, random_operands
+from packed_simd import is_packed
+
+CACHE_DIRECTORY = os.path.join(".cache", "osal_difftest")
+CXX = os.environ.get("CXX", "g++")
+CXXFLAGS = ["-O2", "-fPIC", "-std=c++17", "-w"]
+
+# Just enough of OSAL.hh for the trigger bodies of the integer operations.
+# Operands live in a uint32_t array, IO(n) is element n - 1.
+SHIM_HEADER = r"""
+#include <cstdint>
+#include <cstddef>
+#include <csetjmp>
+#include <csignal>
+typedef uint32_t UIntWord;
+typedef int32_t SIntWord;
+typedef uint64_t ULongWord;
+typedef int64_t SLongWord;
+typedef uint32_t SimValue;
+#define OSAL_WORD_WIDTH 32
+#define IO(n) io[(n) - 1]
+#define UINT(n) static_cast<UIntWord>(io[(n) - 1])
+#define INT(n) static_cast<SIntWord>(io[(n) - 1])
+#define ULONG(n) static_cast<ULongWord>(io[(n) - 1])
+#define SLONG(n) static_cast<SLongWord>(static_cast<SIntWord>(io[(n) - 1]))
+#define BWIDTH(n) 32
+#define MIN(a, b) ((a) < (b) ? (a) : (b))
+#define MAX(a, b) ((a) > (b) ? (a) : (b))
+#define RUNTIME_ERROR(message) do { *error = 1; return false; } while (0)
+#define TRIGGER
+#define END_TRIGGER
+
+// INT_MIN / -1 traps on x86; such lanes are reported as errors instead of
+// killing the test
+static sigjmp_buf osal_trap;
+static void osal_on_trap(int) { siglongjmp(osal_trap, 1); }
+"""
+
+MAX_OPERANDS = 8
+
+def trigger_body(body):
+    # The code between TRIGGER and END_TRIGGER of an OPERATION block
+    match = re.search(r"\bTRIGGER\b(.*?)\bEND_TRIGGER\b", body, re.DOTALL)
+    return match.group(1) if match else None
+
+
+def inline_exec_operations(code, operations):
+    """Replace EXEC_OPERATION(op, ...) by calls of the compiled operation.
+
+    Returns the code and the called operations.
+    """
+    called = []
+
+    def replace(match):
+        name = match.group(1).upper()
+        arguments = split_arguments(match.group(2))
+        inputs, outputs = operations[name]
+        if len(arguments) != inputs + outputs:
+            raise ValueError(f"EXEC_OPERATION({match.group(1)}) with {len(arguments)} operands")
+        called.append(name)
+        lines = [f"{{ uint32_t sub[{MAX_OPERANDS}] = {{0}};"]
+        for i, argument in enumerate(arguments[:inputs]):
+            lines.append(f"sub[{i}] = static_cast<uint32_t>({argument});")
+        lines.append(f"if (!osal_one_{name}(sub, error)) return false;")
+        for i, argument in enumerate(arguments[inputs:]):
+            lines.append(f"{argument} = sub[{inputs + i}];")
+        lines.append("}")
+        return " ".join(lines)
+
+    return EXEC_PATTERN.sub(replace, code), called
+
+
+def operation_source(name, code, called):
+    prototypes = "".join(
+        f'extern "C" bool osal_one_{callee}(uint32_t* io, unsigned char* error);\n'
+        for callee in sorted(set(called))
+    )
+    return f"""{SHIM_HEADER}
+{prototypes}
+extern "C" bool osal_one_{name}(uint32_t* io, unsigned char* error) {{
+{code}
+    return true;
+}}
+
+extern "C" void osal_{name}(size_t size, const uint32_t* const* inputs, size_t input_count,
+                            uint32_t* output, size_t output_index, unsigned char* error) {{
+    struct sigaction action = {{}}, previous;
+    action.sa_handler = osal_on_trap;
+    sigaction(SIGFPE, &action, &previous);
+    for (size_t i = 0; i < size; i++) {{
+        uint32_t io[{MAX_OPERANDS}] = {{0}};
+        for (size_t j = 0; j < input_count; j++) io[j] = inputs[j][i];
+        error[i] = 0;
+        if (sigsetjmp(osal_trap, 1)) {{
+            error[i] = 2;
+            continue;
+        }}
+        osal_one_{name}(io, &error[i]);
+        output[i] = io[output_index];
+    }}
+    sigaction(SIGFPE, &previous, nullptr);
+}}
+"""
+
+
+def operation_sources(df, trigger_index):
+    """C++ source of every operation the shims can express.
+
+    Operations come either with a .cc TRIGGER body or with
+    trigger-semantics built from EXEC_OPERATIONs of other operations.
+    Returns name -> (source, called operations) and name -> reason for the
+    skipped ones.
+    """
+    operations = {
+        row["name"]: (int(row["inputs"]), int(row["outputs"]))
+        for _, row in df.iterrows()
+        if pd.notna(row["inputs"]) and pd.notna(row["outputs"])
+    }
+    sources = {}
+    skipped = {}
+    for _, row in df.iterrows():
+        name = row["name"]
+        if name not in operations:
+            skipped[name] = "unknown operand count"
+            continue
+        code = None
+        body = trigger_index.get(name)
+        if body is not None:
+            code = trigger_body(body)
+        if code is None:
+            semantics = row.get("trigger_semantics")
+            if isinstance(semantics, str) and "EXEC_OPERATION" in semantics:
+                code = semantics
+        if code is None:
+            skipped[name] = "no trigger code"
+            continue
+        try:
+            code, called = inline_exec_operations(code, operations)
+        except (KeyError, ValueError) as e:
+            skipped[name] = f"cannot inline EXEC_OPERATION: {e}"
+            continue
+        sources[name] = (operation_source(name, code, called), called)
+    return sources, skipped
+
+
+def compile_object(source, object_filepath):
+    source_filepath = object_filepath[: -len(".o")] + ".cc"
+    with open(source_filepath, "w") as file:
+        file.write(source)
+    result = subprocess.run(
+        [CXX, *CXXFLAGS, "-c", source_filepath, "-o", object_filepath],
+        capture_output=True,
+        text=True,
+    )
+    return result.returncode == 0, result.stderr
+
+
+def build_library(sources, cache_directory=CACHE_DIRECTORY, max_workers=None):
+    """Compile every operation into one shared library.
+
+    Each operation is its own object file, so one that does not compile
+    against the shims only drops itself and the composites calling it.
+    Returns the library path, the compiled names and name -> error.
+    """
+    digest = hashlib.sha256(SHIM_HEADER.encode())
+    for name in sorted(sources):
+        digest.update(sources[name][0].encode())
+    build_directory = os.path.join(cache_directory, digest.hexdigest()[:16])
+    os.makedirs(build_directory, exist_ok=True)
+
+    def build(name):
+        object_filepath = os.path.join(build_directory, f"{name}.o")
+        if os.path.exists(object_filepath):
+            return name, True, ""
+        return (name,) + compile_object(sources[name][0], object_filepath)
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        for name, compiled, stderr in executor.map(build, sorted(sources)):
+            if not compiled:
+                messages = [line for line in stderr.splitlines() if "error:" in line]
+                errors[name] = messages[0].split("error:", 1)[1].strip() if messages else "compile error"
+
+    # Composites need every operation they call
+    compiled = {name for name in sources if name not in errors}
+    changed = True
+    while changed:
+        changed = False
+        for name in sorted(compiled):
+            missing = [callee for callee in sources[name][1] if callee not in compiled]
+            if missing:
+                compiled.discard(name)
+                errors[name] = f"calls {', '.join(missing)}, which did not compile"
+                changed = True
+
+    library_filepath = os.path.join(build_directory, "osal_shim.so")
+    if compiled and not os.path.exists(library_filepath):
+        objects = [os.path.join(build_directory, f"{name}.o") for name in sorted(compiled)]
+        subprocess.run(
+            [CXX, "-shared", "-o", library_filepath, *objects], check=True
+        )
+    return library_filepath, sorted(compiled), errors
+
+
+class OsalLibrary:
+    def __init__(self, library_filepath):
+        self.library = ctypes.CDLL(os.path.abspath(library_filepath))
+
+    def run(self, name, inputs, output_index):
+        """Run an operation over operand arrays, returns (output, error)."""
+        function = getattr(self.library, f"osal_{name}")
+        size = len(inputs[0])
+        inputs = [np.ascontiguousarray(values, dtype=np.uint32) for values in inputs]
+        pointers = (ctypes.POINTER(ctypes.c_uint32) * len(inputs))(
+            *[values.ctypes.data_as(ctypes.POINTER(ctypes.c_uint32)) for values in inputs]
+        )
+        output = np.zeros(size, dtype=np.uint32)
+        error = np.zeros(size, dtype=np.uint8)
+        function(
+            ctypes.c_size_t(size),
+            pointers,
+            ctypes.c_size_t(len(inputs)),
+            output.ctypes.data_as(ctypes.POINTER(ctypes.c_uint32)),
+            ctypes.c_size_t(output_index),
+            error.ctypes.data_as(ctypes.POINTER(ctypes.c_uint8)),
+        )
+        return output, error.astype(bool)
+
+
+def difftest(df, library, compiled, instructions, filename, samples, seed=0):
+    """Compare the compiled OSAL semantics with the generated behaviors.
+
+    Lanes where the OSAL code raises RUNTIME_ERROR are not compared, nor
+    are packed operations: the shims hold one element per operand, and
+    their lane kernels are chosen by name in packed_simd. Returns one result
+    dictionary per operation; unchecked is the reason an operation could
+    not be compared, e.g. a behavior cdsl_parser does not support, or None.
+    """
+    behaviors = {instruction.name: instruction for instruction in instructions}
+    results = []
+    for _, row in df.iterrows():
+        name = row["name"]
+        instruction = behaviors.get(f"OpenASIP_{filename}_{name}")
+        if is_packed(row):
+            result = {"name": name, "samples": 0, "mismatches": 0, "examples": []}
+            result["unchecked"] = "packed operation, its lane kernel is taken from the name"
+            results.append(result)
+            continue
+        if name not in compiled:
+            continue
+        inputs = int(row["inputs"])
+        result = {"name": name, "samples": samples, "mismatches": 0, "unchecked": None, "examples": []}
+        results.append(result)
+        if instruction is None:
+            result["unchecked"] = "not in the generated instruction set"
+            continue
+        if instruction.behavior is None:
+            result["unchecked"] = f"parse error: {instruction.error}"
+            continue
+
+        fields = [f"rs{i + 1}" for i in range(inputs)]
+        operands = random_operands(samples, fields + ["rd"], seed=seed)
+        expected, runtime_error = library.run(name, [operands[field] for field in fields], inputs)
+        try:
+            registers, written = evaluate_behavior(instruction.behavior, operands)
+        except EvaluationError as e:
+            result["unchecked"] = f"evaluation error: {e}"
+            continue
+
+        actual = registers["rd"]
+        mismatch = ~runtime_error & (actual != expected)
+        result["mismatches"] = int(mismatch.sum())
+        for lane in np.flatnonzero(mismatch)[:3].tolist():
+            example = {field: hex(int(operands[field][lane])) for field in fields}
+            example["expected"] = hex(int(expected[lane]))
+            example["actual"] = hex(int(actual[lane]))
+            result["examples"].append(example)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Differential test of generated CoreDSL against the OSAL C++ semantics"
+    )
+    parser.add_argument("--filename", type=str, default="base", help="Opset to test")
+    parser.add_argument(
+        "--directory",
+        type=str,
+        default="openasip/openasip/opset/base",
+        help="Directory containing the .opp and .cc files",
+    )
+    parser.add_argument(
+        "--core-desc",
+        type=str,
+        default=None,
+        help="Generated instruction set (default: src/cdsl/<filename>.core_desc)",
+    )
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--operations", nargs="+", default=None, help="Only these operations")
+    args = parser.parse_args()
+
+    core_desc = args.core_desc or os.path.join("src/cdsl", f"{args.filename}.core_desc")
+    df = parse_opp_file(os.path.join(args.directory, f"{args.filename}.opp"))
+    if args.operations:
+        # Keep the callees of composites, they are compiled as well
+        selected = df[df["name"].isin(args.operations)]
+    else:
+        selected = df
+    trigger_index = load_trigger_index(os.path.join(args.directory, f"{args.filename}.cc"))
+
+    sources, skipped = operation_sources(df, trigger_index)
+    library_filepath, compiled, errors = build_library(sources)
+    # Operations without a compiled reference, listed in the summary
+    unchecked = {
+        name: reason
+        for name, reason in {**skipped, **errors}.items()
+        if name in set(selected["name"])
+    }
+    if not compiled:
+        for name, reason in sorted(unchecked.items()):
+            print(f"Skipping {name}: {reason}")
+        print("No operation compiled against the OSAL shims")
+        sys.exit(1)
+
+    with open(core_desc, "r") as file:
+        instructions = parse_instruction_set(file.read())
+    results = difftest(
+        selected,
+        OsalLibrary(library_filepath),
+        set(compiled),
+        instructions,
+        args.filename,
+        args.samples,
+        args.seed,
+    )
+
+    failed = 0
+    compared = 0
+    for result in results:
+        if result["unchecked"]:
+            unchecked[result["name"]] = result["unchecked"]
+            continue
+        compared += 1
+        status = f"{result['mismatches']} mismatches" if result["mismatches"] else "ok"
+        print(f"{result['name']:<16}{status}")
+        for example in result["examples"]:
+            print(f"    {example}")
+        failed += bool(result["mismatches"])
+    print(f"{compared - failed} of {compared} compared operations match")
+    if unchecked:
+        # Not a pass either, these operations have no verdict at all
+        print(f"{len(unchecked)} operations not checked:")
+        for name, reason in sorted(unchecked.items()):
+            print(f"  {name:<14}{reason}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+import re
+from collections import Counter
+
+
+class RewriteRule:
+    """One OSAL macro -> CoreDSL rewrite.
+
+    template is either a format string or a callable taking (match_groups,
+    params) and returning the replacement. Format strings see the matched
+    text as {0}, the rule's capture groups as {1}, {2}, ... and the engine
+    parameters by name (e.g. {rfs}). With rewrite_groups the capture groups
+    are rewritten by the same engine before they are substituted, so macros
+    nested inside a match are still translated in the same pass.
+    """
+
+    def __init__(self, name, pattern, template, rewrite_groups=False):
+        self.name = name
+        self.pattern = pattern
+        self.template = template
+        self.rewrite_groups = rewrite_groups
+        self.group_count = re.compile(pattern).groups
+
+
+class RewriteEngine:
+    """Applies a rule table in a single left-to-right pass over the input.
+
+    All rules are compiled into one alternation. At every position the
+    leftmost match wins and, for matches starting at the same position, the
+    rule listed first wins, so the rule order is part of the table.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.hits = Counter()
+
+        alternatives = []
+        self._group_offsets = []
+        group = 1
+        for rule in rules:
+            alternatives.append(f"({rule.pattern})")
+            self._group_offsets.append(group)
+            group += 1 + rule.group_count
+        self._regex = re.compile("|".join(alternatives))
+        self._rule_by_group = dict(zip(self._group_offsets, rules))
+
+    def reset_hits(self):
+        self.hits.clear()
+
+    def rewrite(self, text, **params):
+        def replace(match):
+            offset = match.lastindex
+            rule = self._rule_by_group[offset]
+            self.hits[rule.name] += 1
+
+            groups = [match.group(offset)]
+            for i in range(1, rule.group_count + 1):
+                value = match.group(offset + i)
+                if value is None:
+                    value = ""
+                elif rule.rewrite_groups:
+                    value = self.rewrite(value, **params)
+                groups.append(value)
+
+            if callable(rule.template):
+                return rule.template(groups, params)
+            return rule.template.format(*groups, **params)
+
+        return self._regex.sub(replace, text)
+
+
+def _rewrite_io(groups, params):
+    register = params["io_map"].get(groups[1])
+    if register is None:
+        return groups[0]
+    return f"X[{register}{params['rfs']}]"
+
+
+# One macro argument, with up to two levels of nested parentheses
+ARGUMENT = r"(?:[^,;()]|\((?:[^()]|\([^()]*\))*\))+?"
+
+
+def memory_range(address, size):
+    # MEM[a + 3:a] is the little-endian word at a, MEM[a] a single byte
+    size = int(size)
+    if not re.fullmatch(r"\w+(?:\[[^\]]*\])?", address):
+        address = f"({address})"
+    if size == 1:
+        return f"MEM[{address}]"
+    return f"MEM[{address} + {size - 1}:{address}]"
+
+
+def _rewrite_memory_read(groups, params):
+    return f"{groups[3]} = {memory_range(groups[1], groups[2])};"
+
+
+def _rewrite_memory_write(groups, params):
+    size = int(groups[2])
+    return f"{memory_range(groups[1], size)} = (unsigned<{8 * size}>)({groups[3]});"
+
+
+def _reject_memory_access(groups, params):
+    # MEM is little-endian, the unsuffixed accessors use the target's byte order
+    raise RewriteError(f"{groups[0].rstrip('(')} is not supported, only MEMORY.readLE and MEMORY.writeLE")
+
+
+def _rewrite_extend(groups, params):
+    # SIGN_EXTEND(value, MAU_SIZE * 2), the width has to be a constant
+    factors = [factor.strip() for factor in groups[3].split("*")]
+    if not all(factor.isdigit() for factor in factors):
+        # Left for the parser to reject, with its operands translated
+        return f"{groups[1]}_EXTEND({groups[2]}, {groups[3]})"
+    width = 1
+    for factor in factors:
+        width *= int(factor)
+    signedness = "signed" if groups[1] == "SIGN" else "unsigned"
+    return f"({signedness}<32>)(({signedness}<{width}>)({groups[2]}))"
+
+
+# OSAL -> CoreDSL translation of trigger bodies. New macros are added here.
+TRIGGER_RULES = [
+    # if (X[rs2] == 0) RUNTIME_ERROR("Divide by zero.") -> guard the body instead
+    RewriteRule(
+        "divide_by_zero_guard",
+        r'if\s*\((?:U?INT|ULONG|IO)\(2\)\s*==\s*0\)\s*RUNTIME_ERROR\("Divide by zero."\)',
+        "if (X[rs2{rfs}] != 0) {{",
+    ),
+    RewriteRule(
+        "lmbd_operand_guard",
+        r'if\s*\(bitToSearch\s*>\s*1\)\s*RUNTIME_ERROR\("LMDB\'s 2nd operand must be 0 or 1!"\);',
+        "if (bitToSearch <= 1) {{",
+    ),
+    RewriteRule("sizeof_word", r"sizeof\((?:UIntWord|unsigned<32>)\)", "4"),
+    # INT(n) is the operand as SIntWord, UINT(n) and ULONG(n) zero extend it
+    RewriteRule("signed_operand_value", r"INT\((\d+)\)", "(signed<32>)(X[rs{1}{rfs}])"),
+    RewriteRule("operand_value", r"(?:UINT|ULONG)\((\d+)\)", "X[rs{1}{rfs}]"),
+    RewriteRule("signed_word", r"SIntWord", "signed<32>"),
+    RewriteRule("unsigned_word", r"UIntWord", "unsigned<32>"),
+    RewriteRule("signed_long_word", r"SLongWord", "signed<64>"),
+    RewriteRule("unsigned_long_word", r"ULongWord", "unsigned<64>"),
+    RewriteRule("min", r"MIN\(", "min("),
+    RewriteRule("mau_size", r"MAU_SIZE", "8"),
+    # MEMORY.readLE(address, bytes, target) and MEMORY.writeLE(address, bytes, value)
+    RewriteRule(
+        "memory_read",
+        rf"MEMORY\.readLE\(\s*({ARGUMENT})\s*,\s*(\d+)\s*,\s*(\w+)\s*\)\s*;",
+        _rewrite_memory_read,
+        rewrite_groups=True,
+    ),
+    RewriteRule(
+        "memory_write",
+        rf"MEMORY\.writeLE\(\s*({ARGUMENT})\s*,\s*(\d+)\s*,\s*({ARGUMENT})\s*\)\s*;",
+        _rewrite_memory_write,
+        rewrite_groups=True,
+    ),
+    RewriteRule("memory_byte_order", r"MEMORY\.(?:read|write)(?:BE)?\(", _reject_memory_access),
+    RewriteRule(
+        "extend",
+        rf"(SIGN|ZERO)_EXTEND\(\s*({ARGUMENT})\s*,\s*({ARGUMENT})\s*\)",
+        _rewrite_extend,
+        rewrite_groups=True,
+    ),
+    RewriteRule("word_width", r"OSAL_WORD_WIDTH", "32"),
+    RewriteRule("bit_width", r"BWIDTH\((\d+)\)", "BWIDTH(X[rs{1}{rfs}])"),
+    # static_cast<T>(x) -> (T)(x), the parenthesised operand is left in place
+    RewriteRule(
+        "static_cast",
+        r"static_cast<((?:[^<>]+|<[^<>]*>)+)>(?=\()",
+        "({1})",
+        rewrite_groups=True,
+    ),
+    RewriteRule("return_true", r"return true;", ""),
+    RewriteRule("long_long", r"long long", "long"),
+    RewriteRule("end_trigger", r"END_TRIGGER;", ""),
+    RewriteRule("trigger", r"TRIGGER", ""),
+    RewriteRule("io", r"IO\((\d+)\)", _rewrite_io),
+]
+
+IO_RULES = [RewriteRule("io", r"IO\((\d+)\)", _rewrite_io)]
+
+trigger_rewriter = RewriteEngine(TRIGGER_RULES)
+io_rewriter = RewriteEngine(IO_RULES)
+
+
+def io_register_map(code, inputs=None):
+    # The operand after the inputs is the result. Without the input count,
+    # IO(4) marks a third source, e.g. MAC
+    if inputs is None:
+        inputs = 3 if "IO(4)" in code else 2
+    io_map = {str(i): f"rs{i}" for i in range(1, inputs + 1)}
+    io_map[str(inputs + 1)] = "rd"
+    return io_map
+
+
+def rewrite_trigger_code(trigger_code, remove_RFS=False, inputs=None):
+    trigger_code = fold_early_returns(trigger_code)
+    return trigger_rewriter.rewrite(
+        trigger_code,
+        rfs="" if remove_RFS else " % RFS",
+        io_map=io_register_map(trigger_code, inputs),
+    )
+
+
+def rewrite_io_operands(behavior_code, remove_RFS=False):
+    return io_rewriter.rewrite(
+        behavior_code,
+        rfs="" if remove_RFS else " % RFS",
+        io_map=io_register_map(behavior_code),
+    )
+
+
+class RewriteError(Exception):
+    pass
+
+
+RETURN_PATTERN = re.compile(r"\breturn\b[^;]*;")
+COMMENT_PATTERN = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+LOOP_KEYWORDS = ("for", "while", "do", "switch")
+
+
+def early_return(trigger_code):
+    # The translation drops every return, only a final one is harmless
+    code = COMMENT_PATTERN.sub("", trigger_code)
+    code = re.sub(r"\bEND_TRIGGER\s*;?\s*$", "", code.strip()).rstrip()
+    returns = list(RETURN_PATTERN.finditer(code))
+    return any(match.end() != len(code) for match in returns)
+
+
+def _skip_space(text, i):
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return i
+
+
+def _keyword_at(text, i, keyword):
+    end = i + len(keyword)
+    return text.startswith(keyword, i) and (end == len(text) or not (text[end].isalnum() or text[end] == "_"))
+
+
+def _closing(text, i):
+    # Index after the bracket matching the one at i, strings are skipped
+    opening = text[i]
+    closing = {"(": ")", "{": "}"}[opening]
+    depth = 0
+    quote = None
+    while i < len(text):
+        character = text[i]
+        if quote:
+            if character == "\\":
+                i += 1
+            elif character == quote:
+                quote = None
+        elif character in "\"'":
+            quote = character
+        elif character == opening:
+            depth += 1
+        elif character == closing:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise RewriteError(f"Unbalanced {opening} in trigger code")
+
+
+def _statement_end(text, i):
+    # Index after the ; ending a simple statement
+    while i < len(text):
+        if text[i] in "({":
+            i = _closing(text, i)
+        elif text[i] in "\"'":
+            quote = text[i]
+            i += 1
+            while i < len(text) and text[i] != quote:
+                i += 2 if text[i] == "\\" else 1
+            i += 1
+        elif text[i] == ";":
+            return i + 1
+        else:
+            i += 1
+    raise RewriteError("Statement without ; in trigger code")
+
+
+def _branch(statement):
+    # The statements of an if branch, braces or not
+    return statement[1] if statement[0] == "block" else [statement]
+
+
+def _parse_statement(text, i):
+    # (statement, index after it); statements are ("stmt", text),
+    # ("return", text), ("block", statements, text) and
+    # ("if", condition, then, otherwise, text) with otherwise None or a list
+    start = i
+    if text[i] == "{":
+        end = _closing(text, i)
+        return ("block", _parse_statements(text[i + 1 : end - 1]), text[start:end]), end
+    if _keyword_at(text, i, "if"):
+        i = _skip_space(text, i + 2)
+        if i >= len(text) or text[i] != "(":
+            raise RewriteError("if without a condition in trigger code")
+        end = _closing(text, i)
+        condition = text[i + 1 : end - 1]
+        then, i = _parse_statement(text, _skip_space(text, end))
+        otherwise = None
+        after = _skip_space(text, i)
+        if _keyword_at(text, after, "else"):
+            otherwise, i = _parse_statement(text, _skip_space(text, after + 4))
+            otherwise = _branch(otherwise)
+        return ("if", condition, _branch(then), otherwise, text[start:i]), i
+    for keyword in LOOP_KEYWORDS:
+        if _keyword_at(text, i, keyword):
+            return _parse_loop(text, i, keyword)
+    end = _statement_end(text, i)
+    if _keyword_at(text, i, "return"):
+        return ("return", text[start:end]), end
+    return ("stmt", text[start:end]), end
+
+
+def _parse_loop(text, i, keyword):
+    # Loops and switches stay one statement, a return in them can not be
+    # moved into an else branch
+    start = i
+    i = _skip_space(text, i + len(keyword))
+    if keyword != "do":
+        if i >= len(text) or text[i] != "(":
+            raise RewriteError(f"{keyword} without a condition in trigger code")
+        i = _skip_space(text, _closing(text, i))
+    if i >= len(text):
+        raise RewriteError(f"{keyword} without a body in trigger code")
+    _, i = _parse_statement(text, i)
+    if keyword == "do":
+        i = _statement_end(text, i)
+    if RETURN_PATTERN.search(text[start:i]):
+        raise RewriteError("return inside a loop or switch")
+    return ("stmt", text[start:i]), i
+
+
+def _parse_statements(text):
+    statements = []
+    i = _skip_space(text, 0)
+    while i < len(text):
+        statement, i = _parse_statement(text, i)
+        statements.append(statement)
+        i = _skip_space(text, i)
+    return statements
+
+
+def _returns(statement):
+    # Whether any path through statement returns
+    if statement[0] == "return":
+        return True
+    if statement[0] == "block":
+        return any(_returns(child) for child in statement[1])
+    if statement[0] == "if":
+        return any(_returns(child) for child in statement[2] + (statement[3] or []))
+    return False
+
+
+def _fold(statements, tail):
+    """statements followed by tail, without returns.
+
+    The statements after an if that returns on some path are moved into
+    the branches that do not return, so that every path ends at the end.
+    """
+    folded = []
+    for index, statement in enumerate(statements):
+        if statement[0] == "return":
+            return folded
+        if not _returns(statement):
+            folded.append(statement)
+            continue
+        rest = _fold(statements[index + 1 :], tail)
+        if statement[0] == "block":
+            folded.append(("block", _fold(statement[1], rest), None))
+        else:
+            otherwise = _fold(statement[3] or [], rest)
+            folded.append(("if", statement[1], _fold(statement[2], rest), otherwise or None, None))
+        return folded
+    return folded + tail
+
+
+def _emit(statements, depth):
+    lines = []
+    indent = " " * (4 * depth)
+    for statement in statements:
+        if statement[-1] is not None:
+            # Unchanged, keeps the text the rewrite rules expect
+            lines.append(indent + statement[-1].strip())
+        elif statement[0] == "block":
+            lines += [indent + "{"] + _emit(statement[1], depth + 1) + [indent + "}"]
+        else:
+            lines.append(f"{indent}if ({' '.join(statement[1].split())}) {{")
+            lines += _emit(statement[2], depth + 1)
+            if statement[3]:
+                lines.append(indent + "} else {")
+                lines += _emit(statement[3], depth + 1)
+            lines.append(indent + "}")
+    return lines
+
+
+def fold_early_returns(trigger_code):
+    """Trigger code with early returns turned into if/else.
+
+    OSAL returns from the middle of a trigger, e.g. the shift operations
+    bail out with a zero result for too wide shifts. CoreDSL behavior has
+    no return, so the rest of the body is moved into an else branch.
+    Bodies without an early return are returned unchanged.
+    """
+    if not early_return(trigger_code):
+        return trigger_code
+    code = COMMENT_PATTERN.sub("", trigger_code).strip()
+    code = re.sub(r"^TRIGGER\b", "", code)
+    code = re.sub(r"\bEND_TRIGGER\s*;?\s*$", "", code)
+    body = _emit(_fold(_parse_statements(code), []), 1)
+    return "\n".join(["TRIGGER"] + body + ["END_TRIGGER;"])
+
+
+# EXEC_OPERATION(name, operands...) calls in trigger-semantics blocks
+EXEC_PATTERN = re.compile(r"EXEC_OPERATION\s*\(\s*(\w+)\s*,(.*?)\)\s*;", re.DOTALL)
+
+
+def split_arguments(text):
+    # Split at commas that are not nested in parentheses
+    arguments = []
+    depth = 0
+    current = ""
+    for character in text:
+        if character == "," and depth == 0:
+            arguments.append(current.strip())
+            current = ""
+            continue
+        depth += character == "("
+        depth -= character == ")"
+        current += character
+    arguments.append(current.strip())
+    return arguments
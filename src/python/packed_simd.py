@@ -0,0 +1,145 @@
+import re
+import pandas as pd
+from cdsl_parser import (
+    Assign,
+    Binary,
+    Block,
+    Cast,
+    CType,
+    Declare,
+    INT,
+    Name,
+    Number,
+    Slice,
+    Ternary,
+)
+from cdsl_eval import XLEN
+from cdsl_ir import emit_behavior
+
+# Lane kernels of the packed operations: name -> (operator, signed, saturating).
+# The name is the operation name without its lane suffix, ADDH2 -> ADD. Only
+# the name is checked, osal_difftest lists packed operations as not checked.
+KERNELS = {
+    "ADD": ("+", True, False),
+    "SUB": ("-", True, False),
+    "MUL": ("*", True, False),
+    "ADDS": ("+", True, True),
+    "SUBS": ("-", True, True),
+    "ADDUS": ("+", False, True),
+    "SUBUS": ("-", False, True),
+    "MIN": ("min", True, False),
+    "MINU": ("min", False, False),
+    "MAX": ("max", True, False),
+    "MAXU": ("max", False, False),
+    "AND": ("&", False, False),
+    "IOR": ("|", False, False),
+    "XOR": ("^", False, False),
+}
+
+# ADDH2, ADD16X2, ADDB4, ADD8X4
+LANE_SUFFIX_PATTERN = re.compile(r"^([A-Z]+?)(?:\d+X\d+|[BH]\d+)?$")
+
+INTEGER_TYPES = ("SIntWord", "UIntWord")
+
+
+class PackedError(Exception):
+    pass
+
+
+def _operand_layout(row, prefix, i):
+    count = row.get(f"{prefix}_{i}_element_count")
+    width = row.get(f"{prefix}_{i}_element_width")
+    count = int(count) if pd.notna(count) and count != "" else 1
+    width = int(width) if pd.notna(width) and width != "" else XLEN
+    return count, width, row.get(f"{prefix}_{i}_type")
+
+
+def operand_layouts(row):
+    inputs = int(row["inputs"]) if pd.notna(row["inputs"]) else 0
+    outputs = int(row["outputs"]) if pd.notna(row["outputs"]) else 0
+    return [_operand_layout(row, "io", i) for i in range(1, inputs + 1)] + [
+        _operand_layout(row, "oo", i) for i in range(1, outputs + 1)
+    ]
+
+
+def is_packed(row):
+    """Whether any operand of the operation holds more than one element."""
+    return any(count > 1 for count, _, _ in operand_layouts(row))
+
+
+def lane_kernel(name):
+    match = LANE_SUFFIX_PATTERN.match(name)
+    kernel = KERNELS.get(match.group(1)) if match else None
+    if kernel is None:
+        raise PackedError(f"No lane kernel for packed operation {name}")
+    return kernel
+
+
+def lane_shape(row):
+    """(lanes, lane width) shared by all operands of a packed operation."""
+    layouts = operand_layouts(row)
+    if len(layouts) != 3:
+        raise PackedError(f"{row['name']}: only packed operations with two inputs and one output are supported")
+    if len({(count, width) for count, width, _ in layouts}) != 1:
+        raise PackedError(f"{row['name']}: operands with different lane layouts")
+    if any(operand_type not in INTEGER_TYPES for _, _, operand_type in layouts):
+        raise PackedError(f"{row['name']}: only integer lanes are supported")
+    count, width, _ = layouts[0]
+    if count * width != XLEN:
+        raise PackedError(f"{row['name']}: {count}x{width} bits do not fill a {XLEN}-bit register")
+    return count, width
+
+
+def saturate(value, ctype):
+    if ctype.signed:
+        low, high = -(1 << (ctype.width - 1)), (1 << (ctype.width - 1)) - 1
+    else:
+        low, high = 0, (1 << ctype.width) - 1
+    return Ternary(
+        Binary(">", value, Number(high, INT)),
+        Number(high, INT),
+        Ternary(Binary("<", value, Number(low, INT)), Number(low, INT), value),
+    )
+
+
+def lane_expression(operator, a, b):
+    if operator == "min":
+        return Ternary(Binary("<", a, b), a, b)
+    if operator == "max":
+        return Ternary(Binary(">", a, b), a, b)
+    return Binary(operator, a, b)
+
+
+def packed_behavior(row, register):
+    """Lane-wise behavior block of a packed operation.
+
+    register maps an operand field (rs1, rs2, rd) to the X expression
+    holding it. Every lane is sliced out of the source registers, computed
+    in the lane type and the results are concatenated, lane 0 in the low
+    bits, into the destination.
+    """
+    operator, signed, saturating = lane_kernel(row["name"])
+    lanes, width = lane_shape(row)
+    ctype = CType(signed, width)
+    result_type = CType(False, width)
+
+    statements = []
+    for lane in reversed(range(lanes)):
+        high, low = Number(lane * width + width - 1, INT), Number(lane * width, INT)
+        a, b = (Cast(ctype, Slice(register(field), high, low)) for field in ("rs1", "rs2"))
+        value = lane_expression(operator, a, b)
+        if saturating:
+            # Sums and differences of narrow lanes are exact in a 32-bit int
+            statements.append(Declare(INT, f"value_{lane}", value))
+            value = saturate(Name(f"value_{lane}"), ctype)
+        statements.append(Declare(result_type, f"lane_{lane}", Cast(result_type, value)))
+
+    packed = Name(f"lane_{lanes - 1}")
+    for lane in reversed(range(lanes - 1)):
+        packed = Binary("::", packed, Name(f"lane_{lane}"))
+    statements.append(Assign(register("rd"), "=", packed))
+    return Block(statements)
+
+
+def packed_behavior_code(row, register):
+    return emit_behavior(packed_behavior(row, register))
@@ -0,0 +1,115 @@
+import functools
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StageProfiler:
+    """Wall time, call count and peak traced memory per pipeline stage.
+
+    Stages may nest; the time of a stage includes its inner stages and its
+    peak covers them as well. Disabled, stage() costs one attribute check.
+    tracemalloc slows every allocation down, so peaks are only measured when
+    enabled with memory=True and the times of such a run are not comparable
+    to those of a run without it.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.stages = {}  # name -> {"calls", "seconds", "peak"}, peak None if not measured
+        self._peaks = []  # running peak of every open stage
+
+    def enable(self, memory=False):
+        self.enabled = True
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def disable(self):
+        self.enabled = False
+        self.memory = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        if not self.memory:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.record(name, 1, time.perf_counter() - start, None)
+            return
+
+        # The peak counter is shared, so fold it into the enclosing stage
+        # before resetting it for this one
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            self.record(name, 1, seconds, peak)
+
+    def record(self, name, calls, seconds, peak):
+        stats = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "peak": None})
+        stats["calls"] += calls
+        stats["seconds"] += seconds
+        if peak is not None:
+            stats["peak"] = peak if stats["peak"] is None else max(stats["peak"], peak)
+
+    def merge(self, stages):
+        # Stats returned by worker processes
+        for name, stats in stages.items():
+            self.record(name, stats["calls"], stats["seconds"], stats["peak"])
+
+    def reset(self):
+        self.stages = {}
+
+    def report(self):
+        lines = [f"{'stage':<32}{'calls':>8}{'total s':>10}{'per call ms':>13}{'peak MiB':>10}"]
+        for name, stats in sorted(
+            self.stages.items(), key=lambda item: item[1]["seconds"], reverse=True
+        ):
+            per_call = stats["seconds"] / stats["calls"] * 1000 if stats["calls"] else 0.0
+            peak = "-" if stats["peak"] is None else f"{stats['peak'] / 2**20:.1f}"
+            lines.append(
+                f"{name:<32}{stats['calls']:>8}{stats['seconds']:>10.3f}"
+                f"{per_call:>13.3f}{peak:>10}"
+            )
+        return "\n".join(lines)
+
+
+profiler = StageProfiler()
+
+
+def stage(name):
+    return profiler.stage(name)
+
+
+def profiled(name):
+    """Decorator timing every call of a function as stage name."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with profiler.stage(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
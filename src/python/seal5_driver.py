@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+
+def file_fingerprint(filepath):
+    filepath = Path(filepath)
+    if not filepath.is_file():
+        return "missing"
+    with open(filepath, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def fingerprint(values):
+    """Hash of a list of stage inputs; paths are hashed by their content."""
+    digest = hashlib.sha256()
+    for value in values:
+        if isinstance(value, Path):
+            value = f"{value.name}:{file_fingerprint(value)}"
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class StageState:
+    """Completed stages of a flow with the fingerprint they ran with."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.stages = {}
+        if os.path.exists(filepath):
+            with open(filepath, "r") as file:
+                self.stages = json.load(file)
+
+    def fingerprint(self, name):
+        return self.stages.get(name, {}).get("fingerprint")
+
+    def update(self, name, **fields):
+        self.stages[name] = fields
+        self.save()
+
+    def remove(self, names):
+        for name in names:
+            self.stages.pop(name, None)
+        self.save()
+
+    def save(self):
+        temporary_filepath = f"{self.filepath}.tmp"
+        with open(temporary_filepath, "w") as file:
+            json.dump(self.stages, file, indent=1, sort_keys=True)
+        # Atomic, an interrupted build never leaves a truncated state file behind
+        os.replace(temporary_filepath, self.filepath)
+
+
+class StagedFlow:
+    """Runs a sequence of stages and skips the ones whose inputs are unchanged.
+
+    Each stage depends on one earlier stage (the previous one by default) and
+    its fingerprint covers its own inputs and the fingerprint of that
+    dependency, so a change propagates to everything downstream. Running a
+    stage drops the state of all stages depending on it.
+    """
+
+    def __init__(self, state_filepath, force=False):
+        self.state = StageState(state_filepath)
+        self.force = force
+        self.stages = []  # (name, function, inputs, after)
+        self.executed = set()
+
+    def add(self, name, function, inputs=(), after=-1, enabled=True):
+        if not enabled:
+            return
+        if after == -1:
+            after = self.stages[-1][0] if self.stages else None
+        self.stages.append((name, function, list(inputs), after))
+
+    def fingerprints(self):
+        fingerprints = {}
+        for name, _, inputs, after in self.stages:
+            fingerprints[name] = fingerprint([fingerprints.get(after)] + inputs)
+        return fingerprints
+
+    def dependents(self, name):
+        names = {name}
+        for stage_name, _, _, after in self.stages:
+            if after in names:
+                names.add(stage_name)
+        names.discard(name)
+        return names
+
+    def plan(self):
+        """(name, up to date) of every stage in order."""
+        fingerprints = self.fingerprints()
+        plan = []
+        stale = set()
+        for name, _, _, after in self.stages:
+            up_to_date = (
+                not self.force
+                and after not in stale
+                and self.state.fingerprint(name) == fingerprints[name]
+            )
+            if not up_to_date:
+                stale.add(name)
+            plan.append((name, up_to_date))
+        return plan
+
+    def ran(self, name):
+        # Whether a stage was executed (not skipped) in this invocation
+        return name in self.executed
+
+    def run(self, dry_run=False):
+        fingerprints = self.fingerprints()
+        plan = self.plan()
+        for name, up_to_date in plan:
+            print(f"{name:<16}{'up to date' if up_to_date else 'run'}")
+        if dry_run or all(up_to_date for _, up_to_date in plan):
+            return
+
+        functions = {name: function for name, function, _, _ in self.stages}
+        for name, up_to_date in plan:
+            if up_to_date:
+                continue
+            print(f"Running stage {name}")
+            self.state.remove([name] + sorted(self.dependents(name)))
+            start = time.time()
+            functions[name]()
+            self.executed.add(name)
+            self.state.update(
+                name,
+                fingerprint=fingerprints[name],
+                seconds=round(time.time() - start, 1),
+                finished=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            )
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import re
+from pipeline_profile import profiled
+
+# Cached indices live next to the generated artifacts and are keyed by the
+# content hash of the .cc file, so a stale cache can never be picked up.
+CACHE_DIRECTORY = os.path.join(".cache", "trigger_index")
+INDEX_VERSION = 1
+
+OPERATION_PATTERN = re.compile(
+    rb"(?<!END_)OPERATION\((\w+)\)(.*?)END_OPERATION\(\1\)", re.DOTALL
+)
+
+# In-process memo: (filepath, mtime, size) -> TriggerIndex
+_loaded_indices = {}
+
+
+class TriggerEntry:
+    def __init__(self, name, body, start_offset, end_offset, start_line, end_line):
+        self.name = name
+        self.body = body
+        self.start_offset = start_offset  # byte offset of OPERATION(name)
+        self.end_offset = end_offset  # byte offset after END_OPERATION(name)
+        self.start_line = start_line  # 1-based line of OPERATION(name)
+        self.end_line = end_line  # 1-based line of END_OPERATION(name)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "body": self.body,
+            "start_offset": self.start_offset,
+            "end_offset": self.end_offset,
+            "start_line": self.start_line,
+            "end_line": self.end_line,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["name"],
+            data["body"],
+            data["start_offset"],
+            data["end_offset"],
+            data["start_line"],
+            data["end_line"],
+        )
+
+
+class TriggerIndex:
+    """Operation name -> trigger body table of one OSAL .cc file."""
+
+    def __init__(self, filepath, file_hash, entries):
+        self.filepath = filepath
+        self.file_hash = file_hash
+        self.entries = entries  # Dictionary of name -> TriggerEntry
+
+    def __contains__(self, operation):
+        return operation in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, operation, default=None):
+        entry = self.entries.get(operation)
+        return entry.body if entry is not None else default
+
+    def bodies(self, operations=None):
+        # Same shape as the dictionary returned by extract_trigger_code
+        if operations is None:
+            return {name: entry.body for name, entry in self.entries.items()}
+        return {
+            operation: self.entries[operation].body
+            for operation in operations
+            if operation in self.entries
+        }
+
+    @classmethod
+    def build(cls, filepath, content, file_hash):
+        # Single linear pass over the file: every OPERATION(x)...END_OPERATION(x)
+        # block is visited exactly once, line numbers are counted incrementally.
+        entries = {}
+        line = 1
+        position = 0
+        for match in OPERATION_PATTERN.finditer(content):
+            line += content.count(b"\n", position, match.start())
+            start_line = line
+            line += content.count(b"\n", match.start(), match.end())
+            position = match.end()
+
+            name = match.group(1).decode("ascii")
+            if name in entries:
+                # Keep the first definition, like the per-operation re.search did
+                continue
+            body = match.group(2).decode("utf-8", errors="replace").strip()
+            entries[name] = TriggerEntry(
+                name, body, match.start(), match.end(), start_line, line
+            )
+
+        return cls(filepath, file_hash, entries)
+
+    def to_dict(self):
+        return {
+            "version": INDEX_VERSION,
+            "filepath": self.filepath,
+            "file_hash": self.file_hash,
+            "entries": [entry.to_dict() for entry in self.entries.values()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        entries = {}
+        for entry_data in data["entries"]:
+            entry = TriggerEntry.from_dict(entry_data)
+            entries[entry.name] = entry
+        return cls(data["filepath"], data["file_hash"], entries)
+
+
+def _cache_filepath(filepath, file_hash, cache_directory):
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(cache_directory, f"{stem}-{file_hash[:16]}.json")
+
+
+def _prune_cache(cache_filepath):
+    # Only the index of the current content of a file is ever read again
+    directory, name = os.path.split(cache_filepath)
+    stem = name[: name.rindex("-")]
+    for entry in os.listdir(directory):
+        if entry != name and re.fullmatch(rf"{re.escape(stem)}-[0-9a-f]{{16}}\.json", entry):
+            try:
+                os.remove(os.path.join(directory, entry))
+            except OSError:
+                pass
+
+
+@profiled("load_trigger_index")
+def load_trigger_index(filepath, cache_directory=CACHE_DIRECTORY):
+    # Returns an empty index for missing files, extract_trigger_code callers
+    # already treat an unknown operation as "no trigger code".
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        print(f"Trigger file {filepath} not found")
+        return TriggerIndex(filepath, "", {})
+
+    memo_key = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+    if memo_key in _loaded_indices:
+        return _loaded_indices[memo_key]
+
+    with open(filepath, "rb") as file:
+        content = file.read()
+    file_hash = hashlib.sha256(content).hexdigest()
+
+    index = None
+    cache_filepath = None
+    if cache_directory:
+        cache_filepath = _cache_filepath(filepath, file_hash, cache_directory)
+        if os.path.exists(cache_filepath):
+            try:
+                with open(cache_filepath, "r") as file:
+                    data = json.load(file)
+                if (
+                    data.get("version") == INDEX_VERSION
+                    and data.get("file_hash") == file_hash
+                ):
+                    index = TriggerIndex.from_dict(data)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring broken trigger index cache {cache_filepath}: {e}")
+
+    if index is None:
+        index = TriggerIndex.build(filepath, content, file_hash)
+        if cache_filepath:
+            os.makedirs(cache_directory, exist_ok=True)
+            temp_filepath = f"{cache_filepath}.{os.getpid()}.tmp"
+            with open(temp_filepath, "w") as file:
+                json.dump(index.to_dict(), file)
+            os.replace(temp_filepath, cache_filepath)
+            _prune_cache(cache_filepath)
+
+    _loaded_indices[memo_key] = index
+    return index
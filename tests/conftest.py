@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The pipeline modules are scripts that import each other by module name
+sys.path.insert(0, os.path.join(ROOT, "src", "python"))
+sys.path.insert(0, os.path.join(ROOT, "results"))
+sys.path.insert(0, ROOT)
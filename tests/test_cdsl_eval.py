@@ -0,0 +1,191 @@
+import os
+
+import numpy as np
+import pytest
+
+from cdsl_eval import EvaluationError, evaluate_behavior, random_operands, static_type
+from cdsl_parser import (
+    INT,
+    Binary,
+    CType,
+    Name,
+    Number,
+    ParseError,
+    parse_behavior,
+    parse_expression,
+    parse_instruction_set,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE = os.path.join(ROOT, "src", "cdsl", "base.core_desc")
+
+VALUES = np.array([0, 1, 7, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFF], dtype=np.uint32)
+
+
+def run(text, **operands):
+    operands.setdefault("rd", np.zeros(len(next(iter(operands.values()))), dtype=np.uint32))
+    registers, written = evaluate_behavior(parse_behavior(text), operands)
+    return registers["rd"].tolist(), written.get("rd")
+
+
+def test_parse_expression_precedence():
+    assert parse_expression("a + b * 2") == Binary(
+        "+", Name("a"), Binary("*", Name("b"), Number(2, INT))
+    )
+    assert parse_expression("7'b0110011").ctype == CType(False, 7)
+    with pytest.raises(ParseError):
+        parse_expression("a + ")
+    with pytest.raises(ParseError):
+        parse_behavior("{ X[rd % RFS] = 1; } }")
+
+
+def test_parse_instruction_set():
+    with open(BASE) as file:
+        instructions = parse_instruction_set(file.read())
+    names = [instruction.name for instruction in instructions]
+    assert "OpenASIP_base_ADD" in names
+    assert all(instruction.behavior is not None for instruction in instructions)
+    add = instructions[names.index("OpenASIP_base_ADD")]
+    assert add.assembly == "{name(rd)}, {name(rs1)}, {name(rs2)}"
+    assert add.encoding.endswith("7'b0001011")
+
+
+def test_register_arithmetic_wraps():
+    a, b = np.meshgrid(VALUES, VALUES)
+    a, b = a.ravel(), b.ravel()
+    rd, written = run("{ X[rd % RFS] = X[rs1 % RFS] + X[rs2 % RFS]; }", rs1=a, rs2=b)
+    assert rd == ((a.astype(np.uint64) + b) & 0xFFFFFFFF).tolist()
+    assert written.all()
+    rd, _ = run("{ X[rd % RFS] = X[rs1 % RFS] * X[rs2 % RFS]; }", rs1=a, rs2=b)
+    assert rd == [(int(x) * int(y)) & 0xFFFFFFFF for x, y in zip(a, b)]
+
+
+def test_signed_declaration_and_compare():
+    text = """{
+        signed<32> a = X[rs1 % RFS];
+        if (a < 0) {
+            X[rd % RFS] = 1;
+        } else {
+            X[rd % RFS] = 2;
+        }
+    }"""
+    rd, written = run(text, rs1=VALUES)
+    assert rd == [2, 2, 2, 2, 1, 1]
+    assert written.all()
+    # X is unsigned, the same comparison without the declaration is false
+    rd, _ = run("{ if (X[rs1 % RFS] < 0) { X[rd % RFS] = 1; } }", rs1=VALUES)
+    assert rd == [0] * len(VALUES)
+
+
+def test_if_without_else_masks_writes():
+    rd, written = run(
+        "{ if (X[rs1 % RFS] == 7) { X[rd % RFS] = 3; } }",
+        rs1=VALUES,
+        rd=np.full(len(VALUES), 9, dtype=np.uint32),
+    )
+    assert rd == [9, 9, 3, 9, 9, 9]
+    assert written.tolist() == [False, False, True, False, False, False]
+
+
+def test_arithmetic_widens():
+    a, b = np.meshgrid(VALUES, VALUES)
+    a, b = a.ravel(), b.ravel()
+    pairs = list(zip(a.tolist(), b.tolist()))
+    # unsigned<32> + unsigned<32> is unsigned<33>, the carry survives the shift
+    rd, _ = run("{ X[rd % RFS] = (X[rs1 % RFS] + X[rs2 % RFS]) >> 1; }", rs1=a, rs2=b)
+    assert rd == [(x + y) >> 1 for x, y in pairs]
+    rd, _ = run("{ X[rd % RFS] = (X[rs1 % RFS] * X[rs2 % RFS]) >> 32; }", rs1=a, rs2=b)
+    assert rd == [(x * y) >> 32 for x, y in pairs]
+    # unsigned<32> - unsigned<32> is signed<34>
+    rd, _ = run("{ if (X[rs1 % RFS] - X[rs2 % RFS] < 0) { X[rd % RFS] = 1; } }", rs1=a, rs2=b)
+    assert rd == [int(x < y) for x, y in pairs]
+    # Wider than 64 bits
+    text = "{ X[rd % RFS] = ((unsigned<64>)(X[rs1 % RFS]) * X[rs2 % RFS] * X[rs2 % RFS]) >> 64; }"
+    assert run(text, rs1=a, rs2=b)[0] == [(x * y * y >> 64) & 0xFFFFFFFF for x, y in pairs]
+
+
+def test_assignment_truncates():
+    text = "{ unsigned<8> low = X[rs1 % RFS] + 1; X[rd % RFS] = low; }"
+    assert run(text, rs1=VALUES)[0] == [(int(x) + 1) & 0xFF for x in VALUES]
+    text = "{ signed<8> low = X[rs1 % RFS]; X[rd % RFS] = low; }"
+    assert run(text, rs1=np.array([0x7F, 0x80], dtype=np.uint32))[0] == [0x7F, 0xFFFFFF80]
+
+
+def test_shifts_are_not_masked():
+    a = np.full(5, 0x80000001, dtype=np.uint32)
+    amounts = np.array([1, 31, 32, 33, 0xFFFFFFFF], dtype=np.uint32)
+    rd, _ = run("{ X[rd % RFS] = X[rs1 % RFS] << X[rs2 % RFS]; }", rs1=a, rs2=amounts)
+    assert rd == [2, 0x80000000, 0, 0, 0]
+    rd, _ = run("{ X[rd % RFS] = X[rs1 % RFS] >> X[rs2 % RFS]; }", rs1=a, rs2=amounts)
+    assert rd == [0x40000000, 1, 0, 0, 0]
+    text = "{ signed<32> value = X[rs1 % RFS]; X[rd % RFS] = value >> X[rs2 % RFS]; }"
+    assert run(text, rs1=a, rs2=amounts)[0] == [0xC0000000] + [0xFFFFFFFF] * 4
+    # A negative amount shifts the other way
+    text = "{ signed<32> amount = X[rs2 % RFS]; X[rd % RFS] = X[rs1 % RFS] << amount; }"
+    assert run(text, rs1=a[:2], rs2=np.array([0xFFFFFFFF, 1], dtype=np.uint32))[0] == [0x40000000, 2]
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("a + a", CType(False, 33)),
+        ("a + s", CType(True, 34)),
+        ("a - a", CType(True, 34)),
+        ("a * s", CType(True, 64)),
+        ("a / s", CType(True, 33)),
+        ("s / a", CType(True, 32)),
+        ("a % b", CType(False, 8)),
+        ("s % b", CType(True, 9)),
+        ("a & s", CType(True, 33)),
+        ("a << 40", CType(False, 32)),
+        ("-a", CType(True, 33)),
+        ("~b", CType(False, 8)),
+        ("a < s", CType(False, 1)),
+        ("c ? a : s", CType(True, 33)),
+    ],
+)
+def test_static_types(text, expected):
+    types = {"a": CType(False, 32), "b": CType(False, 8), "c": CType(False, 1), "s": INT}
+    assert static_type(parse_expression(text), types.get) == expected
+
+
+def test_division_by_zero():
+    a = np.array([7, 0x80000000, 9], dtype=np.uint32)
+    b = np.array([0, 0xFFFFFFFF, 2], dtype=np.uint32)
+    text = "{ signed<32> a = X[rs1 % RFS]; signed<32> b = X[rs2 % RFS]; X[rd % RFS] = a / b; }"
+    assert run(text, rs1=a, rs2=b)[0] == [0xFFFFFFFF, 0x80000000, 4]
+    text = "{ X[rd % RFS] = X[rs1 % RFS] % X[rs2 % RFS]; }"
+    assert run(text, rs1=a, rs2=b)[0] == [7, 0x80000000, 1]
+
+
+def test_slice_and_concat():
+    value = np.array([0x12345678], dtype=np.uint32)
+    assert run("{ X[rd % RFS] = X[rs1 % RFS][15:8]; }", rs1=value)[0] == [0x56]
+    text = "{ X[rd % RFS] = X[rs1 % RFS][7:0] :: X[rs1 % RFS][15:8]; }"
+    assert run(text, rs1=value)[0] == [0x7856]
+
+
+def test_functions():
+    a = np.array([5, 0xFFFFFFFB], dtype=np.uint32)
+    b = np.array([3, 3], dtype=np.uint32)
+    text = "{ X[rd % RFS] = min(X[rs1 % RFS], X[rs2 % RFS]); }"
+    assert run(text, rs1=a, rs2=b)[0] == [3, 0xFFFFFFFB]
+    text = "{ X[rd % RFS] = remainder(X[rs1 % RFS], X[rs2 % RFS]); }"
+    assert run(text, rs1=a, rs2=b)[0] == [2, 1]
+
+
+def test_unsupported():
+    with pytest.raises(EvaluationError):
+        run("{ X[rd % RFS] = undeclared; }", rs1=VALUES)
+    with pytest.raises(EvaluationError):
+        run("{ X[rd % RFS] = foo(X[rs1 % RFS]); }", rs1=VALUES)
+    with pytest.raises(EvaluationError):
+        run("{ X[5] = 1; }", rs1=VALUES)
+
+
+def test_random_operands_corners():
+    operands = random_operands(200, fields=("rs1", "rs2"), seed=1)
+    pairs = set(zip(operands["rs1"][:100].tolist(), operands["rs2"][:100].tolist()))
+    assert (0xFFFFFFFF, 0x80000000) in pairs
+    assert (0, 0) in pairs
+    assert len(pairs) == 100
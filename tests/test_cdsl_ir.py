@@ -0,0 +1,113 @@
+import pytest
+
+import cdsl_ir
+from cdsl_eval import evaluate_behavior, random_operands
+from cdsl_ir import emit_behavior, equivalent, optimize, optimize_behavior
+from cdsl_parser import parse_behavior
+
+
+def statements(text):
+    return [line.strip() for line in text.strip().splitlines()]
+
+
+def test_forwards_single_use_temporary():
+    text = optimize_behavior(
+        "signed<32> shifted = X[rs1 % RFS] << 1;\n"
+        "X[rd % RFS] = shifted + X[rs2 % RFS];\n"
+    )
+    # The cast keeps the declared type of the temporary
+    assert statements(text) == ["X[rd % RFS] = (signed<32>)(X[rs1 % RFS] << 1) + X[rs2 % RFS];"]
+
+
+def test_folds_constants_and_dead_code():
+    text = optimize_behavior(
+        "unsigned<32> t = 0;\n"
+        "t = X[rs1 % RFS] + (BWIDTH(1) - 32);\n"
+        "signed<32> unused = X[rs2 % RFS];\n"
+        "X[rd % RFS] = t;\n"
+    )
+    assert statements(text) == ["X[rd % RFS] = X[rs1 % RFS];"]
+
+
+def test_constants_keep_their_width_where_it_counts():
+    text = optimize_behavior(
+        "unsigned<32> in2 = X[rs2 % RFS] % (4 * 8);\n"
+        "X[rd % RFS] = ((unsigned<32>)(X[rs1 % RFS] + in2) << 2) + (0 - 1);\n"
+    )
+    # The cast truncates the 33-bit sum before the shift
+    assert statements(text) == ["X[rd % RFS] = ((unsigned<32>)(X[rs1 % RFS] + X[rs2 % RFS] % 32) << 2) + -1;"]
+
+
+def test_constant_condition():
+    text = optimize_behavior(
+        "if (4 > 2) { X[rd % RFS] = X[rs1 % RFS]; } else { X[rd % RFS] = 0; }\n"
+    )
+    assert statements(text) == ["X[rd % RFS] = X[rs1 % RFS];"]
+
+
+def test_dead_register_store():
+    assert statements(optimize_behavior("X[rd % RFS] = 1;\nX[rd % RFS] = 2;\n")) == [
+        "X[rd % RFS] = 2;"
+    ]
+    # rs1 may name the same register as rd, so the first store is read
+    text = optimize_behavior("X[rd % RFS] = 1;\nX[rd % RFS] = X[rs1 % RFS];\n")
+    assert len(statements(text)) == 2
+
+
+def test_sizeof_folds():
+    text = optimize_behavior("X[rd % RFS] = X[rs1 % RFS] * sizeof(unsigned int);\n")
+    assert "sizeof" not in text
+    assert "4" in text
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "X[rd % RFS] = X[rs1 % RFS] +;\n",
+        "",
+    ],
+)
+def test_unsupported_is_unchanged(code):
+    assert optimize_behavior(code) == code
+
+
+def test_validation_is_opt_in(monkeypatch):
+    def compare(original, optimized):
+        raise AssertionError("validated without being asked to")
+
+    monkeypatch.setattr(cdsl_ir, "equivalent", compare)
+    assert statements(optimize_behavior("X[rd % RFS] = X[rs1 % RFS] + 0;\n")) == [
+        "X[rd % RFS] = X[rs1 % RFS];"
+    ]
+
+
+def test_validation_keeps_changed_meaning(monkeypatch):
+    code = "X[rd % RFS] = X[rs1 % RFS] - X[rs2 % RFS];\n"
+    swapped = parse_behavior("{ X[rd % RFS] = X[rs2 % RFS] - X[rs1 % RFS]; }")
+    monkeypatch.setattr(cdsl_ir, "optimize", lambda block: swapped)
+    assert optimize_behavior(code, validate=True) == code
+    assert optimize_behavior(code) != code
+    # Behaviors cdsl_eval cannot evaluate are not optimized either
+    code = "X[rd % RFS] = foo(X[rs1 % RFS]);\n"
+    assert optimize_behavior(code, validate=True) == code
+
+
+def test_optimized_is_equivalent():
+    original = parse_behavior(
+        "{ signed<32> a = X[rs1 % RFS]; signed<32> b = X[rs2 % RFS];\n"
+        "  signed<32> c = 0;\n"
+        "  if (a < b) { c = a; } else { c = b; }\n"
+        "  X[rd % RFS] = c + 0; }"
+    )
+    optimized = parse_behavior("{" + emit_behavior(optimize(original)) + "}")
+    assert equivalent(original, optimized)
+    operands = random_operands(1000, seed=3)
+    expected = evaluate_behavior(original, operands)[0]["rd"]
+    assert (evaluate_behavior(optimized, operands)[0]["rd"] == expected).all()
+
+
+def test_equivalent_detects_difference():
+    assert not equivalent(
+        parse_behavior("{ X[rd % RFS] = X[rs1 % RFS] - X[rs2 % RFS]; }"),
+        parse_behavior("{ X[rd % RFS] = X[rs2 % RFS] - X[rs1 % RFS]; }"),
+    )
@@ -0,0 +1,138 @@
+import pytest
+from encoding_allocator import (
+    FUNCT2_VALUES,
+    FUNCT3_VALUES,
+    FUNCT7_VALUES,
+    MAJOR_OPCODES,
+    EncodingSpace,
+    allocate_encodings,
+    load_opcodes,
+    parse_encoding,
+)
+
+CUSTOM_0 = MAJOR_OPCODES["custom-0"]
+SLOTS = FUNCT3_VALUES * FUNCT7_VALUES
+
+
+def test_two_source_operations_fill_from_the_start():
+    encodings = allocate_encodings([("ADD", 2, 1), ("SUB", 2, 1)], EncodingSpace(["custom-0"]))
+    assert encodings == {
+        "ADD": "7'b0000000 :: rs2[4:0] :: rs1[4:0] :: 3'b000 :: rd[4:0] :: 7'b0001011",
+        "SUB": "7'b0000001 :: rs2[4:0] :: rs1[4:0] :: 3'b000 :: rd[4:0] :: 7'b0001011",
+    }
+
+
+def test_r4_groups_fill_from_the_end():
+    space = EncodingSpace(["custom-0", "custom-1"])
+    encodings = allocate_encodings([("ADD", 2, 1), ("MAC", 3, 1), ("MSU", 3, 1)], space)
+    # The three-source operations are placed first, in the last custom opcode
+    assert encodings["MAC"] == (
+        "rs3[4:0] :: 2'b11 :: rs2[4:0] :: rs1[4:0] :: 3'b111 :: rd[4:0] :: 7'b0101011"
+    )
+    assert encodings["MSU"] == (
+        "rs3[4:0] :: 2'b10 :: rs2[4:0] :: rs1[4:0] :: 3'b111 :: rd[4:0] :: 7'b0101011"
+    )
+    assert parse_encoding(encodings["ADD"]) == (CUSTOM_0, 0, [0])
+    capacity = space.capacity()
+    assert capacity["custom-1"]["used"] == 2 * FUNCT7_VALUES // FUNCT2_VALUES
+    assert capacity["custom-1"]["free_r4"] == FUNCT3_VALUES * FUNCT2_VALUES - 2
+
+
+def test_encodings_are_unique():
+    operations = [(f"OP{i}", 2, 1) for i in range(300)] + [(f"R4_{i}", 3, 1) for i in range(10)]
+    encodings = allocate_encodings(operations, EncodingSpace(["custom-0", "custom-1"]))
+    slots = []
+    for encoding in encodings.values():
+        opcode, funct3, funct7_values = parse_encoding(encoding)
+        slots += [(opcode, funct3, funct7) for funct7 in funct7_values]
+    assert len(slots) == len(set(slots)) == 300 + 10 * FUNCT7_VALUES // FUNCT2_VALUES
+
+
+def test_overflow(capsys):
+    operations = [(f"OP{i}", 2, 1) for i in range(SLOTS + 1)]
+    encodings = allocate_encodings(operations, EncodingSpace(["custom-0"]))
+    assert encodings[f"OP{SLOTS - 1}"]
+    assert encodings[f"OP{SLOTS}"] == ""
+    assert f"no R slot left for OP{SLOTS}" in capsys.readouterr().out
+
+
+def test_r4_overflow_when_every_group_is_touched():
+    space = EncodingSpace(["custom-0"])
+    # One slot in every funct2 group leaves room for R ops but not for R4
+    for funct3 in range(FUNCT3_VALUES):
+        for funct2 in range(FUNCT2_VALUES):
+            space.reserve(
+                f"7'b{funct2:07b} :: rs2[4:0] :: rs1[4:0] :: 3'b{funct3:03b} :: rd[4:0] :: 7'b0001011"
+            )
+    encodings = allocate_encodings([("MAC", 3, 1), ("ADD", 2, 1)], space)
+    assert encodings["MAC"] == ""
+    assert parse_encoding(encodings["ADD"]) == (CUSTOM_0, 0, [FUNCT2_VALUES])
+
+
+def test_unsupported_shape(capsys):
+    assert allocate_encodings([("SPLIT", 1, 2)], EncodingSpace(["custom-0"])) == {"SPLIT": ""}
+    assert "Unsupported number of inputs and outputs for SPLIT" in capsys.readouterr().out
+
+
+def test_standard_opcode_only_takes_free_slots():
+    space = EncodingSpace(["OP"])
+    opcode, funct3, funct7_values = parse_encoding(space.allocate_r("ADD"))
+    assert opcode == MAJOR_OPCODES["OP"]
+    # funct7 0 and 1 are RV32I and RV32M under every funct3
+    assert funct7_values[0] not in (0, 1)
+    assert space.reserve("7'b0000000 :: rs2[4:0] :: rs1[4:0] :: 3'b000 :: rd[4:0] :: 7'b0110011") == [
+        "RV32 base instruction"
+    ]
+
+
+def test_reserve_reports_collisions():
+    space = EncodingSpace(["custom-0"])
+    encoding = space.allocate_r("ADD")
+    assert space.reserve(encoding, "OTHER") == ["ADD"]
+    assert space.owners[(CUSTOM_0, 0, 0)] == "ADD"
+
+
+def test_unknown_opcode_is_ignored(capsys):
+    space = EncodingSpace(["custom-0", "nonsense"])
+    assert [name for name, _ in space.opcodes] == ["custom-0"]
+    assert "Ignoring unknown opcode nonsense" in capsys.readouterr().out
+
+
+def test_load_opcodes(tmp_path):
+    config = tmp_path / "filter.yml"
+    config.write_text("filter:\n  opcodes:\n    keep:\n      - custom-1\n      - 0b00010\n")
+    assert load_opcodes(str(config)) == ["custom-1", 0b00010]
+    assert load_opcodes(str(tmp_path / "missing.yml")) == ["custom-0", "custom-1", "custom-2", "custom-3"]
+    # 0b00010 is custom-0, bits [6:2] of 0001011
+    space = EncodingSpace(load_opcodes(str(config)))
+    assert [value for _, value in space.opcodes] == [MAJOR_OPCODES["custom-1"], CUSTOM_0]
+
+
+def test_reserve_file(tmp_path, capsys):
+    core_desc = tmp_path / "old.core_desc"
+    core_desc.write_text(
+        "InstructionSet old {\n"
+        "    instructions {\n"
+        "        ADD {\n"
+        "            encoding: 7'b0000000 :: rs2[4:0] :: rs1[4:0] :: 3'b000 :: rd[4:0] :: 7'b0001011;\n"
+        "        }\n"
+        "        SUB {\n"
+        "            encoding: 7'b0000000 :: rs2[4:0] :: rs1[4:0] :: 3'b000 :: rd[4:0] :: 7'b0001011;\n"
+        "        }\n"
+        "    }\n"
+        "}\n"
+    )
+    space = EncodingSpace(["custom-0"])
+    space.reserve_file(str(core_desc))
+    assert "SUB in" in capsys.readouterr().out
+    assert space.owners[(CUSTOM_0, 0, 0)] == "ADD"
+    # Newly generated operations go around the reserved slot
+    assert parse_encoding(space.allocate_r("MUL")) == (CUSTOM_0, 0, [1])
+
+
+@pytest.mark.parametrize("shape", ["R", "R1", "RS"])
+def test_parse_encoding_round_trip(shape):
+    space = EncodingSpace(["custom-2"])
+    space.allocate_r("FIRST")
+    encoding = space.allocate_r("SECOND", shape)
+    assert parse_encoding(encoding) == (MAJOR_OPCODES["custom-2"], 0, [1])
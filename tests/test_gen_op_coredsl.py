@@ -0,0 +1,149 @@
+import pandas as pd
+import pytest
+import gen_op_coredsl
+from gen_op_coredsl import GenerationContext, generate_instruction_set
+from generation_manifest import GenerationManifest
+
+TRIGGER_FILE = """OPERATION(ADD)
+TRIGGER
+    IO(3) = UINT(1) + UINT(2);
+    return true;
+END_TRIGGER;
+END_OPERATION(ADD)
+
+OPERATION(SUB)
+TRIGGER
+    IO(3) = UINT(1) - UINT(2);
+    return true;
+END_TRIGGER;
+END_OPERATION(SUB)
+"""
+
+
+def operation_table():
+    return pd.DataFrame(
+        [
+            {"name": "ADD", "description": "Add", "inputs": 2, "outputs": 1, "trigger_semantics": None},
+            {"name": "SUB", "description": "Subtract", "inputs": 2, "outputs": 1, "trigger_semantics": None},
+        ]
+    )
+
+
+@pytest.fixture
+def trigger_file(tmp_path):
+    filepath = tmp_path / "base.cc"
+    filepath.write_text(TRIGGER_FILE)
+    return str(filepath)
+
+
+def test_context_lookups(trigger_file):
+    context = GenerationContext(operation_table(), "base", trigger_filepath=trigger_file)
+    assert context.all_operations == ["ADD", "SUB"]
+    assert context.operation_names == {"ADD", "SUB"}
+    assert context.single_exec_operations == {"ADD", "SUB"}
+    assert context.rows["SUB"]["description"] == "Subtract"
+    assert "ADD" in context.trigger_index
+
+
+def test_table_is_read_once(trigger_file, tmp_path, monkeypatch):
+    reads = []
+
+    def load_operation_table(filepath):
+        reads.append(filepath)
+        return operation_table()
+
+    monkeypatch.setattr(gen_op_coredsl, "load_operation_table", load_operation_table)
+    output_directory = tmp_path / "cdsl"
+    generate_instruction_set(
+        "Operations/base.parquet",
+        str(output_directory),
+        context=GenerationContext.from_file("Operations/base.parquet", trigger_filepath=trigger_file),
+    )
+    assert reads == ["Operations/base.parquet"]
+    content = (output_directory / "base.core_desc").read_text()
+    assert "OpenASIP_base_ADD {" in content
+    assert "OpenASIP_base_SUB {" in content
+    assert content.count("encoding:") == 2
+    assert "X[rd % RFS] = X[rs1 % RFS] + X[rs2 % RFS];" in content
+
+
+def test_incremental_generation(trigger_file, tmp_path, capsys):
+    output_directory = str(tmp_path / "cdsl")
+    context = GenerationContext(operation_table(), "base", trigger_filepath=trigger_file)
+    first = generate_instruction_set(None, output_directory, context=context)
+    output_filepath = tmp_path / "cdsl" / "base.core_desc"
+    content = output_filepath.read_text()
+    assert first["changed"]
+
+    second = generate_instruction_set(None, output_directory, context=context)
+    assert not second["changed"]
+    assert output_filepath.read_text() == content
+
+    # Only the operation whose trigger body changed is translated again
+    (tmp_path / "base.cc").write_text(TRIGGER_FILE.replace("UINT(1) - UINT(2)", "UINT(2) - UINT(1)"))
+    context = GenerationContext(operation_table(), "base", trigger_filepath=trigger_file)
+    capsys.readouterr()
+    third = generate_instruction_set(None, output_directory, context=context)
+    assert third["changed"]
+    assert "Reused 1 cached operations, regenerated 1" in capsys.readouterr().out
+    assert "X[rd % RFS] = X[rs2 % RFS] - X[rs1 % RFS];" in output_filepath.read_text()
+    manifest = GenerationManifest.for_output(str(output_filepath))
+    assert set(manifest.operations) == {"ADD", "SUB"}
+
+
+def test_force_regenerate(trigger_file, tmp_path, capsys):
+    output_directory = str(tmp_path / "cdsl")
+    context = GenerationContext(operation_table(), "base", trigger_filepath=trigger_file)
+    generate_instruction_set(None, output_directory, context=context)
+    capsys.readouterr()
+    generate_instruction_set(None, output_directory, context=context, incremental=False)
+    out = capsys.readouterr().out
+    assert "Reusing cached code" not in out
+    assert "Reused 0 cached operations, regenerated 2" in out
+    assert "is unchanged, leaving it untouched" in out
+
+
+def test_sharded_output(trigger_file, tmp_path):
+    output_directory = str(tmp_path / "cdsl")
+    context = GenerationContext(operation_table(), "base", trigger_filepath=trigger_file)
+    monolithic = generate_instruction_set(None, output_directory, context=context)
+    sharded = generate_instruction_set(None, output_directory, context=context, shard_by="operation")
+
+    shard_directory = tmp_path / "cdsl" / "base_shards"
+    assert sorted(sharded["shards"]) == [
+        "base_add.core_desc",
+        "base_common.core_desc",
+        "base_sub.core_desc",
+        "base_top.core_desc",
+    ]
+    top = (shard_directory / "base_top.core_desc").read_text()
+    assert 'import "base_add.core_desc"' in top
+    assert "InstructionSet OpenASIP_base extends OpenASIP_base_add, OpenASIP_base_sub {" in top
+    add = (shard_directory / "base_add.core_desc").read_text()
+    assert "InstructionSet OpenASIP_base_add extends OpenASIP_base_common {" in add
+    assert "OpenASIP_base_SUB" not in add
+
+    # Encodings are allocated over the whole opset, as in the single file
+    single = (tmp_path / "cdsl" / "base.core_desc").read_text()
+    for name in ("add", "sub"):
+        content = (shard_directory / f"base_{name}.core_desc").read_text()
+        encoding = content[content.index("encoding:") : content.index(";", content.index("encoding:"))]
+        assert encoding in single
+    assert monolithic["generated"] == sharded["generated"]
+
+
+def test_stale_shards_are_removed(trigger_file, tmp_path):
+    output_directory = str(tmp_path / "cdsl")
+    context = GenerationContext(operation_table(), "base", trigger_filepath=trigger_file)
+    generate_instruction_set(None, output_directory, context=context, shard_by="operation")
+    result = generate_instruction_set(None, output_directory, context=context, shard_by="shape")
+    assert result["changed"]
+    assert sorted(p.name for p in (tmp_path / "cdsl" / "base_shards").iterdir()) == [
+        "base_common.core_desc",
+        "base_r.core_desc",
+        "base_top.core_desc",
+    ]
+    result = generate_instruction_set(None, output_directory, context=context, shard_by="shape")
+    assert not result["changed"]
+    with pytest.raises(ValueError):
+        generate_instruction_set(None, output_directory, context=context, shard_by="size")
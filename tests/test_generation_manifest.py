@@ -0,0 +1,90 @@
+import pandas as pd
+from generation_manifest import GenerationManifest, operation_hash
+
+FLAGS = {"remove_RFS": False, "single_exec_operations": False}
+
+
+def row(name, semantics=None, **fields):
+    return pd.Series({"name": name, "inputs": 2, "outputs": 1, "trigger_semantics": semantics, **fields})
+
+
+ROWS = {
+    "ADD": row("ADD"),
+    "SHL": row("SHL"),
+    "SHLADD": row("SHLADD", "EXEC_OPERATION(shl, IO(1), IO(2), IO(3));\nEXEC_OPERATION(add, IO(3), IO(1), IO(3));"),
+}
+TRIGGERS = {"ADD": "IO(3) = UINT(1) + UINT(2);", "SHL": "IO(3) = UINT(1) << UINT(2);"}
+
+
+def key(name, rows=ROWS, triggers=TRIGGERS, flags=FLAGS):
+    return operation_hash(rows[name], triggers, flags)
+
+
+def test_hash_is_stable():
+    assert key("ADD") == key("ADD")
+    assert key("ADD") != key("SHL")
+
+
+def test_hash_covers_the_row():
+    rows = dict(ROWS, ADD=row("ADD", io_1_element_width=16))
+    assert key("ADD", rows=rows) != key("ADD")
+    # Missing values are not part of the row
+    rows = dict(ROWS, ADD=row("ADD", description=None))
+    assert key("ADD", rows=rows) == key("ADD")
+
+
+def test_hash_covers_trigger_and_flags():
+    triggers = dict(TRIGGERS, ADD="IO(3) = UINT(2) + UINT(1);")
+    assert key("ADD", triggers=triggers) != key("ADD")
+    assert key("SHL", triggers=triggers) == key("SHL")
+    assert key("ADD", flags=dict(FLAGS, remove_RFS=True)) != key("ADD")
+
+
+def test_hash_covers_executed_operations():
+    triggers = dict(TRIGGERS, SHL="IO(3) = UINT(1) << (UINT(2) & 31);")
+    assert key("SHLADD", triggers=triggers) != key("SHLADD")
+    triggers = dict(TRIGGERS, MUL="IO(3) = UINT(1) * UINT(2);")
+    assert key("SHLADD", triggers=triggers) == key("SHLADD")
+
+
+def test_hash_follows_nested_composites():
+    rows = dict(ROWS, OUTER=row("OUTER", "EXEC_OPERATION(shladd, IO(1), IO(2), IO(3));"))
+    outer = operation_hash(rows["OUTER"], TRIGGERS, FLAGS, rows)
+    triggers = dict(TRIGGERS, ADD="IO(3) = UINT(2) + UINT(1);")
+    assert operation_hash(rows["OUTER"], triggers, FLAGS, rows) != outer
+    # Without the table only the direct callees are covered
+    assert operation_hash(rows["OUTER"], triggers, FLAGS) == operation_hash(
+        rows["OUTER"], TRIGGERS, FLAGS
+    )
+
+
+def test_lookup_and_store(tmp_path):
+    output_filepath = str(tmp_path / "base.core_desc")
+    manifest = GenerationManifest.for_output(output_filepath)
+    assert manifest.lookup("ADD", key("ADD")) == (False, None)
+    manifest.store("ADD", key("ADD"), "X[rd] = X[rs1] + X[rs2];")
+    manifest.store("SHL", key("SHL"), None)
+    manifest.save()
+
+    manifest = GenerationManifest.for_output(output_filepath)
+    assert manifest.lookup("ADD", key("ADD")) == (True, "X[rd] = X[rs1] + X[rs2];")
+    # A cached skip is found as well, with no behavior
+    assert manifest.lookup("SHL", key("SHL")) == (True, None)
+    triggers = dict(TRIGGERS, ADD="IO(3) = UINT(2) + UINT(1);")
+    assert manifest.lookup("ADD", key("ADD", triggers=triggers)) == (False, None)
+    assert (manifest.hits, manifest.misses) == (2, 1)
+
+
+def test_prune(tmp_path):
+    manifest = GenerationManifest(str(tmp_path / "base.core_desc.manifest.json"))
+    manifest.store("ADD", key("ADD"), "")
+    manifest.store("SHL", key("SHL"), "")
+    manifest.prune({"ADD"})
+    assert list(manifest.operations) == ["ADD"]
+
+
+def test_broken_manifest_is_ignored(tmp_path, capsys):
+    (tmp_path / "base.core_desc.manifest.json").write_text("{")
+    manifest = GenerationManifest.for_output(str(tmp_path / "base.core_desc"))
+    assert manifest.operations == {}
+    assert "Ignoring broken manifest" in capsys.readouterr().out
@@ -0,0 +1,131 @@
+import argparse
+import re
+
+import pandas as pd
+from main import generate_all_opsets, generate_opset
+from operation_store import save_operation_table
+from pipeline_profile import profiler
+
+TRIGGER_FILE = """OPERATION({name})
+TRIGGER
+    IO(3) = UINT(1) {op} UINT(2);
+    return true;
+END_TRIGGER;
+END_OPERATION({name})
+"""
+
+OPSETS = {"arith": [("ADD2", "+"), ("SUB2", "-")], "logic": [("AND2", "&")]}
+
+
+def write_opsets(tmp_path, **options):
+    operations = tmp_path / "Operations"
+    opset = tmp_path / "opset"
+    operations.mkdir()
+    opset.mkdir()
+    tables = {}
+    for filename, rows in OPSETS.items():
+        tables[filename] = pd.DataFrame(
+            [
+                {"name": name, "description": name, "inputs": 2, "outputs": 1, "trigger_semantics": None}
+                for name, _ in rows
+            ]
+        )
+        save_operation_table(tables[filename], str(operations), filename)
+        (opset / f"{filename}.cc").write_text(
+            "".join(TRIGGER_FILE.format(name=name, op=op) for name, op in rows)
+        )
+    args = argparse.Namespace(
+        output_directory=str(operations),
+        directory=str(opset),
+        single_exec_operations=False,
+        remove_RFS=False,
+        store_format="parquet",
+        force_regenerate=False,
+        select_from_results=None,
+        encoding_budget=None,
+        jobs=2,
+        profile=False,
+        profile_memory=False,
+        shard_by=None,
+        no_optimize=False,
+        post_increment=False,
+    )
+    vars(args).update(options)
+    return args, tables
+
+
+def test_generate_all_opsets(tmp_path, capsys):
+    args, tables = write_opsets(tmp_path)
+    output_directory = tmp_path / "cdsl"
+    summaries = generate_all_opsets(tables, args, str(output_directory))
+
+    assert [summary["filename"] for summary in summaries] == ["arith", "logic"]
+    assert summaries[0]["generated"] == ["ADD2", "SUB2"]
+    assert summaries[1]["generated"] == ["AND2"]
+    assert all(summary["error"] is None for summary in summaries)
+    assert "X[rd % RFS] = X[rs1 % RFS] & X[rs2 % RFS];" in (
+        output_directory / "logic.core_desc"
+    ).read_text()
+
+    out = capsys.readouterr().out
+    # Worker logs come back in opset order, followed by the summary
+    assert out.index("operation ADD2") < out.index("operation AND2") < out.index("Summary:")
+    assert out.rstrip().splitlines()[-1].split() == ["total", "3", "0"]
+
+
+def test_profile_guided_selection(tmp_path):
+    results = tmp_path / "results"
+    (results / "model").mkdir(parents=True)
+    pd.DataFrame(
+        {
+            "Sequence": ["openasip_arith_sub2", "openasip_arith_add2", "addi"],
+            "Count": [10, 0, 90],
+            "Probability": [0.1, 0.0, 0.9],
+        }
+    ).to_csv(results / "model" / "analyse_instructions_seq1.csv", index=False)
+    args, tables = write_opsets(tmp_path, select_from_results=str(results))
+    summaries = generate_all_opsets(tables, args, str(tmp_path / "cdsl"))
+    assert summaries[0]["generated"] == ["SUB2"]
+    assert summaries[0]["skipped"] == ["ADD2"]
+    assert (tmp_path / "Operations" / "arith_ranking.csv").exists()
+
+
+def test_failing_opset_is_reported(tmp_path):
+    summary = generate_opset(
+        (str(tmp_path / "Operations" / "missing.parquet"), "missing.cc", str(tmp_path / "cdsl"), False, False, True, None, False, True, False)
+    )
+    assert summary["filename"] == "missing"
+    assert summary["error"]
+    assert "Error generating missing" in summary["log"]
+
+
+def test_profile_merges_worker_stages(tmp_path):
+    args, tables = write_opsets(tmp_path, profile=True)
+    profiler.reset()
+    profiler.enable()
+    try:
+        generate_all_opsets(tables, args, str(tmp_path / "cdsl"))
+        # Built in the workers, allocated in the parent
+        assert profiler.stages["build_context"]["calls"] == 2
+        assert profiler.stages["allocate_encodings"]["calls"] == 2
+    finally:
+        profiler.disable()
+        profiler.reset()
+
+
+def encodings(filepath):
+    return re.findall(r"encoding: ([^;]+);", filepath.read_text())
+
+
+def test_opsets_share_the_encoding_space(tmp_path):
+    args, tables = write_opsets(tmp_path)
+    output_directory = tmp_path / "cdsl"
+    generate_all_opsets(tables, args, str(output_directory))
+    arith = encodings(output_directory / "arith.core_desc")
+    logic = encodings(output_directory / "logic.core_desc")
+    assert len(set(arith + logic)) == 3
+
+    # Regenerating one opset keeps the slots of the other
+    generate_all_opsets({"logic": tables["logic"]}, args, str(output_directory))
+    assert encodings(output_directory / "arith.core_desc") == arith
+    assert not set(encodings(output_directory / "logic.core_desc")) & set(arith)
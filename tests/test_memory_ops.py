@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cdsl_eval import Memory, evaluate_behavior, initial_bytes, random_operands
+from cdsl_parser import Binary, Index, Name, parse_instruction_set
+from encoding_allocator import allocate_encodings
+from gen_op_coredsl import GenerationContext, generate_instruction_set
+from memory_ops import PostIncrementError, address_operand, post_increment_behavior, post_increment_row
+from osal_rewrite import RewriteError, rewrite_trigger_code
+
+MASK = np.uint64(0xFFFFFFFF)
+
+LOADS = {
+    "LDW": "MEMORY.readLE(UINT(1), 4, data);\n    IO(2) = data;",
+    "LDH": "MEMORY.readLE(UINT(1), 2, data);\n    IO(2) = SIGN_EXTEND(data, MAU_SIZE*2);",
+    "LDQU": "MEMORY.readLE(UINT(1), 1, data);\n    IO(2) = ZERO_EXTEND(data, MAU_SIZE);",
+}
+STORES = {
+    "STW": "MEMORY.writeLE(UINT(1), 4, UINT(2));",
+    "STH": "MEMORY.writeLE(UINT(1), 2, UINT(2));",
+}
+
+
+def trigger(name, body):
+    return f"OPERATION({name})\nTRIGGER\n    ULongWord data;\n    {body}\n    return true;\nEND_TRIGGER;\nEND_OPERATION({name})\n\n"
+
+
+def memory_row(name, inputs, outputs, reads=False, writes=False, semantics=None):
+    return {
+        "name": name,
+        "description": f"{name} test.",
+        "inputs": inputs,
+        "outputs": outputs,
+        "reads_memory": reads,
+        "writes_memory": writes,
+        "trigger_semantics": semantics,
+        "io_1_mem_address": "yes",
+    }
+
+
+@pytest.fixture(scope="module")
+def instructions(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("mem")
+    rows = [memory_row(name, 1, 1, reads=True) for name in LOADS]
+    rows += [memory_row(name, 2, 0, writes=True) for name in STORES]
+    rows.append(dict(memory_row("ADD", 2, 1), io_1_mem_address=None))
+    rows.append(
+        memory_row(
+            "LDADD", 2, 1, reads=True,
+            semantics="SimValue t;\nEXEC_OPERATION(ldw, IO(1), t);\nEXEC_OPERATION(add, t, IO(2), IO(3));",
+        )
+    )
+    rows.append(
+        memory_row(
+            "ADDST", 2, 0, writes=True,
+            semantics="SimValue t;\nEXEC_OPERATION(add, IO(2), IO(2), t);\nEXEC_OPERATION(stw, IO(1), t);",
+        )
+    )
+    cc = "".join(trigger(name, body) for name, body in {**LOADS, **STORES}.items())
+    cc += "OPERATION(ADD)\nTRIGGER\n    IO(3) = UINT(1) + UINT(2);\n    return true;\nEND_TRIGGER;\nEND_OPERATION(ADD)\n"
+    (directory / "mem.cc").write_text(cc)
+    context = GenerationContext(pd.DataFrame(rows), "mem", trigger_filepath=str(directory / "mem.cc"))
+    result = generate_instruction_set(None, str(directory / "cdsl"), context=context, post_increment=True)
+    assert result["skipped"] == []
+    text = (directory / "cdsl" / "mem.core_desc").read_text()
+    return {instruction.name.split("_", 2)[2]: instruction for instruction in parse_instruction_set(text)}
+
+
+def loaded(addresses, count):
+    value = np.zeros(len(addresses), dtype=np.uint64)
+    for offset in range(count):
+        value |= initial_bytes((addresses + np.uint64(offset)) & MASK) << np.uint64(8 * offset)
+    return value
+
+
+def sign_extend(value, width):
+    value = value.astype(np.int64)
+    return ((value ^ (1 << (width - 1))) - (1 << (width - 1))) & 0xFFFFFFFF
+
+
+def test_rewrite_rules():
+    assert rewrite_trigger_code("MEMORY.readLE(UINT(1), 4, data);", inputs=1) == (
+        "data = MEM[X[rs1 % RFS] + 3:X[rs1 % RFS]];"
+    )
+    assert rewrite_trigger_code("MEMORY.readLE(UINT(1), 1, data);", inputs=1) == "data = MEM[X[rs1 % RFS]];"
+    assert rewrite_trigger_code("MEMORY.writeLE(UINT(1) + 4, 2, UINT(2));", inputs=2) == (
+        "MEM[(X[rs1 % RFS] + 4) + 1:(X[rs1 % RFS] + 4)] = (unsigned<16>)(X[rs2 % RFS]);"
+    )
+    assert rewrite_trigger_code("IO(2) = SIGN_EXTEND(data, MAU_SIZE*2);", inputs=1) == (
+        "X[rd % RFS] = (signed<32>)((signed<16>)(data));"
+    )
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "MEMORY.read(UINT(1), 4, data);",
+        "MEMORY.readBE(UINT(1), 4, data);",
+        "MEMORY.write(UINT(1), 2, UINT(2));",
+        "MEMORY.writeBE(UINT(1), 2, UINT(2));",
+    ],
+)
+def test_byte_order_must_be_little_endian(code):
+    with pytest.raises(RewriteError, match="readLE"):
+        rewrite_trigger_code(code, inputs=2)
+
+
+@pytest.mark.parametrize("suffix", ["", "_PI"])
+def test_loads(instructions, suffix):
+    operands = random_operands(3000, seed=3)
+    addresses = operands["rs1"].astype(np.uint64)
+    expected = {
+        "LDW": loaded(addresses, 4),
+        "LDH": sign_extend(loaded(addresses, 2), 16),
+        "LDQU": loaded(addresses, 1),
+        "LDADD": (loaded(addresses, 4) + operands["rs2"].astype(np.uint64)) & MASK,
+    }
+    widths = {"LDW": 4, "LDH": 2, "LDQU": 1, "LDADD": 4}
+    for name, value in expected.items():
+        registers, _ = evaluate_behavior(instructions[name + suffix].behavior, operands)
+        assert (registers["rd"].astype(np.uint64) == value).all(), name
+        if suffix:
+            assert (registers["rs1"].astype(np.uint64) == (addresses + np.uint64(widths[name])) & MASK).all()
+
+
+@pytest.mark.parametrize("suffix", ["", "_PI"])
+def test_stores(instructions, suffix):
+    operands = random_operands(3000, seed=4)
+    addresses = operands["rs1"].astype(np.uint64)
+    values = operands["rs2"].astype(np.uint64)
+    for name, count, value in (("STW", 4, values), ("STH", 2, values), ("ADDST", 4, values * np.uint64(2))):
+        memory = Memory()
+        registers, written = evaluate_behavior(instructions[name + suffix].behavior, operands, memory)
+        assert (memory.load(addresses, count) == value & np.uint64((1 << (8 * count)) - 1)).all()
+        # The byte after the access is untouched
+        after = (addresses + np.uint64(count)) & MASK
+        assert (memory.load(after, 1) == initial_bytes(after)).all()
+        assert "rd" not in written
+        if suffix:
+            assert (registers["rs1"].astype(np.uint64) == after).all()
+
+
+def test_encodings_leave_unused_fields_zero(instructions):
+    assert "5'b00000 :: rs1[4:0]" in instructions["LDW"].encoding
+    assert instructions["STW"].encoding.split(" :: ")[-2] == "5'b00000"
+    assert len(allocate_encodings([("LD", 1, 1), ("ST", 2, 0), ("ADD", 2, 1)])) == 3
+
+
+def test_post_increment_errors():
+    address = Index(Name("X"), Binary("%", Name("rs1"), Name("RFS")))
+    with pytest.raises(PostIncrementError, match="no memory access"):
+        post_increment_behavior("X[rd % RFS] = X[rs1 % RFS];", address)
+    with pytest.raises(PostIncrementError, match="offset"):
+        post_increment_behavior("X[rd % RFS] = MEM[X[rs2 % RFS] + 3:X[rs2 % RFS]];", address)
+    with pytest.raises(PostIncrementError, match="widths"):
+        post_increment_behavior(
+            "MEM[X[rs1 % RFS]] = (unsigned<8>)(1);\n"
+            "X[rd % RFS] = MEM[X[rs1 % RFS] + 3:X[rs1 % RFS]];",
+            address,
+        )
+
+
+def test_post_increment_row():
+    row = pd.Series(memory_row("LDW", 1, 1, reads=True))
+    assert address_operand(row) == 1
+    assert address_operand(pd.Series(memory_row("ADD", 2, 1))) is None
+    variant = post_increment_row(row)
+    assert variant["name"] == "LDW_PI"
+    note = "The address register is incremented past the accessed data."
+    assert variant["description"] == f"LDW test.\n{note}"
+    row["description"] = "Load word"
+    assert post_increment_row(row)["description"] == f"Load word.\n{note}"
+    row["description"] = None
+    assert post_increment_row(row)["description"] == note
+    assert row["name"] == "LDW"
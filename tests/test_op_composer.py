@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cdsl_eval import evaluate_behavior, random_operands
+from cdsl_parser import parse_behavior
+from gen_op_coredsl import GenerationContext, generate_instruction_set, transform_trigger_code
+from op_composer import ComposeError, Composer, exec_operations, parse_semantics
+
+TRIGGERS = {
+    "ADD": "TRIGGER\n    IO(3) = UINT(1) + UINT(2);\n    return true;\nEND_TRIGGER;",
+    "SHL": "TRIGGER\n    IO(3) = UINT(1) << 2;\n    return true;\nEND_TRIGGER;",
+    "MUL": "TRIGGER\n    IO(3) = UINT(1) * UINT(2);\n    return true;\nEND_TRIGGER;",
+    "EARLY": (
+        "TRIGGER\n    if (UINT(2) == 0) {\n        IO(3) = 0;\n        return true;\n    }\n"
+        "    IO(3) = UINT(1);\n    return true;\nEND_TRIGGER;"
+    ),
+    # Reads its own result
+    "TWICE": "TRIGGER\n    IO(3) = UINT(1);\n    IO(3) = IO(3) + UINT(2);\n    return true;\nEND_TRIGGER;",
+}
+
+COMPOSITES = {
+    "MAC": (3, "SimValue t1;\nEXEC_OPERATION(mul, IO(2), IO(3), t1);\nEXEC_OPERATION(add, t1, IO(1), IO(4));"),
+    "ADD3": (3, "SimValue t;\nEXEC_OPERATION(add, IO(1), IO(2), t);\nEXEC_OPERATION(add, t, IO(3), IO(4));"),
+    # A composite of a composite, the intermediate t is used twice
+    "MACSHL": (
+        3,
+        "SimValue t, u;\nEXEC_OPERATION(mac, IO(1), IO(2), IO(3), t);\n"
+        "EXEC_OPERATION(shl, t, 0, u);\nEXEC_OPERATION(add, u, t, IO(4));",
+    ),
+    "ADDTWICE": (3, "SimValue t;\nEXEC_OPERATION(twice, IO(1), IO(2), t);\nEXEC_OPERATION(add, t, IO(3), IO(4));"),
+    "CYCLE": (2, "EXEC_OPERATION(cycle, IO(1), IO(2), IO(3));"),
+    "MISSING": (2, "EXEC_OPERATION(nope, IO(1), IO(2), IO(3));"),
+    "USESEARLY": (2, "EXEC_OPERATION(early, IO(1), IO(2), IO(3));"),
+}
+
+
+def make_composer():
+    rows = {}
+    for name in TRIGGERS:
+        rows[name] = pd.Series({"name": name, "inputs": 2, "outputs": 1, "trigger_semantics": None})
+    for name, (inputs, semantics) in COMPOSITES.items():
+        rows[name] = pd.Series({"name": name, "inputs": inputs, "outputs": 1, "trigger_semantics": semantics})
+    return Composer(rows, TRIGGERS, transform_trigger_code)
+
+
+def run(composer, name, operands):
+    behavior = parse_behavior("{" + composer.behavior_code(name) + "}")
+    return evaluate_behavior(behavior, operands)[0]["rd"].astype(np.uint64)
+
+
+def test_parse_semantics():
+    steps = parse_semantics(COMPOSITES["MAC"][1] + "\nIO(4) = t1;")
+    assert steps == [
+        ("declare", ["t1"]),
+        ("exec", "MUL", ["IO(2)", "IO(3)", "t1"]),
+        ("exec", "ADD", ["t1", "IO(1)", "IO(4)"]),
+        ("copy", "IO(4)", "t1"),
+    ]
+    assert exec_operations(COMPOSITES["MACSHL"][1]) == ["MAC", "SHL", "ADD"]
+    assert exec_operations(None) == []
+    with pytest.raises(ComposeError):
+        parse_semantics("for (;;) x++;")
+
+
+def test_composites_compute_their_callees():
+    composer = make_composer()
+    operands = random_operands(2000, seed=5)
+    a, b, c = (operands[field].astype(np.uint64) for field in ("rs1", "rs2", "rs3"))
+    mask = np.uint64(0xFFFFFFFF)
+    mac = (a + b * c) & mask
+    assert (run(composer, "MAC", operands) == mac).all()
+    assert (run(composer, "ADD3", operands) == (a + b + c) & mask).all()
+    assert (run(composer, "MACSHL", operands) == ((mac << np.uint64(2)) + mac) & mask).all()
+    assert (run(composer, "ADDTWICE", operands) == (a + b + c) & mask).all()
+    # The early return of the callee is folded into an if/else
+    assert (run(composer, "USESEARLY", operands) == np.where(b == 0, 0, a)).all()
+
+
+def lines(name):
+    code = make_composer().behavior_code(name)
+    return [line.strip() for line in code.strip().splitlines()]
+
+
+def test_results_are_inlined():
+    assert lines("ADD3") == [
+        "unsigned<32> t = X[rs1 % RFS] + X[rs2 % RFS];",
+        "X[rd % RFS] = t + X[rs3 % RFS];",
+    ]
+    assert lines("MACSHL") == [
+        "unsigned<32> mac_t1 = X[rs2 % RFS] * X[rs3 % RFS];",
+        "unsigned<32> t = mac_t1 + X[rs1 % RFS];",
+        "unsigned<32> u = t << 2;",
+        "X[rd % RFS] = u + t;",
+    ]
+
+
+def test_result_read_by_the_callee_stays_local():
+    code = lines("ADDTWICE")
+    assert "twice_result = twice_result + X[rs2 % RFS];" in code
+    assert code[-1] == "X[rd % RFS] = t + X[rs3 % RFS];"
+    assert sum("X[rd % RFS] =" in line for line in code) == 1
+
+
+@pytest.mark.parametrize(
+    "name,message",
+    [("CYCLE", "Cyclic composition"), ("MISSING", "not found")],
+)
+def test_compose_errors(name, message):
+    with pytest.raises(ComposeError, match=message):
+        make_composer().behavior_code(name)
+
+
+def test_generation_skips_failing_composites(tmp_path):
+    trigger_file = tmp_path / "nway.cc"
+    trigger_file.write_text(
+        "".join(
+            f"OPERATION({name})\n{body}\nEND_OPERATION({name})\n\n" for name, body in TRIGGERS.items()
+        )
+    )
+    rows = [
+        {"name": name, "description": name, "inputs": 2, "outputs": 1, "trigger_semantics": None}
+        for name in TRIGGERS
+    ] + [
+        {"name": name, "description": name, "inputs": inputs, "outputs": 1, "trigger_semantics": semantics}
+        for name, (inputs, semantics) in COMPOSITES.items()
+    ]
+    context = GenerationContext(pd.DataFrame(rows), "nway", trigger_filepath=str(trigger_file))
+    result = generate_instruction_set(None, str(tmp_path / "cdsl"), context=context)
+    assert {"MAC", "ADD3", "MACSHL", "EARLY", "USESEARLY"} <= set(result["generated"])
+    assert {"CYCLE", "MISSING"} <= set(result["skipped"])
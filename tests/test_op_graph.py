@@ -0,0 +1,88 @@
+from op_graph import OperationGraph
+
+
+def row(name, semantics=""):
+    return {"name": name, "trigger_semantics": semantics, "inputs": 2, "outputs": 1}
+
+
+def exec_semantics(*operations):
+    return "".join(f"EXEC_OPERATION({operation}, IO(1), IO(2), IO(3));\n" for operation in operations)
+
+
+def graph(rows, triggers):
+    return OperationGraph({row["name"]: row for row in rows}, triggers)
+
+
+TRIGGERS = {"ADD": "IO(3) = UINT(1) + UINT(2);", "SHL": "IO(3) = UINT(1) << UINT(2);"}
+
+
+def test_dependencies_come_first():
+    operations = graph(
+        [
+            row("SHL1ADD", exec_semantics("shladd", "add")),
+            row("SHLADD", exec_semantics("shl", "add", "shl")),
+            row("ADD"),
+            row("SHL"),
+        ],
+        TRIGGERS,
+    )
+    assert operations.problems == {}
+    assert operations.dependencies["SHLADD"] == ["SHL", "ADD"]
+    order = operations.order
+    assert order.index("SHLADD") < order.index("SHL1ADD")
+    assert order.index("ADD") < order.index("SHLADD")
+    assert order.index("SHL") < order.index("SHLADD")
+    assert operations.closure(["SHL1ADD"]) == {"SHL1ADD", "SHLADD", "SHL", "ADD"}
+    assert operations.required_bases(["SHL1ADD"]) == {"SHL", "ADD"}
+
+
+def test_cycle():
+    operations = graph(
+        [
+            row("A", exec_semantics("b")),
+            row("B", exec_semantics("c")),
+            row("C", exec_semantics("a")),
+            row("USER", exec_semantics("add", "a")),
+            row("ADD"),
+        ],
+        TRIGGERS,
+    )
+    assert operations.problems["A"] == "Cyclic composition A -> B -> C -> A"
+    assert operations.problems["B"] == "Cyclic composition A -> B -> C -> A"
+    assert operations.problems["C"] == "Cyclic composition A -> B -> C -> A"
+    assert operations.problems["USER"].startswith("Based operation A cannot be built")
+    assert "ADD" not in operations.problems
+
+
+def test_self_cycle():
+    operations = graph([row("LOOP", exec_semantics("loop"))], {})
+    assert operations.problems == {"LOOP": "Cyclic composition LOOP -> LOOP"}
+
+
+def test_missing_callee():
+    operations = graph(
+        [
+            row("OUTER", exec_semantics("inner")),
+            row("INNER", exec_semantics("missing")),
+            row("NOTRIGGER"),
+            row("USER", exec_semantics("notrigger")),
+        ],
+        {},
+    )
+    assert operations.problems == {
+        "INNER": "Based operation MISSING not found",
+        "OUTER": "Based operation INNER cannot be built: Based operation MISSING not found",
+        "USER": "Trigger code not found for operation NOTRIGGER",
+    }
+    assert operations.closure(["OUTER"]) == {"OUTER", "INNER"}
+
+
+def test_trigger_body_wins_over_semantics():
+    operations = graph([row("ADD", exec_semantics("missing"))], TRIGGERS)
+    assert operations.dependencies["ADD"] == []
+    assert operations.problems == {}
+
+
+def test_unsupported_semantics():
+    operations = graph([row("BAD", "SimValue t;\nt++;")], {})
+    assert operations.problems["BAD"].startswith("Unsupported statement in trigger-semantics")
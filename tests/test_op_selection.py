@@ -0,0 +1,106 @@
+import pandas as pd
+import pytest
+from op_selection import (
+    estimated_savings,
+    load_profiles,
+    profile_guided_selection,
+    rank_operations,
+    select_operations,
+)
+
+
+def operation_table():
+    return pd.DataFrame(
+        [
+            {"name": "ADD", "trigger_semantics": None},
+            {"name": "MAC", "trigger_semantics": None},
+            {"name": "SHL2ADD", "trigger_semantics": "EXEC_OPERATION(shl, IO(1), 2, t);\nEXEC_OPERATION(add, t, IO(2), IO(3));"},
+            {"name": "SHL3ADD", "trigger_semantics": "EXEC_OPERATION(shl, IO(1), 3, t);\nEXEC_OPERATION(add, t, IO(2), IO(3));"},
+            {"name": "ABS", "trigger_semantics": None},
+        ]
+    )
+
+
+def write_profile(directory, model, rows):
+    (directory / model).mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(rows, columns=["Sequence", "Count", "Probability"]).to_csv(
+        directory / model / "analyse_instructions_seq1.csv", index=False
+    )
+
+
+@pytest.fixture
+def results(tmp_path):
+    write_profile(
+        tmp_path,
+        "aww",
+        [
+            ("openasip_base_mac", 100, 0.1),
+            ("openasip_base_add", 500, 0.5),
+            ("openasip_base_shl2add", 50, 0.05),
+            ("addi", 350, 0.35),
+        ],
+    )
+    write_profile(tmp_path, "toycar", [("openasip_base_shl2add", 10, 0.2), ("openasip_other_mac", 40, 0.8)])
+    return tmp_path
+
+
+def test_estimated_savings():
+    rows = operation_table().set_index("name", drop=False)
+    assert estimated_savings(rows.loc["ADD"]) == 0
+    assert estimated_savings(rows.loc["MAC"]) == 1
+    assert estimated_savings(rows.loc["SHL2ADD"]) == 1
+
+
+def test_load_profiles(results):
+    profiles = load_profiles(str(results))
+    assert sorted(profiles["Model"].unique()) == ["aww", "toycar"]
+    assert len(profiles) == 6
+
+
+def test_load_profiles_falls_back_to_merged_data(tmp_path, capsys):
+    assert load_profiles(str(tmp_path)).empty
+    assert "No instruction profiles found" in capsys.readouterr().out
+    pd.DataFrame(
+        {"Model": ["aww"], "Sequence": ["openasip_base_mac"], "Count": [1], "Probability": [1.0]}
+    ).to_csv(tmp_path / "filtered_data.csv", index=False)
+    assert load_profiles(str(tmp_path))["Sequence"].tolist() == ["openasip_base_mac"]
+
+
+def test_rank_operations(results):
+    ranking = rank_operations(operation_table(), load_profiles(str(results)), "base")
+    assert ranking["name"].tolist() == ["SHL2ADD", "MAC", "ABS", "ADD", "SHL3ADD"]
+    shl2add = ranking.iloc[0]
+    # Probabilities add up over models, so a short benchmark weighs as much as a long one
+    assert shl2add["probability"] == pytest.approx(0.25)
+    assert shl2add["count"] == 60
+    assert shl2add["models"] == 2
+    # Natively executed operations save nothing however often they run
+    assert ranking.set_index("name").loc["ADD", "score"] == 0
+    assert ranking[~ranking["profiled"]]["name"].tolist() == ["ABS", "SHL3ADD"]
+
+
+def test_select_operations(results):
+    ranking = rank_operations(operation_table(), load_profiles(str(results)), "base")
+    # Unprofiled operations follow the ranked ones, ADD saves nothing anyway
+    assert select_operations(ranking) == ["SHL2ADD", "MAC", "ABS", "SHL3ADD"]
+    assert select_operations(ranking, encoding_budget=1) == ["SHL2ADD"]
+
+
+def test_profile_guided_selection(results, tmp_path):
+    output_directory = tmp_path / "Operations"
+    selected = profile_guided_selection(
+        operation_table(), "base", str(results), output_directory=str(output_directory)
+    )
+    assert selected == ["SHL2ADD", "MAC", "ABS", "SHL3ADD"]
+    ranking = pd.read_csv(output_directory / "base_ranking.csv")
+    assert ranking[ranking["selected"]]["name"].tolist() == ["SHL2ADD", "MAC", "ABS", "SHL3ADD"]
+
+
+def test_unprofiled_opset_keeps_every_operation(results, tmp_path, capsys):
+    output_directory = tmp_path / "Operations"
+    selected = profile_guided_selection(
+        operation_table(), "missing", str(results), output_directory=str(output_directory)
+    )
+    assert selected is None
+    assert "No instruction profiles of missing" in capsys.readouterr().out
+    assert not output_directory.exists()
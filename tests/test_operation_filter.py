@@ -0,0 +1,208 @@
+import pandas as pd
+import pytest
+from oppToTable import OperationParser
+from operation_filter import between, equal, flag, is_in, operand_filter
+
+OPERATION = """  <operation>
+    <name>{name}</name>
+    <inputs>{inputs}</inputs>
+    <outputs>{outputs}</outputs>
+{operands}{flags}  </operation>
+"""
+
+
+def operation(name, inputs, outputs=1, width=32, operand_type="UIntWord", count=1, flags=()):
+    widths = width if isinstance(width, tuple) else (width,) * (inputs + outputs)
+    operands = "".join(
+        f'    <{tag} element-count="{count}" element-width="{widths[i]}" id="{i + 1}" type="{operand_type}"/>\n'
+        for i, tag in enumerate(["in"] * inputs + ["out"] * outputs)
+    )
+    return OPERATION.format(
+        name=name,
+        inputs=inputs,
+        outputs=outputs,
+        operands=operands,
+        flags="".join(f"    <{flag}/>\n" for flag in flags),
+    )
+
+
+OPSETS = {
+    "arith": [
+        operation("ADD", 2),
+        operation("ADDF", 2, operand_type="FloatWord"),
+        operation("ADDH", 2, operand_type="HalfFloatWord"),
+        operation("ADD64", 2, width=64),
+        operation("NARROW2", 2, width=(32, 64, 32)),
+        operation("ADD4", 2, width=8, count=4),
+        operation("MAC", 3),
+        operation("NEG", 1),
+        operation("JUMP", 1, 0, flags=("control-flow", "is-branch")),
+        operation("CALL", 1, 0, flags=("control-flow", "is-call")),
+        operation("SPLIT", 1, 2),
+    ],
+    # Only one-input operations, the io_2 columns are absent from this opset
+    "memory": [
+        operation("LDW", 1, flags=("reads-memory",)),
+        operation("LDD", 1, width=(32, 64)),
+        operation("STW", 1, 0, flags=("writes-memory", "side-effects")),
+    ],
+}
+
+
+@pytest.fixture(scope="module")
+def parser(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("opset")
+    for filename, operations in OPSETS.items():
+        content = '<?xml version="1.0" ?>\n<osal version="0.1">\n' + "".join(operations) + "</osal>\n"
+        (directory / f"{filename}.opp").write_text(content)
+    parser = OperationParser(str(directory), max_workers=1)
+    parser.load_operations()
+    return parser
+
+
+def names(operations):
+    return {name: sorted(df["name"]) for name, df in operations.items()}
+
+
+def baseline_filter(
+    df,
+    min_inputs=0,
+    max_inputs=3,
+    min_outputs=0,
+    max_outputs=1,
+    element_widths=[1, 5, 8, 16, 32],
+    no_control_flow=False,
+    no_call=False,
+    no_branch=False,
+    is_element_count_1=False,
+    no_side_effects=False,
+    no_memory_reads=False,
+    no_memory_writes=False,
+    no_HalfFloatWord=False,
+    no_FloatWord=False,
+    no_RawData=False,
+    present_operands_only=False,
+):
+    # The per-opset loop filter_operations used before the predicates
+    df = df.reset_index(drop=True).copy()
+    mask = pd.Series([True] * len(df))
+    excluded = [
+        name
+        for name, excluded in (
+            ("HalfFloatWord", no_HalfFloatWord),
+            ("FloatWord", no_FloatWord),
+            ("RawData", no_RawData),
+        )
+        if excluded
+    ]
+    for prefix, count, count_column in (("io", max_inputs, "inputs"), ("oo", max_outputs, "outputs")):
+        for i in range(1, count):
+            if f"{prefix}_{i}_type" in df.columns:
+                for name in excluded:
+                    mask &= df[f"{prefix}_{i}_type"].astype(object) != name
+            column = f"{prefix}_{i}_element_width"
+            if column in df.columns:
+                values = pd.to_numeric(df[column], errors="coerce").fillna(-1).astype(int)
+                present = values.isin(element_widths)
+                if present_operands_only:
+                    present |= df[count_column].fillna(0).astype(int) < i
+                mask &= present
+    mask &= df["inputs"].fillna(0).astype(int).between(min_inputs, max_inputs)
+    mask &= df["outputs"].fillna(0).astype(int).between(min_outputs, max_outputs)
+    for column, enabled in (
+        ("control_flow", no_control_flow),
+        ("is_call", no_call),
+        ("is_branch", no_branch),
+        ("has_side_effects", no_side_effects),
+        ("reads_memory", no_memory_reads),
+        ("writes_memory", no_memory_writes),
+    ):
+        if enabled:
+            mask &= ~df[column]
+    if is_element_count_1:
+        for i in range(1, max_inputs):
+            column = f"io_{i}_element_count"
+            if column in df.columns:
+                mask &= pd.to_numeric(df[column], errors="coerce").fillna(0).astype(int) == 1
+    return sorted(df[mask.to_numpy()]["name"])
+
+
+FLAG_SETS = [
+    {},
+    {"max_inputs": 2},
+    {"element_widths": [32, 64], "max_outputs": 2},
+    {"no_FloatWord": True, "no_HalfFloatWord": True, "no_RawData": True},
+    {"no_control_flow": True, "no_call": True, "no_branch": True},
+    {"is_element_count_1": True, "no_memory_reads": True, "no_memory_writes": True},
+    {"min_inputs": 1, "min_outputs": 1, "no_side_effects": True},
+    {"min_inputs": 2, "max_inputs": 3, "element_widths": [8]},
+    {"present_operands_only": True, "element_widths": [32]},
+]
+
+
+@pytest.mark.parametrize("flags", FLAG_SETS)
+def test_matches_baseline_filter(parser, flags):
+    expected = {filename: baseline_filter(df, **flags) for filename, df in parser.operations.items()}
+    assert names(parser.filter_operations(**flags)) == expected
+
+
+@pytest.mark.parametrize("flags", FLAG_SETS)
+def test_mask_matches_query(parser, flags):
+    predicate = operand_filter(**flags)
+    df = parser.operations["arith"]
+    queried = df.query(predicate.to_query(), engine="python")
+    assert sorted(predicate.apply(df)["name"]) == sorted(queried["name"])
+
+
+def test_default_flags(parser):
+    assert names(parser.filter_operations()) == {
+        "arith": ["ADD", "ADD4", "ADDF", "ADDH", "MAC"],
+        "memory": ["LDD", "LDW", "STW"],
+    }
+    assert names(parser.filter_operations(present_operands_only=True)) == {
+        "arith": ["ADD", "ADD4", "ADDF", "ADDH", "CALL", "JUMP", "MAC", "NEG"],
+        "memory": ["LDD", "LDW", "STW"],
+    }
+
+
+def test_loaded_tables_are_not_modified(parser):
+    before = {filename: df.copy() for filename, df in parser.operations.items()}
+    parser.filter_operations(is_element_count_1=True)
+    for filename, df in parser.operations.items():
+        pd.testing.assert_frame_equal(df, before[filename])
+
+
+def test_filtered_tables_keep_their_dtypes(parser):
+    for filename, df in parser.filter_operations().items():
+        pd.testing.assert_series_equal(df.dtypes, parser.operations[filename].dtypes)
+
+
+def test_pool_follows_changes(parser):
+    parser = OperationParser(parser.directory, max_workers=1)
+    parser.load_operations()
+    assert "MAC" in names(parser.filter_operations())["arith"]
+    arith = parser.operations["arith"]
+    arith.loc[arith["name"] == "MAC", "name"] = "FMA"
+    parser.operations_changed()
+    assert "FMA" in names(parser.filter_operations())["arith"]
+    # Replaced tables are noticed without operations_changed
+    parser.operations["memory"] = parser.operations["memory"].iloc[:1]
+    assert names(parser.filter_operations())["memory"] == ["LDW"]
+
+
+def test_explicit_predicate(parser):
+    predicate = flag("control_flow") & ~flag("is_call") | equal("name", "MAC")
+    assert names(parser.filter_operations(predicate)) == {
+        "arith": ["JUMP", "MAC"],
+        "memory": [],
+    }
+
+
+def test_missing_values():
+    df = pd.DataFrame({"width": [8, None, 64], "count": [1, None, 2]})
+    assert is_in("width", [8, 64]).mask(df).tolist() == [True, False, True]
+    assert between("count", 0, 1).mask(df).tolist() == [True, True, False]
+    assert between("count", 1, 2, missing_value=0).mask(df).tolist() == [True, False, True]
+    # A column the frame does not have evaluates to the missing value
+    assert is_in("other", [8]).mask(df).tolist() == [True, True, True]
+    assert equal("other", 8).mask(df).tolist() == [False, False, False]
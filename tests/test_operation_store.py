@@ -0,0 +1,58 @@
+import os
+
+import pandas as pd
+import pytest
+from operation_store import (
+    STORE_FORMATS,
+    find_operation_table,
+    load_operation_table,
+    normalize_operation_table,
+    save_operation_table,
+)
+
+
+def operation_table():
+    return normalize_operation_table(
+        pd.DataFrame(
+            {
+                "name": ["ADD", "LDW"],
+                "inputs": ["2", "1"],
+                "outputs": ["1", "1"],
+                "io_2_element_width": ["32", ""],
+                "io_1_type": ["SIntWord", "UIntWord"],
+                "reads_memory": [False, None],
+            }
+        )
+    )
+
+
+def test_normalize():
+    df = operation_table()
+    assert df["inputs"].dtype == "Int64"
+    assert df["io_2_element_width"].dtype == "Int64"
+    assert df["io_2_element_width"].isna().tolist() == [False, True]
+    assert df["reads_memory"].dtype == bool
+    assert df["io_1_type"].tolist() == ["SIntWord", "UIntWord"]
+
+
+@pytest.mark.parametrize("format", list(STORE_FORMATS))
+def test_round_trip(tmp_path, format):
+    df = operation_table()
+    filepath = save_operation_table(df, str(tmp_path / "Operations"), "base", format)
+    assert filepath.endswith(STORE_FORMATS[format][0])
+    loaded = load_operation_table(filepath)
+    pd.testing.assert_frame_equal(loaded, df, check_dtype=True)
+
+
+def test_find_prefers_typed_formats(tmp_path):
+    directory = str(tmp_path)
+    assert find_operation_table(directory, "base") == os.path.join(directory, "base.parquet")
+    save_operation_table(operation_table(), directory, "base", "xlsx")
+    assert find_operation_table(directory, "base") == os.path.join(directory, "base.xlsx")
+    save_operation_table(operation_table(), directory, "base", "feather")
+    assert find_operation_table(directory, "base") == os.path.join(directory, "base.feather")
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        load_operation_table(str(tmp_path / "base.csv"))
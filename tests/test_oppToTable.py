@@ -0,0 +1,105 @@
+import pandas as pd
+import pytest
+from oppToTable import OperationParser, parse_opp_file
+
+OPP_FILE = """<?xml version="1.0" encoding="ISO-8859-1" standalone="no" ?>
+<osal version="0.1">
+  <operation>
+    <name>LDW</name>
+    <description>Load word</description>
+    <inputs>1</inputs>
+    <outputs>1</outputs>
+    <reads-memory/>
+    <in element-count="1" element-width="32" id="1" type="UIntWord">
+      <mem-address/>
+    </in>
+    <out element-count="1" element-width="32" id="2" type="UIntWord"/>
+  </operation>
+  <operation>
+    <name>ADD</name>
+    <description>Add</description>
+    <inputs>2</inputs>
+    <outputs>1</outputs>
+    <in element-count="1" element-width="32" id="1" type="SIntWord">
+      <can-swap>
+        <in id="2"/>
+      </can-swap>
+    </in>
+    <in element-count="1" element-width="32" id="2" type="SIntWord">
+      <can-swap>
+        <in id="1"/>
+      </can-swap>
+    </in>
+    <out element-count="1" element-width="32" id="3" type="SIntWord"/>
+  </operation>
+  <operation>
+    <name>JUMP</name>
+    <inputs>1</inputs>
+    <outputs>0</outputs>
+    <control-flow/>
+    <is-branch/>
+    <in element-count="1" element-width="32" id="1" type="InstructionAddress"/>
+  </operation>
+  <operation>
+    <name>ADD2</name>
+    <inputs>2</inputs>
+    <outputs>1</outputs>
+    <trigger-semantics>
+        EXEC_OPERATION(add, IO(1), IO(2), IO(3));
+    </trigger-semantics>
+    <in element-count="1" element-width="32" id="1" type="SIntWord"/>
+    <in element-count="1" element-width="32" id="2" type="SIntWord"/>
+    <out element-count="1" element-width="32" id="3" type="SIntWord"/>
+  </operation>
+</osal>
+"""
+
+
+@pytest.fixture
+def opp_directory(tmp_path):
+    (tmp_path / "base.opp").write_text(OPP_FILE)
+    (tmp_path / "other.opp").write_text(OPP_FILE.replace("<name>ADD", "<name>SUB"))
+    (tmp_path / "notes.txt").write_text("not an opset")
+    return tmp_path
+
+
+def test_parse(opp_directory):
+    df = parse_opp_file(str(opp_directory / "base.opp"))
+    assert df["name"].tolist() == ["LDW", "ADD", "JUMP", "ADD2"]
+    assert df["inputs"].dtype == "Int64"
+    assert df["inputs"].tolist() == [1, 2, 1, 2]
+    assert df["outputs"].tolist() == [1, 1, 0, 1]
+    assert df["reads_memory"].tolist() == [True, False, False, False]
+    assert df["control_flow"].tolist() == [False, False, True, False]
+    assert df["is_branch"].tolist() == [False, False, True, False]
+    assert df["io_1_mem_address"].tolist() == ["yes", "no", "no", "no"]
+    assert df["io_1_can_swap"].tolist() == ["", "2", "", ""]
+    assert "EXEC_OPERATION(add" in df["trigger_semantics"][3]
+
+
+def test_operand_columns_are_backfilled(opp_directory):
+    df = parse_opp_file(str(opp_directory / "base.opp"))
+    # io_2 first appears on ADD, LDW and JUMP have no second input
+    assert df["io_2_element_width"].dtype == "Int64"
+    assert df["io_2_element_width"].isna().tolist() == [True, False, True, False]
+    assert df["oo_1_type"][:2].tolist() == ["UIntWord", "SIntWord"]
+    assert pd.isna(df["oo_1_type"][2])
+
+
+def test_worker_pool_matches_serial(opp_directory):
+    serial = OperationParser(str(opp_directory), max_workers=1)
+    serial.load_operations()
+    pooled = OperationParser(str(opp_directory), max_workers=2)
+    pooled.load_operations()
+    assert list(serial.operations) == list(pooled.operations) == ["base", "other"]
+    for filename in serial.operations:
+        pd.testing.assert_frame_equal(serial.operations[filename], pooled.operations[filename])
+    assert "SUB" in pooled.operations["other"]["name"].tolist()
+
+
+def test_broken_file_is_skipped(opp_directory, capsys):
+    (opp_directory / "broken.opp").write_text("<osal><operation>")
+    parser = OperationParser(str(opp_directory), max_workers=1)
+    parser.load_operations()
+    assert list(parser.operations) == ["base", "other"]
+    assert "Error parsing" in capsys.readouterr().out
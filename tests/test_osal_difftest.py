@@ -0,0 +1,131 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from cdsl_parser import parse_instruction_set
+from osal_difftest import (
+    OsalLibrary,
+    build_library,
+    difftest,
+    inline_exec_operations,
+    operation_sources,
+    split_arguments,
+)
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("g++") is None, reason="needs a C++ compiler"
+)
+
+TRIGGERS = {
+    "ADD": "TRIGGER\n IO(3) = UINT(1) + UINT(2);\n return true;\nEND_TRIGGER;",
+    "SUB": "TRIGGER\n IO(3) = UINT(1) - UINT(2);\n return true;\nEND_TRIGGER;",
+    "DIV": (
+        "TRIGGER\n if (INT(2) == 0) RUNTIME_ERROR(\"div by zero\");\n"
+        " IO(3) = INT(1) / INT(2);\n return true;\nEND_TRIGGER;"
+    ),
+    "MUL": "TRIGGER\n IO(3) = UINT(1) * UINT(2);\n return true;\nEND_TRIGGER;",
+    "NEG": "TRIGGER\n IO(2) = -UINT(1);\n return true;\nEND_TRIGGER;",
+    "LOAD": "TRIGGER\n MEMORY.read(UINT(1), 4, IO(2));\n return true;\nEND_TRIGGER;",
+    # Compiles, but adds the whole words rather than the lanes
+    "ADDH2": "TRIGGER\n IO(3) = UINT(1) + UINT(2);\n return true;\nEND_TRIGGER;",
+}
+
+INSTRUCTION = """
+    OpenASIP_t_{name} {{
+        encoding: 7'b0000000 :: rs2[4:0] :: rs1[4:0] :: 3'b000 :: rd[4:0] :: 7'b0001011;
+        assembly: "{{name(rd)}}, {{name(rs1)}}, {{name(rs2)}}";
+        behavior: {{
+            {behavior}
+        }}
+    }}
+"""
+
+BEHAVIORS = {
+    "ADD": "X[rd % RFS] = X[rs1 % RFS] + X[rs2 % RFS];",
+    # Wrong on purpose, the difftest has to report it
+    "SUB": "X[rd % RFS] = X[rs2 % RFS] - X[rs1 % RFS];",
+    "DIV": "signed<32> a = X[rs1 % RFS]; signed<32> b = X[rs2 % RFS]; X[rd % RFS] = a / b;",
+    "ADD3": "X[rd % RFS] = X[rs1 % RFS] + X[rs2 % RFS] + X[rs3 % RFS];",
+    # cdsl_parser has no for loops; MUL has no behavior at all
+    "NEG": "for (int i = 0; i < 1; i++) X[rd % RFS] = 0 - X[rs1 % RFS];",
+}
+
+
+def make_table():
+    return pd.DataFrame(
+        [
+            {"name": "ADD", "inputs": 2, "outputs": 1, "trigger_semantics": None},
+            {"name": "SUB", "inputs": 2, "outputs": 1, "trigger_semantics": None},
+            {"name": "DIV", "inputs": 2, "outputs": 1, "trigger_semantics": None},
+            {"name": "MUL", "inputs": 2, "outputs": 1, "trigger_semantics": None},
+            {"name": "NEG", "inputs": 1, "outputs": 1, "trigger_semantics": None},
+            {"name": "LOAD", "inputs": 1, "outputs": 1, "trigger_semantics": None},
+            {
+                "name": "ADD3",
+                "inputs": 3,
+                "outputs": 1,
+                "trigger_semantics": "SimValue t;\nEXEC_OPERATION(add, IO(1), IO(2), t);\n"
+                "EXEC_OPERATION(add, t, IO(3), IO(4));",
+            },
+            {"name": "NOCODE", "inputs": 1, "outputs": 1, "trigger_semantics": None},
+            {
+                "name": "ADDH2",
+                "inputs": 2,
+                "outputs": 1,
+                "trigger_semantics": None,
+                "io_1_element_count": 2,
+                "io_1_element_width": 16,
+            },
+        ]
+    )
+
+
+def test_split_arguments():
+    assert split_arguments("IO(1), MIN(a, b), t") == ["IO(1)", "MIN(a, b)", "t"]
+
+
+def test_inline_exec_operations():
+    code, called = inline_exec_operations("EXEC_OPERATION(add, a, b, c);", {"ADD": (2, 1)})
+    assert called == ["ADD"]
+    assert "osal_one_ADD(sub, error)" in code
+    assert "c = sub[2];" in code
+    with pytest.raises(ValueError):
+        inline_exec_operations("EXEC_OPERATION(add, a, b);", {"ADD": (2, 1)})
+
+
+def test_difftest(tmp_path):
+    df = make_table()
+    sources, skipped = operation_sources(df, TRIGGERS)
+    assert skipped == {"NOCODE": "no trigger code"}
+    assert sources["ADD3"][1] == ["ADD", "ADD"]
+
+    library_filepath, compiled, errors = build_library(sources, cache_directory=str(tmp_path))
+    # MEMORY is not part of the shims
+    assert compiled == ["ADD", "ADD3", "ADDH2", "DIV", "MUL", "NEG", "SUB"]
+    assert list(errors) == ["LOAD"]
+
+    text = "".join(
+        INSTRUCTION.format(name=name, behavior=behavior) for name, behavior in BEHAVIORS.items()
+    )
+    results = difftest(
+        df, OsalLibrary(library_filepath), set(compiled), parse_instruction_set(text), "t", 2000
+    )
+    mismatches = {result["name"]: result["mismatches"] for result in results}
+    assert mismatches["ADD"] == 0
+    assert mismatches["ADD3"] == 0
+    # Division by zero raises RUNTIME_ERROR and INT_MIN / -1 traps, neither
+    # lane is compared
+    assert mismatches["DIV"] == 0
+    assert mismatches["SUB"] > 0
+    unchecked = {result["name"]: result["unchecked"] for result in results}
+    assert unchecked["MUL"] == "not in the generated instruction set"
+    assert unchecked["NEG"].startswith("parse error")
+    assert unchecked["ADD"] is None
+    # The lanes of packed operations are not compared
+    assert unchecked["ADDH2"].startswith("packed operation")
+    example = next(result for result in results if result["name"] == "SUB")["examples"][0]
+    assert set(example) == {"rs1", "rs2", "expected", "actual"}
+
+    # The objects are cached by source hash
+    assert build_library(sources, cache_directory=str(tmp_path))[0] == library_filepath
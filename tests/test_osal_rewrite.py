@@ -0,0 +1,165 @@
+import pytest
+
+from osal_rewrite import (
+    TRIGGER_RULES,
+    RewriteEngine,
+    RewriteError,
+    RewriteRule,
+    early_return,
+    fold_early_returns,
+    rewrite_io_operands,
+    rewrite_trigger_code,
+    trigger_rewriter,
+)
+
+
+def rewrite(code, **kwargs):
+    trigger_rewriter.reset_hits()
+    return " ".join(rewrite_trigger_code(code, **kwargs).split())
+
+
+def test_rule_names_are_unique():
+    names = [rule.name for rule in TRIGGER_RULES]
+    assert len(names) == len(set(names))
+
+
+def test_operands_and_hits():
+    code = "TRIGGER\nIO(3) = UINT(1) + UINT(2);\nreturn true;\nEND_TRIGGER;"
+    assert rewrite(code) == "X[rd % RFS] = X[rs1 % RFS] + X[rs2 % RFS];"
+    assert trigger_rewriter.hits == {
+        "trigger": 1,
+        "io": 1,
+        "operand_value": 2,
+        "return_true": 1,
+        "end_trigger": 1,
+    }
+
+
+def test_remove_rfs():
+    assert rewrite("IO(3) = UINT(1);", remove_RFS=True) == "X[rd] = X[rs1];"
+
+
+def test_three_sources():
+    assert rewrite("IO(4) = UINT(1) * UINT(2) + UINT(3);", remove_RFS=True) == (
+        "X[rd] = X[rs1] * X[rs2] + X[rs3];"
+    )
+
+
+def test_signed_operand():
+    assert rewrite("IO(3) = INT(1) >> UINT(2);", remove_RFS=True) == (
+        "X[rd] = (signed<32>)(X[rs1]) >> X[rs2];"
+    )
+    assert trigger_rewriter.hits["signed_operand_value"] == 1
+
+
+def test_types_and_constants():
+    code = "SIntWord a = MIN(INT(1), OSAL_WORD_WIDTH); UIntWord b = sizeof(UIntWord); long long c;"
+    assert rewrite(code, remove_RFS=True) == (
+        "signed<32> a = min((signed<32>)(X[rs1]), 32); unsigned<32> b = 4; long c;"
+    )
+    assert trigger_rewriter.hits["sizeof_word"] == 1
+    # The UIntWord inside sizeof is consumed by sizeof_word
+    assert trigger_rewriter.hits["unsigned_word"] == 1
+
+
+def test_divide_by_zero_guard():
+    code = 'if (UINT(2) == 0) RUNTIME_ERROR("Divide by zero.")\nIO(3) = UINT(1) / UINT(2);\n}'
+    assert rewrite(code, remove_RFS=True) == "if (X[rs2] != 0) { X[rd] = X[rs1] / X[rs2]; }"
+    assert trigger_rewriter.hits["divide_by_zero_guard"] == 1
+
+
+def test_nested_static_casts():
+    code = "IO(3) = static_cast<SIntWord>(static_cast<UIntWord>(UINT(1)) >> UINT(2));"
+    assert rewrite(code, remove_RFS=True) == (
+        "X[rd] = (signed<32>)((unsigned<32>)(X[rs1]) >> X[rs2]);"
+    )
+    assert trigger_rewriter.hits["static_cast"] == 2
+
+
+def test_nested_macros_are_rewritten():
+    code = "IO(2) = SIGN_EXTEND(static_cast<SIntWord>(UINT(1)), MAU_SIZE * 2);"
+    assert rewrite(code, remove_RFS=True, inputs=1) == (
+        "X[rd] = (signed<32>)((signed<16>)((signed<32>)(X[rs1])));"
+    )
+    assert trigger_rewriter.hits["extend"] == 1
+    assert trigger_rewriter.hits["static_cast"] == 1
+
+
+def test_extend_with_variable_width_is_kept():
+    assert rewrite("IO(3) = ZERO_EXTEND(UINT(1), UINT(2));", remove_RFS=True) == (
+        "X[rd] = ZERO_EXTEND(X[rs1], X[rs2]);"
+    )
+
+
+def test_unknown_operand_is_kept():
+    assert rewrite_io_operands("IO(7) = IO(1);", remove_RFS=True) == "IO(7) = X[rs1];"
+
+
+def test_first_listed_rule_wins():
+    engine = RewriteEngine(
+        [RewriteRule("long", r"ab", "long"), RewriteRule("short", r"a", "short")]
+    )
+    assert engine.rewrite("ab a") == "long short"
+    assert engine.hits == {"long": 1, "short": 1}
+    engine.reset_hits()
+    assert not engine.hits
+
+
+def test_callable_template_and_params():
+    engine = RewriteEngine(
+        [RewriteRule("word", r"(\w+)", lambda groups, params: params["prefix"] + groups[1])]
+    )
+    assert engine.rewrite("a b", prefix="x_") == "x_a x_b"
+
+
+def test_fold_early_return():
+    code = (
+        "TRIGGER\n"
+        "if (UINT(2) > 31) {\n    IO(3) = 0;\n    return true;\n}\n"
+        "IO(3) = UINT(1) >> UINT(2);\n"
+        "return true;\n"
+        "END_TRIGGER;"
+    )
+    assert early_return(code)
+    assert rewrite(code, remove_RFS=True) == (
+        "if (X[rs2] > 31) { X[rd] = 0; } else { X[rd] = X[rs1] >> X[rs2]; }"
+    )
+
+
+def test_fold_keeps_loops_whole():
+    code = (
+        "TRIGGER\n"
+        "if (UINT(1) == 0) return true;\n"
+        "int count = 0;\n"
+        "for (int i = 0; i < 32; i++) {\n    count += (UINT(1) >> i) & 1;\n}\n"
+        "IO(2) = count;\n"
+        "return true;\n"
+        "END_TRIGGER;"
+    )
+    folded = " ".join(fold_early_returns(code).split())
+    assert folded == (
+        "TRIGGER if (UINT(1) == 0) { } else { int count = 0; "
+        "for (int i = 0; i < 32; i++) { count += (UINT(1) >> i) & 1; } "
+        "IO(2) = count; } END_TRIGGER;"
+    )
+
+
+def test_body_without_early_return_is_unchanged():
+    code = "TRIGGER\nIO(3) = UINT(1);\nreturn true;\nEND_TRIGGER;"
+    assert not early_return(code)
+    assert fold_early_returns(code) == code
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        "for (int i = 0; i < 4; i++) { if (UINT(1) == i) return true; }",
+        "while (UINT(1)) return true;",
+        "do { if (UINT(1)) return true; } while (0);",
+        "switch (UINT(1)) { case 0: return true; default: break; }",
+    ],
+)
+def test_return_inside_loop_is_an_error(body):
+    code = f"TRIGGER\n{body}\nIO(3) = 1;\nreturn true;\nEND_TRIGGER;"
+    with pytest.raises(RewriteError):
+        rewrite_trigger_code(code)
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cdsl_eval import evaluate_behavior, random_operands
+from cdsl_ir import optimize
+from cdsl_parser import Binary, Index, Name
+from packed_simd import PackedError, is_packed, lane_kernel, lane_shape, packed_behavior
+
+
+def register(field):
+    return Index(Name("X"), Binary("%", Name(field), Name("RFS")))
+
+
+def packed_row(name, count, width, operand_type="SIntWord", **fields):
+    row = {"name": name, "inputs": 2, "outputs": 1}
+    for prefix, i in (("io", 1), ("io", 2), ("oo", 1)):
+        row[f"{prefix}_{i}_element_count"] = count
+        row[f"{prefix}_{i}_element_width"] = width
+        row[f"{prefix}_{i}_type"] = operand_type
+    row.update(fields)
+    return pd.Series(row)
+
+
+def lanes(values, count, width, signed):
+    values = values.astype(np.uint64)
+    mask = np.uint64((1 << width) - 1)
+    result = []
+    for lane in range(count):
+        lane_values = ((values >> np.uint64(lane * width)) & mask).astype(np.int64)
+        if signed:
+            lane_values = np.where(lane_values >= 1 << (width - 1), lane_values - (1 << width), lane_values)
+        result.append(lane_values)
+    return result
+
+
+def pack(lane_values, width):
+    packed = np.zeros(len(lane_values[0]), dtype=np.uint64)
+    for lane, values in enumerate(lane_values):
+        packed |= (values.astype(np.uint64) & np.uint64((1 << width) - 1)) << np.uint64(lane * width)
+    return packed
+
+
+def model(operator, signed, saturating, width, a, b):
+    result = {
+        "+": lambda: a + b,
+        "-": lambda: a - b,
+        "*": lambda: a * b,
+        "min": lambda: np.minimum(a, b),
+        "max": lambda: np.maximum(a, b),
+        "&": lambda: a & b,
+        "|": lambda: a | b,
+        "^": lambda: a ^ b,
+    }[operator]()
+    if saturating:
+        low, high = (-(1 << (width - 1)), (1 << (width - 1)) - 1) if signed else (0, (1 << width) - 1)
+        result = np.clip(result, low, high)
+    return result
+
+
+@pytest.mark.parametrize("count,width,suffix", [(2, 16, "H2"), (4, 8, "8X4")])
+@pytest.mark.parametrize("kernel", ["ADD", "SUB", "MUL", "ADDS", "SUBUS", "MIN", "MAXU", "XOR"])
+def test_lanes_match_model(kernel, count, width, suffix):
+    row = packed_row(kernel + suffix, count, width)
+    operator, signed, saturating = lane_kernel(row["name"])
+    operands = random_operands(3000, fields=("rs1", "rs2", "rd"), seed=count)
+    a = lanes(operands["rs1"], count, width, signed)
+    b = lanes(operands["rs2"], count, width, signed)
+    expected = pack(
+        [model(operator, signed, saturating, width, x, y) for x, y in zip(a, b)], width
+    )
+    behavior = packed_behavior(row, register)
+    for block in (behavior, optimize(behavior)):
+        rd = evaluate_behavior(block, operands)[0]["rd"].astype(np.uint64)
+        assert (rd == expected).all()
+
+
+def test_lane_kernel_names():
+    assert lane_kernel("ADDH2") == ("+", True, False)
+    assert lane_kernel("ADDS8X4") == ("+", True, True)
+    assert lane_kernel("MINUB4") == ("min", False, False)
+    with pytest.raises(PackedError):
+        lane_kernel("SHUFFLEH2")
+
+
+def test_is_packed():
+    assert is_packed(packed_row("ADDH2", 2, 16))
+    assert not is_packed(pd.Series({"name": "ADD", "inputs": 2, "outputs": 1}))
+
+
+@pytest.mark.parametrize(
+    "row,message",
+    [
+        (packed_row("ADDH2", 2, 8), "do not fill"),
+        (packed_row("ADDH2", 2, 16, operand_type="HalfFloatWord"), "integer lanes"),
+        (packed_row("ADDH2", 2, 16, oo_1_element_count=4, oo_1_element_width=8), "different lane layouts"),
+        (packed_row("ADDH2", 2, 16, inputs=3), "two inputs"),
+    ],
+)
+def test_unsupported_layouts(row, message):
+    with pytest.raises(PackedError, match=message):
+        lane_shape(row)
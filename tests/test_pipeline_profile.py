@@ -0,0 +1,98 @@
+import time
+import tracemalloc
+
+import pytest
+
+import bench_pipeline
+from pipeline_profile import StageProfiler, profiled, profiler
+
+
+@pytest.fixture
+def enabled_profiler():
+    profiler.reset()
+    profiler.enable()
+    yield profiler
+    profiler.disable()
+    profiler.reset()
+
+
+def test_disabled_records_nothing():
+    stages = StageProfiler()
+    with stages.stage("outer"):
+        pass
+    assert stages.stages == {}
+
+
+def test_nested_stages():
+    stages = StageProfiler()
+    stages.enable(memory=True)
+    try:
+        with stages.stage("outer"):
+            with stages.stage("inner"):
+                data = bytearray(1 << 20)
+                time.sleep(0.01)
+            del data
+        with stages.stage("inner"):
+            pass
+    finally:
+        stages.disable()
+    assert stages.stages["inner"]["calls"] == 2
+    assert stages.stages["outer"]["seconds"] >= stages.stages["inner"]["seconds"] - 1e-3
+    # The outer stage's peak covers the allocation of the inner one
+    assert stages.stages["outer"]["peak"] >= 1 << 20
+    assert stages.stages["inner"]["peak"] >= 1 << 20
+
+
+def test_times_without_tracing_memory():
+    stages = StageProfiler()
+    stages.enable()
+    try:
+        assert not tracemalloc.is_tracing()
+        with stages.stage("outer"):
+            with stages.stage("inner"):
+                data = bytearray(1 << 20)
+            del data
+    finally:
+        stages.disable()
+    assert stages.stages["outer"]["calls"] == 1
+    assert stages.stages["inner"]["peak"] is None
+    assert stages.report().splitlines()[1].split()[-1] == "-"
+
+
+def test_merge_and_report():
+    stages = StageProfiler()
+    stages.record("load", 1, 0.5, 10)
+    stages.merge({"load": {"calls": 2, "seconds": 1.0, "peak": 30}, "emit": {"calls": 1, "seconds": 2.0, "peak": 0}})
+    assert stages.stages["load"] == {"calls": 3, "seconds": 1.5, "peak": 30}
+    lines = stages.report().splitlines()
+    assert [line.split()[0] for line in lines[1:]] == ["emit", "load"]
+
+
+def test_profiled_decorator(enabled_profiler):
+    @profiled("double")
+    def double(x):
+        return 2 * x
+
+    assert double(4) == 8
+    assert double.__name__ == "double"
+    assert enabled_profiler.stages["double"]["calls"] == 1
+
+
+def test_benchmark_stages(tmp_path, enabled_profiler, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    filename = bench_pipeline.synthetic_opset(str(tmp_path), 12)
+    assert (tmp_path / f"{filename}.opp").exists()
+    result = bench_pipeline.benchmark(12, repeat=1)
+    assert result["total"] > 0
+    for name in ("load_operations", "generate_instruction_set", "transform_trigger_code"):
+        assert result["stages"][name]["calls"] >= 1
+    assert result["stages"]["load_operations"]["peak"] is None
+    # The indices of the synthetic opsets are not cached
+    assert not (tmp_path / ".cache").exists()
+
+
+def test_benchmark_memory_pass(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result = bench_pipeline.benchmark(12, repeat=1, memory=True)
+    assert result["stages"]["generate_instruction_set"]["peak"] > 0
+    assert not tracemalloc.is_tracing()
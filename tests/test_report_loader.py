@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+import report_loader
+from report_loader import ReportTable, load_reports, parse_config
+
+CONFIGS = [
+    {"target": "spike", "opt": "O3", "flags": ["-g"]},
+    {"target": "spike", "opt": "O3", "flags": ["-g"]},
+    {"target": "spike", "opt": "O2", "flags": ["-g"]},
+    {"target": "etiss", "opt": "O3", "flags": ["-g"], "extra": 1},
+    {"target": "spike", "opt": "O3", "flags": []},
+]
+
+
+def make_frame(configs):
+    return pd.DataFrame(
+        {
+            "Model": [f"m{i % 2}" for i in range(len(configs))],
+            "Run": list(range(len(configs))),
+            "Config": [repr(config) for config in configs],
+        }
+    )
+
+
+def test_parse_config_strips_paths():
+    text = "{'path': PosixPath('/tmp/a'), 'n': 2}"
+    assert parse_config(text) == {"path": "/tmp/a", "n": 2}
+    assert parse_config(float("nan")) == {}
+
+
+def test_configs_round_trip():
+    table = ReportTable(make_frame(CONFIGS))
+    assert len(table.configs) == 4
+    assert table.configs.base == {"target": "spike", "opt": "O3", "flags": ["-g"]}
+    for position, config in enumerate(CONFIGS):
+        assert table.config(position) == config
+    assert table.configs.varying_keys == ["extra", "flags", "opt", "target"]
+
+
+@pytest.mark.parametrize(
+    "key,value",
+    [
+        ("target", "spike"),
+        ("target", "etiss"),
+        ("opt", "O3"),
+        ("flags", []),
+        ("flags", ["-g"]),
+        ("extra", 1),
+        ("target", "none"),
+    ],
+)
+def test_select_matches_scan(key, value):
+    table = ReportTable(make_frame(CONFIGS))
+    expected = [i for i, config in enumerate(CONFIGS) if config.get(key) == value]
+    assert table.select(key, value)["Run"].tolist() == expected
+
+
+def test_run_without_config():
+    df = make_frame([{"x": 1}, {"x": 1}, {"x": 2}])
+    df.loc[3] = ["m1", 3, float("nan")]
+    table = ReportTable(df)
+    assert table.config(3) == {}
+    assert table.runs["x"].tolist() == [1, 1, 2, None]
+    assert table.select("x", 2)["Run"].tolist() == [2]
+    assert table.select("x", 1)["Run"].tolist() == [0, 1]
+
+
+def test_key_columns():
+    table = ReportTable(make_frame(CONFIGS), keys=["opt"])
+    assert "Config" not in table.runs.columns
+    assert table.runs["opt"].tolist() == [config["opt"] for config in CONFIGS]
+
+
+def test_load_reports(tmp_path):
+    for name, configs in [("a", CONFIGS[:2]), ("b", CONFIGS[2:])]:
+        (tmp_path / name).mkdir()
+        make_frame(configs).to_csv(tmp_path / name / report_loader.REPORT_FILENAME)
+    table = load_reports(str(tmp_path))
+    assert len(table.runs) == len(CONFIGS)
+    assert table.select("opt", "O2")["Model"].tolist() == ["m0"]
+    with pytest.raises(FileNotFoundError):
+        load_reports(str(tmp_path / "a"))
@@ -0,0 +1,113 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+from csv_filter import process_all_folders
+from results_aggregator import aggregate_results
+
+REPORT_COLUMNS = [
+    "Run",
+    "Model",
+    "Frontend",
+    "Target",
+    "Total Instructions",
+    "Total ROM",
+    "Total RAM",
+    "Total Cycles (rel.)",
+    "Total ROM (rel.)",
+    "Total RAM (rel.)",
+]
+
+
+def write_model(base_dir, model, mac_count=10):
+    folder = base_dir / model
+    folder.mkdir(exist_ok=True)
+    pd.DataFrame(
+        {
+            "Sequence": ["openasip_base_mac", "openasip_base_add", "addi"],
+            "Count": [mac_count, 5, 100],
+            "Probability": [0.1, 0.05, 0.85],
+        }
+    ).to_csv(folder / "analyse_instructions_seq1.csv", index=False)
+    report = pd.DataFrame([[0, model, "tflite", "etiss", 1000, 10, 20, 1.0, 1.0, 1.0]], columns=REPORT_COLUMNS)
+    report["Extra"] = "ignored"
+    report.to_csv(folder / "report.csv", index=False)
+
+
+@pytest.fixture
+def results(tmp_path):
+    write_model(tmp_path, "aww")
+    write_model(tmp_path, "toycar", mac_count=20)
+    return tmp_path
+
+
+def read_outputs(base_dir):
+    return (
+        pd.read_csv(base_dir / "filtered_data.csv"),
+        pd.read_csv(base_dir / "merged_report_data.csv"),
+    )
+
+
+def test_matches_full_rebuild(results, tmp_path_factory):
+    reference = tmp_path_factory.mktemp("reference")
+    shutil.copytree(results, reference, dirs_exist_ok=True)
+    process_all_folders(str(reference))
+
+    assert aggregate_results(str(results)) == ["aww", "toycar"]
+    filtered, report = read_outputs(results)
+    expected_filtered, expected_report = read_outputs(reference)
+    key = ["Model", "Sequence"]
+    pd.testing.assert_frame_equal(
+        filtered.sort_values(key).reset_index(drop=True),
+        expected_filtered.sort_values(key).reset_index(drop=True),
+    )
+    pd.testing.assert_frame_equal(
+        report.sort_values("Model").reset_index(drop=True),
+        expected_report.sort_values("Model").reset_index(drop=True),
+    )
+    assert "Extra" not in report.columns
+
+
+def test_only_changed_folders_are_ingested(results):
+    aggregate_results(str(results))
+    merged = results / "filtered_data.csv"
+    mtime = os.stat(merged).st_mtime_ns
+
+    assert aggregate_results(str(results)) == []
+    assert os.stat(merged).st_mtime_ns == mtime
+
+    # A new mtime with the same content is not a change
+    os.utime(results / "aww" / "report.csv", ns=(0, 0))
+    assert aggregate_results(str(results)) == []
+
+    write_model(results, "toycar", mac_count=30)
+    assert aggregate_results(str(results)) == ["toycar"]
+    filtered, _ = read_outputs(results)
+    counts = filtered.set_index(["Model", "Sequence"])["Count"]
+    assert counts[("toycar", "openasip_base_mac")] == 30
+    assert counts[("aww", "openasip_base_mac")] == 10
+
+
+def test_deleted_folder_is_dropped(results):
+    aggregate_results(str(results))
+    shutil.rmtree(results / "toycar")
+    assert aggregate_results(str(results)) == []
+    filtered, report = read_outputs(results)
+    assert set(filtered["Model"]) == {"aww"}
+    assert report["Model"].tolist() == ["aww"]
+
+
+def test_force(results):
+    aggregate_results(str(results))
+    assert aggregate_results(str(results), force=True) == ["aww", "toycar"]
+
+
+def test_only_model_folders_are_scanned(results):
+    (results / "__pycache__").mkdir()
+    (results / "__pycache__" / "csv_filter.cpython-312.pyc").write_bytes(b"")
+    (results / "empty").mkdir()
+    assert aggregate_results(str(results)) == ["aww", "toycar"]
+    filtered, report = read_outputs(results)
+    assert set(filtered["Model"]) == {"aww", "toycar"}
+    assert report["Model"].tolist() == ["aww", "toycar"]
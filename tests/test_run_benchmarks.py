@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+import run_benchmarks
+from run_benchmarks import BenchmarkState, find_session, flow_command
+
+
+def write_report(directory, comment):
+    os.makedirs(directory, exist_ok=True)
+    pd.DataFrame({"Comment": [comment], "Run": [0]}).to_csv(
+        os.path.join(directory, "report.csv"), index=False
+    )
+
+
+def make_args(tmp_path, **options):
+    args = dict(
+        parallel=2,
+        config_gen=run_benchmarks.DEFAULT_CONFIG_GEN,
+        analysis_run=1,
+        results_directory=str(tmp_path / "results"),
+        mlonmcu_home=str(tmp_path / "home"),
+        llvm_install_dir="llvm",
+        etiss_script="etiss.sh",
+    )
+    args.update(options)
+    return argparse.Namespace(**args)
+
+
+def test_flow_command_tags_session(tmp_path):
+    command = flow_command("aww", "aww-1234", make_args(tmp_path))
+    assert command[command.index("--comment") + 1] == "aww-1234"
+    assert command.count("--config-gen") == len(run_benchmarks.DEFAULT_CONFIG_GEN)
+
+
+def test_find_session_by_comment(tmp_path):
+    sessions = tmp_path / "sessions"
+    write_report(sessions / "1", "other")
+    write_report(sessions / "2", "mine")
+    write_report(sessions / "latest", "mine")
+    assert find_session(str(sessions), "mine", 0) == str(sessions / "2")
+    assert find_session(str(sessions), "missing", 0) is None
+    assert find_session(str(sessions), "mine", time.time() + 60) is None
+
+
+def test_state_is_saved(tmp_path):
+    filepath = str(tmp_path / run_benchmarks.STATE_FILENAME)
+    state = BenchmarkState(filepath)
+    state.update("aww", status="running")
+    state.update("aww", status="done", session="s")
+    assert not os.path.exists(f"{filepath}.tmp")
+    with open(filepath) as file:
+        assert json.load(file) == {"aww": {"status": "done", "session": "s"}}
+    assert BenchmarkState(filepath).is_done("aww")
+    assert not BenchmarkState(filepath).is_done("resnet")
+
+
+def test_run_benchmark_copies_report(tmp_path, monkeypatch):
+    args = make_args(tmp_path)
+
+    def fake_flow(command, stdout, stderr):
+        label = command[command.index("--comment") + 1]
+        session = os.path.join(args.mlonmcu_home, "temp", "sessions", "7")
+        write_report(session, label)
+        analysis = os.path.join(session, "runs", "1")
+        os.makedirs(analysis)
+        with open(os.path.join(analysis, "analyse_instructions_seq1.csv"), "w") as file:
+            file.write("Instruction,Count\n")
+        return 0
+
+    monkeypatch.setattr(run_benchmarks.subprocess, "call", fake_flow)
+    state = BenchmarkState(str(tmp_path / "state.json"))
+    assert run_benchmarks.run_benchmark("aww", args, state) == ("aww", None)
+    output = os.path.join(args.results_directory, "aww")
+    assert sorted(os.listdir(output)) == ["analyse_instructions_seq1.csv", "report.csv"]
+    assert state.is_done("aww")
+
+
+def test_run_benchmark_failure(tmp_path, monkeypatch):
+    args = make_args(tmp_path)
+    monkeypatch.setattr(run_benchmarks.subprocess, "call", lambda *a, **k: 3)
+    state = BenchmarkState(str(tmp_path / "state.json"))
+    model, error = run_benchmarks.run_benchmark("aww", args, state)
+    assert "exited with 3" in error
+    assert state.jobs["aww"]["status"] == "failed"
+
+
+def test_main_benchmarks_model_folders(tmp_path, monkeypatch):
+    results = tmp_path / "results"
+    for folder in ["aww", "toycar", "__pycache__", ".store"]:
+        (results / folder).mkdir(parents=True)
+    ran = []
+
+    def fake_run(model, args, state):
+        ran.append(model)
+        return model, None
+
+    monkeypatch.setattr(run_benchmarks, "run_benchmark", fake_run)
+    monkeypatch.setattr(sys, "argv", ["run_benchmarks.py", "--results-directory", str(results)])
+    run_benchmarks.main()
+    assert sorted(ran) == ["aww", "toycar"]
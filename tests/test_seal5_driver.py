@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+from seal5_driver import StagedFlow
+
+
+def make_flow(tmp_path, calls, force=False, fail=None):
+    def stage(name):
+        def run():
+            if name == fail:
+                raise RuntimeError(name)
+            calls.append(name)
+
+        return run
+
+    flow = StagedFlow(str(tmp_path / "stages.json"), force=force)
+    flow.add("clone", stage("clone"), inputs=["https://llvm", "main"])
+    flow.add("build", stage("build"), inputs=["release"])
+    flow.add("load", stage("load"), inputs=[Path(tmp_path / "top.core_desc")], after="clone")
+    flow.add("patch", stage("patch"))
+    return flow
+
+
+def test_up_to_date_stages_are_skipped(tmp_path):
+    (tmp_path / "top.core_desc").write_text("a")
+    calls = []
+    make_flow(tmp_path, calls).run()
+    assert calls == ["clone", "build", "load", "patch"]
+
+    calls.clear()
+    flow = make_flow(tmp_path, calls)
+    flow.run()
+    assert calls == []
+    assert not flow.ran("clone")
+
+
+def test_changed_input_reruns_dependents(tmp_path):
+    (tmp_path / "top.core_desc").write_text("a")
+    make_flow(tmp_path, []).run()
+    (tmp_path / "top.core_desc").write_text("b")
+    calls = []
+    flow = make_flow(tmp_path, calls)
+    assert flow.plan() == [("clone", True), ("build", True), ("load", False), ("patch", False)]
+    flow.run()
+    assert calls == ["load", "patch"]
+    assert flow.ran("load")
+
+
+def test_force_and_dry_run(tmp_path):
+    make_flow(tmp_path, []).run()
+    calls = []
+    make_flow(tmp_path, calls, force=True).run(dry_run=True)
+    assert calls == []
+    make_flow(tmp_path, calls, force=True).run()
+    assert calls == ["clone", "build", "load", "patch"]
+
+
+def test_failed_stage_runs_again(tmp_path):
+    make_flow(tmp_path, []).run()
+    (tmp_path / "top.core_desc").write_text("c")
+    with pytest.raises(RuntimeError):
+        make_flow(tmp_path, [], fail="patch").run()
+    calls = []
+    make_flow(tmp_path, calls).run()
+    assert calls == ["patch"]
@@ -0,0 +1,82 @@
+import json
+import math
+
+import pandas as pd
+import pytest
+
+import speedup_analytics
+from speedup_analytics import geometric_mean, model_speedups, operation_savings
+
+REPORT = pd.DataFrame(
+    {
+        "Model": ["a", "a", "b", "b", "c"],
+        "Run": [0, 1, 0, 1, 1],
+        "Total Cycles (rel.)": [1.0, 0.5, 1.0, 0.8, 0.9],
+        "Total Instructions": [1000, 600, 200, 180, 50],
+        "Total ROM": [100, 110, 200, 200, 10],
+        "Total RAM": [50, 50, 40, 44, 10],
+    }
+)
+
+FILTERED = pd.DataFrame(
+    {
+        "Model": ["a", "a", "b"],
+        "Sequence": ["ADD2", "MAC", "ADD2"],
+        "Count": [30, 10, 5],
+        "Probability": [0.3, 0.1, 0.05],
+    }
+)
+
+
+def test_geometric_mean_skips_invalid():
+    assert geometric_mean([2, 8, 0, float("nan")]) == pytest.approx(4)
+    assert math.isnan(geometric_mean([]))
+
+
+def test_model_speedups():
+    summary = model_speedups(REPORT)
+    # c has no baseline run
+    assert summary["Model"].tolist() == ["a", "b"]
+    assert summary["speedup"].tolist() == pytest.approx([2.0, 1.25])
+    assert summary["instructions_saved"].tolist() == [400, 20]
+    assert summary["rom_delta"].tolist() == [10, 0]
+    assert summary["ram_delta_rel"].tolist() == pytest.approx([0.0, 0.1])
+
+
+def test_operation_savings():
+    operations = operation_savings(FILTERED, model_speedups(REPORT))
+    savings = dict(zip(operations["Sequence"], operations["attributed_savings"]))
+    assert savings == pytest.approx({"ADD2": 300 + 20, "MAC": 100})
+    assert operations["Sequence"].tolist() == ["ADD2", "MAC"]
+    assert operations["savings_share"].sum() == pytest.approx(1)
+    assert operations.set_index("Sequence").at["ADD2", "models"] == 2
+
+
+def test_analyse_and_save(tmp_path):
+    REPORT.to_csv(tmp_path / speedup_analytics.REPORT_FILENAME, index=False)
+    FILTERED.to_csv(tmp_path / speedup_analytics.FILTERED_FILENAME, index=False)
+    summary, operations, overall = speedup_analytics.analyse(str(tmp_path))
+    assert overall["models"] == 2
+    assert overall["geomean_speedup"] == pytest.approx(math.sqrt(2.5))
+    assert overall["instructions_saved"] == 420
+
+    json_filepath = speedup_analytics.save(str(tmp_path), summary, operations, overall)
+    with open(json_filepath) as file:
+        data = json.load(file)
+    assert data["overall"] == pytest.approx(overall)
+    assert len(data["models"]) == 2
+    assert (tmp_path / speedup_analytics.SUMMARY_FILENAME).exists()
+
+
+def test_losses_have_negative_shares():
+    report = REPORT.copy()
+    report.loc[3, "Total Instructions"] = 260
+    # b now runs more instructions with its only custom instruction
+    filtered = FILTERED.copy()
+    filtered.loc[2, "Sequence"] = "SHL2ADD"
+    operations = operation_savings(filtered, model_speedups(report)).set_index("Sequence")
+    assert operations["attributed_savings"].to_dict() == pytest.approx(
+        {"ADD2": 300, "MAC": 100, "SHL2ADD": -60}
+    )
+    assert operations["savings_share"].abs().sum() == pytest.approx(1)
+    assert operations.at["SHL2ADD", "savings_share"] == pytest.approx(-60 / 460)
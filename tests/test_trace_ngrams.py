@@ -0,0 +1,93 @@
+import random
+from collections import Counter
+
+import pytest
+from trace_ngrams import Vocabulary, count_ngrams, is_fusable, iter_mnemonics
+
+MNEMONICS = ["addi", "c.addi", "lw", "sw", "add", "slli", "mul", "bne"]
+
+
+def trace(length, seed=0):
+    generator = random.Random(seed)
+    return [generator.choice(MNEMONICS) for _ in range(length)]
+
+
+def exact_counts(mnemonics, n):
+    names = [mnemonic.removeprefix("c.") for mnemonic in mnemonics]
+    return Counter(tuple(names[i : i + n]) for i in range(len(names) - n + 1))
+
+
+def counted(counters, vocabulary, top=None):
+    return {
+        n: {
+            tuple(vocabulary.names[index] for index in ids): count
+            for ids, count in counter.most_common(top or len(counter.candidates))
+        }
+        for n, counter in counters.items()
+    }
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 3, 7, 8, 9, 16, 17, 100])
+@pytest.mark.parametrize("chunk_size", [3, 4, 5, 8])
+def test_chunk_boundaries(length, chunk_size):
+    # Every window is counted once, whether or not it straddles a chunk
+    mnemonics = trace(length, seed=length)
+    vocabulary = Vocabulary()
+    counters = count_ngrams(iter(mnemonics), [1, 2, 3], vocabulary, chunk_size=chunk_size)
+    for n, counts in counted(counters, vocabulary).items():
+        assert counts == dict(exact_counts(mnemonics, n))
+        assert counters[n].total == max(0, length - n + 1)
+
+
+def test_sketch_chunk_boundaries():
+    # Above EXACT_MAX_N the counts come from the sketch, a short trace fits
+    # it without collisions
+    mnemonics = trace(500)
+    for chunk_size in (4, 7, 64, 1 << 20):
+        vocabulary = Vocabulary()
+        counters = count_ngrams(iter(mnemonics), [2, 4], vocabulary, chunk_size=chunk_size)
+        assert not counters[4].exact
+        assert counted(counters, vocabulary)[4] == dict(exact_counts(mnemonics, 4))
+
+
+def test_sketch_counts_long_ngrams():
+    mnemonics = ["lw", "addi", "mul", "add", "sw"] * 50 + trace(100)
+    vocabulary = Vocabulary()
+    counters = count_ngrams(iter(mnemonics), [5], vocabulary, chunk_size=16)
+    assert not counters[5].exact
+    (top, count), *_ = counted(counters, vocabulary, top=1)[5].items()
+    assert top == ("lw", "addi", "mul", "add", "sw")
+    # A count-min sketch never underestimates
+    assert count >= exact_counts(mnemonics, 5)[top]
+
+
+def test_compressed_names():
+    vocabulary = Vocabulary(strip_compressed=False)
+    counters = count_ngrams(iter(["c.addi", "addi"]), [1], vocabulary)
+    assert counted(counters, vocabulary)[1] == {("c.addi",): 1, ("addi",): 1}
+
+
+def test_iter_mnemonics(tmp_path):
+    log = tmp_path / "instructions.log"
+    log.write_text(
+        "0x0000000000002f4c: c.addi # 0x00000001 [rs1_rd=1 | imm=1]\n"
+        "some other output\n"
+        "0x0000000000002f4e: lw # 0x00000002 [rd=2]\n"
+    )
+    assert list(iter_mnemonics(str(log))) == ["c.addi", "lw"]
+    (tmp_path / "empty.log").write_text("")
+    assert list(iter_mnemonics(str(tmp_path / "empty.log"))) == []
+
+
+def test_is_fusable():
+    assert is_fusable(("slli", "add"))
+    assert is_fusable(("add", "bne"))
+    assert not is_fusable(("bne", "add"))
+    assert not is_fusable(("c.j", "add"))
+
+
+# Compressed forms as the default vocabulary names them, and pseudo-instructions
+@pytest.mark.parametrize("mnemonic", ["j", "jr", "beqz", "c.bnez", "ret", "bgt", "tail"])
+def test_control_flow_ends_a_sequence(mnemonic):
+    assert is_fusable(("add", mnemonic))
+    assert not is_fusable((mnemonic, "add"))
@@ -0,0 +1,130 @@
+import json
+import os
+import re
+
+import pytest
+import trigger_index
+from gen_op_coredsl import extract_trigger_code
+from trigger_index import TriggerIndex, load_trigger_index
+
+TRIGGER_FILE = """#include "OSAL.hh"
+
+OPERATION(ADD)
+
+TRIGGER
+    IO(3) = UINT(1) + UINT(2);
+    return true;
+END_TRIGGER;
+
+END_OPERATION(ADD)
+
+OPERATION(SUB)
+TRIGGER
+    IO(3) = UINT(1) - UINT(2);
+END_TRIGGER;
+END_OPERATION(SUB)
+
+OPERATION(ADD)
+TRIGGER IO(3) = 0; END_TRIGGER;
+END_OPERATION(ADD)
+"""
+
+
+@pytest.fixture
+def trigger_file(tmp_path):
+    filepath = tmp_path / "base.cc"
+    filepath.write_text(TRIGGER_FILE)
+    trigger_index._loaded_indices.clear()
+    return str(filepath)
+
+
+def old_extract_trigger_code(filepath, operations):
+    # The per-operation regex search the index replaces
+    with open(filepath, "r") as file:
+        content = file.read()
+    codes = {}
+    for operation in operations:
+        match = re.search(
+            rf"OPERATION\({operation}\)(.*?)END_OPERATION\({operation}\)", content, re.DOTALL
+        )
+        if match:
+            codes[operation] = match.group(1).strip()
+    return codes
+
+
+def test_build(trigger_file):
+    content = TRIGGER_FILE.encode()
+    index = TriggerIndex.build(trigger_file, content, "hash")
+    assert list(index.entries) == ["ADD", "SUB"]
+    add = index.entries["ADD"]
+    assert add.body == "TRIGGER\n    IO(3) = UINT(1) + UINT(2);\n    return true;\nEND_TRIGGER;"
+    assert (add.start_line, add.end_line) == (3, 10)
+    assert content[add.start_offset : add.end_offset].startswith(b"OPERATION(ADD)")
+    assert content[add.start_offset : add.end_offset].endswith(b"END_OPERATION(ADD)")
+    assert (index.entries["SUB"].start_line, index.entries["SUB"].end_line) == (12, 16)
+    assert "MUL" not in index
+    assert index.get("MUL", "") == ""
+
+
+def test_matches_regex_extraction(trigger_file):
+    operations = ["ADD", "SUB", "MUL"]
+    assert extract_trigger_code(trigger_file, operations) == old_extract_trigger_code(
+        trigger_file, operations
+    )
+
+
+def test_cache_round_trip(trigger_file, tmp_path):
+    cache_directory = str(tmp_path / "cache")
+    index = load_trigger_index(trigger_file, cache_directory)
+    (cache_filename,) = os.listdir(cache_directory)
+    assert re.fullmatch(r"base-[0-9a-f]{16}\.json", cache_filename)
+
+    # A new process reads the cached index instead of scanning the file
+    trigger_index._loaded_indices.clear()
+    cache_filepath = os.path.join(cache_directory, cache_filename)
+    with open(cache_filepath) as file:
+        data = json.load(file)
+    data["entries"][0]["body"] = "cached"
+    with open(cache_filepath, "w") as file:
+        json.dump(data, file)
+    assert load_trigger_index(trigger_file, cache_directory).get("ADD") == "cached"
+    assert index.get("ADD") != "cached"
+
+
+def test_changed_file_is_indexed_again(trigger_file, tmp_path):
+    cache_directory = str(tmp_path / "cache")
+    assert load_trigger_index(trigger_file, cache_directory).get("SUB")
+    with open(trigger_file, "w") as file:
+        file.write(TRIGGER_FILE.replace("OPERATION(SUB)", "OPERATION(NEGATE)"))
+    index = load_trigger_index(trigger_file, cache_directory)
+    assert "SUB" not in index
+    assert "NEGATE" in index
+    # Only the index of the current content is kept
+    assert os.listdir(cache_directory) == [f"base-{index.file_hash[:16]}.json"]
+
+
+def test_prune_keeps_other_files(trigger_file, tmp_path):
+    cache_directory = tmp_path / "cache"
+    cache_directory.mkdir()
+    other = cache_directory / f"base_ext-{'0' * 16}.json"
+    other.write_text("{}")
+    load_trigger_index(trigger_file, str(cache_directory))
+    assert other.exists()
+    assert len(os.listdir(cache_directory)) == 2
+
+
+def test_broken_cache_is_ignored(trigger_file, tmp_path, capsys):
+    cache_directory = str(tmp_path / "cache")
+    load_trigger_index(trigger_file, cache_directory)
+    (cache_filename,) = os.listdir(cache_directory)
+    with open(os.path.join(cache_directory, cache_filename), "w") as file:
+        file.write("{")
+    trigger_index._loaded_indices.clear()
+    assert load_trigger_index(trigger_file, cache_directory).get("SUB")
+    assert "Ignoring broken trigger index cache" in capsys.readouterr().out
+
+
+def test_missing_file(tmp_path, capsys):
+    index = load_trigger_index(str(tmp_path / "missing.cc"), str(tmp_path / "cache"))
+    assert len(index) == 0
+    assert "not found" in capsys.readouterr().out